@@ -0,0 +1,160 @@
+"""
+Microbenchmarks for the CPU-bound hot paths of pydalle, measured offline against the recorded
+responses and sample images in ``benchmarks/corpus``.
+
+Run everything (or only the benchmarks whose names contain one of the given words)::
+
+    python benchmarks/micro.py
+    python benchmarks/micro.py tasklist png_base64
+
+Save results and compare a later run against them, failing if anything got more than 10% slower::
+
+    python benchmarks/micro.py --output before.json
+    python benchmarks/micro.py --compare before.json --threshold 0.10
+
+Each benchmark is calibrated to run for at least ``--min-time`` seconds per repeat, and the
+fastest of ``--repeat`` repeats is reported, which is the most stable figure on a noisy machine.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pydalle.functional.api.request.labs import create_task_request  # noqa: E402
+from pydalle.functional.api.response.labs import Task, TaskList, with_raw  # noqa: E402
+from pydalle.functional.types import HttpResponse  # noqa: E402
+from pydalle.imperative.client.responses import WrappedImage, _get_image_png_base64_no_io  # noqa: E402
+from pydalle.imperative.outside.np import pil_image_to_np_array, mask_batch, pad_batch, rect_masks  # noqa: E402
+from pydalle.imperative.outside.pil import bytes_to_masked_pil_image, bytes_to_padded_pil_image, \
+    image_bytes_to_png_bytes, bytes_to_pil_image  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# How many copies of the recorded 50-task page make up a "large" task history
+HISTORY_PAGES = 20
+
+
+def _parse_all(task_list: TaskList) -> TaskList:
+    # The items of a TaskList are parsed on first access, so this touches every task and generation
+    for task in task_list:
+        for _ in task.generations or ():
+            pass
+    return task_list
+
+
+def _read(name: str) -> bytes:
+    with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+        return f.read()
+
+
+def load_benchmarks() -> Dict[str, Callable[[], object]]:
+    task = json.loads(_read("task.json"))
+    page = json.loads(_read("tasks.json"))
+    history = {"object": "list", "data": page["data"] * HISTORY_PAGES}
+    png = _read("sample.png")
+    jpg = _read("sample.jpg")
+    webp = _read("sample.webp")
+    png_base64 = base64.b64encode(png).decode()
+    jpg_base64 = base64.b64encode(jpg).decode()
+    pil_image = bytes_to_pil_image(png)
+    pil_image.load()
+    wrapped_image = WrappedImage(webp, None, "webp")
+    wrapped_image.to_pil()
+    np_image = pil_image_to_np_array(pil_image)
+    upload = HttpResponse(status_code=200, url=page["data"][0]["id"], content=json.dumps(task),
+                          request=create_task_request("sess-0123456789abcdef", "inpainting", batch_size=3,
+                                                      caption="A cute cat, with a dark side",
+                                                      parent_id_or_image=png_base64, masked_image=png_base64))
+
+    return {
+        "task_from_dict": lambda: Task.from_dict(task),
+        f"tasklist_from_dict_{len(page['data'])}": lambda: TaskList.from_dict(page),
+        f"tasklist_from_dict_{len(history['data'])}": lambda: TaskList.from_dict(history),
+        f"tasklist_from_dict_{len(page['data'])}_parse_all": lambda: _parse_all(TaskList.from_dict(page)),
+        f"tasklist_from_dict_{len(history['data'])}_first": lambda: TaskList.from_dict(history)[0],
+        f"tasklist_from_dict_{len(page['data'])}_lazy_raw": lambda: with_raw(TaskList.from_dict(page), "lazy"),
+        f"tasklist_from_dict_{len(page['data'])}_drop_raw": lambda: with_raw(TaskList.from_dict(page), "drop"),
+        "png_base64_png_bytes": lambda: _get_image_png_base64_no_io(png),
+        "png_base64_png_base64_str": lambda: _get_image_png_base64_no_io(png_base64),
+        "png_base64_jpg_bytes": lambda: _get_image_png_base64_no_io(jpg),
+        "png_base64_jpg_base64_str": lambda: _get_image_png_base64_no_io(jpg_base64),
+        "png_base64_webp_wrapped_image": lambda: _get_image_png_base64_no_io(WrappedImage(webp, None, "webp")),
+        "png_base64_pil_image": lambda: _get_image_png_base64_no_io(pil_image),
+        "png_base64_numpy_array": lambda: _get_image_png_base64_no_io(np_image),
+        "censored_response_upload": lambda: upload._to_censored_response(),
+        "bytes_to_masked_pil_image": lambda: bytes_to_masked_pil_image(png, 0.5, 0, 1, 1),
+        "bytes_to_padded_pil_image": lambda: bytes_to_padded_pil_image(png, 0.5),
+        "wrapped_image_to_pil_masked_decoded": lambda: wrapped_image.to_pil_masked(0.5, 0, 1, 1),
+        "wrapped_image_to_pil_padded_decoded": lambda: wrapped_image.to_pil_padded(0.5),
+        "mask_batch_8": lambda: mask_batch(np_image, rect_masks(1024, 1024, [(i / 8, 0, 1, 1) for i in range(8)])),
+        "pad_batch_4": lambda: pad_batch(np_image, 0.5, [(0, 0), (1, 0), (0, 1), (1, 1)]),
+        "image_bytes_to_png_bytes_webp": lambda: image_bytes_to_png_bytes(webp),
+        "pil_image_to_np_array": lambda: pil_image_to_np_array(bytes_to_pil_image(png)),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"best_s": min(times), "median_s": statistics.median(times), "number": number, "repeat": repeat}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[Tuple[str, float]]:
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            change = result["best_s"] / baseline[name]["best_s"] - 1
+            print(f"{name:40s} {change:+8.1%}")
+            if change > threshold:
+                regressions.append((name, change))
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("filters", nargs="*", help="Only run benchmarks whose names contain one of these")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against results previously written with --output")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression when comparing")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, fn in load_benchmarks().items():
+        if args.filters and not any(f in name for f in args.filters):
+            continue
+        results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:40s} {results[name]['best_s'] * 1e6:12.1f} us", flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        if regressions := compare(results, baseline, args.threshold):
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+The ``pydalle`` command line interface.
+"""
+
+import argparse
+import sys
+from typing import Optional, List
+
+from pydalle.imperative.bench import load, simulate
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="pydalle")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bench = subparsers.add_parser("bench", help="Drive a workload through the client and report throughput as JSON")
+    load.add_arguments(bench)
+    bench.set_defaults(func=load.main)
+
+    standin = subparsers.add_parser("standin", help="Serve a stand-in labs API to point benchmarks at")
+    load.add_standin_arguments(standin)
+    standin.set_defaults(func=load.standin_main)
+
+    sim = subparsers.add_parser("simulate", help="Compare polling strategies against a stand-in on a virtual clock")
+    simulate.add_arguments(sim)
+    sim.set_defaults(func=simulate.main)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,13 +11,14 @@ DEFAULT_INTERVAL = 1.0
 
 
 def get_access_token_flow(*args, **kwargs) -> HttpFlow[str]:
-    def fn(response):
-        try:
-            return response.json()["access_token"]
-        except Exception as e:
-            raise FlowError("Failed to get access token from response", response) from e
+    return send_from(get_access_token_response_flow(*args, **kwargs), access_token_from_response)
 
-    return send_from(get_access_token_response_flow(*args, **kwargs), fn)
+
+def access_token_from_response(response: HttpResponse) -> str:
+    try:
+        return response.json()["access_token"]
+    except Exception as e:
+        raise FlowError("Failed to get access token from response", response) from e
 
 
 def get_access_token_response_flow(
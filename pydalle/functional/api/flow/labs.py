@@ -9,8 +9,8 @@ from pydalle.functional.api.request.labs import login_request, get_tasks_request
     flag_generation_request, get_credit_summary_request, get_generation_request
 from pydalle.functional.api.response.labs import TaskList, TaskType, Task, Generation, Collection, Login, UserFlag, \
     BillingInfo
-from pydalle.functional.types import HttpFlow, FlowError, JsonDict
-from pydalle.functional.utils import send_from, try_json
+from pydalle.functional.types import HttpFlow, FlowError, JsonDict, HttpBatchFlow
+from pydalle.functional.utils import send_from, try_json, gather_flows, parse_error
 
 DEFAULT_INTERVAL = 1.0
 
@@ -52,7 +52,7 @@ def get_tasks_flow(bearer_token: str, limit: Optional[int] = None, from_ts: Opti
         r = yield get_tasks_request(bearer_token, limit, from_ts, sleep=DEFAULT_INTERVAL)
     j = try_json(r, status_code=200)
     try:
-        return TaskList.from_dict(j)
+        return TaskList.from_dict(j, parse_error(r))
     except Exception as e:
         raise FlowError("Failed to parse response", r) from e
 
@@ -74,7 +74,7 @@ def _create_task_flow(bearer_token: str,
         r = yield request
     j = try_json(r, status_code=200)
     try:
-        return Task.from_dict(j)
+        return Task.from_dict(j, parse_error(r))
     except Exception as e:
         raise FlowError("Failed to parse response", r) from e
 
@@ -108,7 +108,7 @@ def get_task_flow(bearer_token: str, task_id: str) -> HttpFlow[Task]:
         r = yield get_task_request(bearer_token, task_id=task_id, sleep=DEFAULT_INTERVAL)
     j = try_json(r, status_code=200)
     try:
-        return Task.from_dict(j)
+        return Task.from_dict(j, parse_error(r))
     except Exception as e:
         raise FlowError("Failed to parse response", r) from e
 
@@ -128,16 +128,18 @@ def poll_for_task_completion_flow(bearer_token: str,
                                   task_id: str,
                                   interval: float = DEFAULT_INTERVAL,
                                   _max_attempts: int = 1000) -> HttpFlow[Task]:
+    # The task is requested once, then retried up to ``_max_attempts`` times, and every response is checked.
     r = yield get_task_request(bearer_token, task_id=task_id)
-    for _ in range(_max_attempts):
+    for attempt in range(_max_attempts + 1):
         if r.status_code != 504:
             j = try_json(r, status_code=200)
             if j["status"] != "pending":
                 try:
-                    return Task.from_dict(j)
+                    return Task.from_dict(j, parse_error(r))
                 except Exception as e:
                     raise FlowError("Failed to parse response", r) from e
-        r = yield get_task_request(bearer_token, task_id=task_id, sleep=interval)
+        if attempt < _max_attempts:
+            r = yield get_task_request(bearer_token, task_id=task_id, sleep=interval)
     raise FlowError("Failed to poll for task completion: Reached max attempts", r)
 
 
@@ -150,6 +152,17 @@ def download_generation_flow(bearer_token: str, generation_id: str) -> HttpFlow[
     return r.content
 
 
+def download_generations_flow(bearer_token: str, generation_ids: List[str]) -> HttpBatchFlow[List[bytes]]:
+    return gather_flows(*(download_generation_flow(bearer_token, generation_id) for generation_id in generation_ids))
+
+
+def download_task_generations_flow(bearer_token: str, task_id: str) -> HttpBatchFlow[List[bytes]]:
+    task = yield from get_task_flow(bearer_token, task_id)
+    if not task.generations:
+        return []
+    return (yield from download_generations_flow(bearer_token, [g.id for g in task.generations]))
+
+
 def share_generation_flow(bearer_token: str, generation_id: str) -> HttpFlow[Generation]:
     r = yield share_generation_request(bearer_token, generation_id)
     while r.status_code == 504:
@@ -192,6 +205,16 @@ def save_generations_flow(bearer_token: str, generation_ids: List[str],
         raise FlowError("Failed to parse response", r) from e
 
 
+def share_generations_flow(bearer_token: str, generation_ids: List[str]) -> HttpBatchFlow[List[Generation]]:
+    return gather_flows(*(share_generation_flow(bearer_token, generation_id) for generation_id in generation_ids))
+
+
+def save_and_share_generations_flow(bearer_token: str, generation_ids: List[str],
+                                    collection_id_or_alias: str) -> HttpBatchFlow[List[Generation]]:
+    yield from save_generations_flow(bearer_token, generation_ids, collection_id_or_alias)
+    return (yield from share_generations_flow(bearer_token, generation_ids))
+
+
 def get_credit_summary_flow(bearer_token: str) -> HttpFlow[BillingInfo]:
     r = yield get_credit_summary_request(bearer_token)
     while r.status_code == 504:
@@ -0,0 +1,248 @@
+"""
+This module contains explicit state machines for the long-running flows, which can be checkpointed and resumed.
+
+Unlike the generators in :mod:`pydalle.functional.api.flow.labs` and :mod:`pydalle.functional.api.flow.auth0`,
+the state of these flows (which step they are on, how many attempts they have made and when they should next
+send a request) lives in a plain dataclass. It can be turned into JSON with :meth:`FlowState.to_dict`, written
+to disk or a queue, and picked up again in another process with :func:`flow_state_from_dict`.
+
+Credentials (bearer tokens, usernames and passwords) are never part of the state, and must be passed in
+again when resuming.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict, fields
+from typing import Optional, Callable, Dict, Type, ClassVar, Any
+
+from pydalle.functional.api.flow.auth0 import DEFAULT_INTERVAL as AUTH0_DEFAULT_INTERVAL, access_token_from_response
+from pydalle.functional.api.flow.labs import DEFAULT_INTERVAL
+from pydalle.functional.api.request.auth0 import request_authorization_code, request_provide_username, \
+    request_provide_username_password, request_access_token
+from pydalle.functional.api.request.labs import get_task_request
+from pydalle.functional.api.response.labs import Task
+from pydalle.functional.types import HttpFlow, HttpRequest, HttpResponse, FlowError, JsonDict
+from pydalle.functional.utils import try_json, get_query_param, send_from, parse_error
+
+Clock = Callable[[], float]
+
+_STATES: Dict[str, Type['FlowState']] = {}
+
+
+@dataclass
+class FlowState(ABC):
+    """
+    The serializable state of a resumable flow. Subclasses implement :meth:`_advance`, which updates the
+    state with a response, and a ``flow`` method which runs the state machine as an ordinary flow.
+
+    ``wake_at`` is the time (as given by the ``clock`` passed to ``flow``) before which the next request
+    should not be sent, so that a resumed flow keeps to its polling or retry interval.
+    """
+    kind: ClassVar[str] = ""
+
+    step: str
+    attempts: int = 0
+    wake_at: Optional[float] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.kind:
+            _STATES[cls.kind] = cls
+
+    @property
+    def done(self) -> bool:
+        return self.step == "done"
+
+    def to_dict(self) -> JsonDict:
+        """
+        Returns the state as a JSON-serializable dictionary, which :func:`flow_state_from_dict` turns back
+        into an equal state.
+        """
+        return {"kind": self.kind, **asdict(self)}
+
+    def _sleep(self, now: float) -> Optional[float]:
+        if self.wake_at is None or self.wake_at <= now:
+            return None
+        return self.wake_at - now
+
+    def _retry_after(self, interval: float, now: float) -> None:
+        self.attempts += 1
+        self.wake_at = now + interval
+
+    def _run(self, next_request: Callable[[float], HttpRequest], clock: Clock,
+             on_checkpoint: Optional[Callable[['FlowState'], None]]) -> HttpFlow[Any]:
+        if self.done:
+            raise ValueError(f"The {self.kind} flow has already finished")
+        while True:
+            r = yield next_request(clock())
+            result = self._advance(r, clock())
+            if on_checkpoint is not None:
+                on_checkpoint(self)
+            if self.done:
+                return result
+
+    @abstractmethod
+    def _advance(self, r: HttpResponse, now: float) -> Any:
+        """
+        Updates the state with the response to the last request, and returns the flow's result once it is done.
+        """
+
+    def _on_resume(self) -> None:
+        pass
+
+
+def flow_state_from_dict(d: JsonDict) -> FlowState:
+    """
+    Turns a dictionary returned by :meth:`FlowState.to_dict` back into a state, ready to be resumed.
+    """
+    try:
+        cls = _STATES[d["kind"]]
+    except KeyError:
+        raise ValueError(f"Unknown flow state kind: {d.get('kind')!r}")
+    state = cls(**{f.name: d[f.name] for f in fields(cls) if f.name in d})
+    state._on_resume()
+    return state
+
+
+@dataclass
+class PollForTaskCompletionState(FlowState):
+    """
+    The state of polling a task until it is no longer pending; the resumable equivalent of
+    :func:`pydalle.functional.api.flow.labs.poll_for_task_completion_flow`.
+    """
+    kind: ClassVar[str] = "poll_for_task_completion"
+
+    task_id: str = ""
+    interval: float = DEFAULT_INTERVAL
+    max_attempts: int = 1000
+    step: str = "poll"
+
+    def flow(self, bearer_token: str, clock: Clock,
+             on_checkpoint: Optional[Callable[[FlowState], None]] = None) -> HttpFlow[Task]:
+        """
+        Runs (or resumes) the state machine as a flow.
+
+        :param bearer_token: The bearer token to use.
+        :param clock: Returns the current time in seconds, e.g. ``time.time`` (which, unlike a monotonic
+            clock, is comparable between processes).
+        :param on_checkpoint: Called with this state after every response, e.g. to save it.
+        :return: The task, once it is no longer pending.
+        """
+        return self._run(lambda now: get_task_request(bearer_token, self.task_id, sleep=self._sleep(now)),
+                         clock, on_checkpoint)
+
+    def _advance(self, r: HttpResponse, now: float) -> Optional[Task]:
+        if r.status_code != 504:
+            j = try_json(r, status_code=200)
+            if j["status"] != "pending":
+                self.step = "done"
+                self.wake_at = None
+                try:
+                    return Task.from_dict(j, parse_error(r))
+                except Exception as e:
+                    raise FlowError("Failed to parse response", r) from e
+        # Like poll_for_task_completion_flow, the task is requested once and then retried up to max_attempts times
+        if self.attempts >= self.max_attempts:
+            raise FlowError("Failed to poll for task completion: Reached max attempts", r)
+        self._retry_after(self.interval, now)
+        return None
+
+
+@dataclass
+class AccessTokenState(FlowState):
+    """
+    The state of logging in with Auth0; the resumable equivalent of
+    :func:`pydalle.functional.api.flow.auth0.get_access_token_response_flow`.
+
+    Until the authorization code has been obtained, the login depends on cookies of the session it
+    was started in, so a login resumed from a checkpoint starts over from the authorization request.
+    Once it has the code, only the (single-use) code and the code verifier are needed to finish it.
+    """
+    kind: ClassVar[str] = "access_token"
+
+    domain: str = ""
+    client_id: str = ""
+    audience: str = ""
+    redirect_uri: str = ""
+    scope: str = ""
+    code_verifier: str = ""
+    initial_state: str = ""
+    nonce: str = ""
+    step: str = "authorize"
+    url: Optional[str] = None
+    state: Optional[str] = None
+    code: Optional[str] = None
+
+    def flow(self, username: str, password: str, clock: Clock,
+             on_checkpoint: Optional[Callable[[FlowState], None]] = None) -> HttpFlow[HttpResponse]:
+        """
+        Runs (or resumes) the state machine as a flow.
+
+        :param username: The username or email address associated with the account.
+        :param password: The password associated with the account.
+        :param clock: Returns the current time in seconds, e.g. ``time.time``.
+        :param on_checkpoint: Called with this state after every response, e.g. to save it.
+        :return: The response containing the access token.
+        """
+        def next_request(now: float) -> HttpRequest:
+            if self.step == "authorize":
+                return request_authorization_code(self.audience, self.client_id, self.code_verifier, self.domain,
+                                                  self.initial_state, self.nonce, self.redirect_uri, self.scope)
+            if self.step == "username":
+                return request_provide_username(self.url, username, self.state)
+            if self.step == "password":
+                return request_provide_username_password(self.url, username, password, self.state,
+                                                         sleep=self._sleep(now))
+            return request_access_token(self.client_id, self.code, self.code_verifier, self.domain,
+                                        self.redirect_uri)
+
+        return self._run(next_request, clock, on_checkpoint)
+
+    def access_token_flow(self, username: str, password: str, clock: Clock,
+                          on_checkpoint: Optional[Callable[[FlowState], None]] = None) -> HttpFlow[str]:
+        """
+        Like :meth:`flow`, but returns just the access token.
+        """
+        return send_from(self.flow(username, password, clock, on_checkpoint), access_token_from_response)
+
+    def _advance(self, r: HttpResponse, now: float) -> Optional[HttpResponse]:
+        if self.step == "authorize":
+            if r.status_code != 200:
+                raise FlowError("Failed to redirect to login/authorization prompt", r)
+            try:
+                self.state = get_query_param(r.url, "state")
+            except Exception as e:
+                raise FlowError("Failed to get state from redirect", r) from e
+            self.url = r.url
+            self.step = "username"
+        elif self.step == "username":
+            if r.status_code != 200:
+                raise FlowError("Failed to provide username to auth0", r)
+            self.url = r.url
+            self.step = "password"
+        elif self.step == "password":
+            if r.status_code == 504:
+                self._retry_after(AUTH0_DEFAULT_INTERVAL, now)
+                return None
+            if r.status_code != 200:
+                raise FlowError("Failed to provide password to auth0", r)
+            try:
+                self.code = get_query_param(r.url, "code")
+            except Exception as e:
+                raise FlowError("Failed to get code from redirect", r) from e
+            self.url = None
+            self.wake_at = None
+            self.step = "token"
+        else:
+            if r.status_code != 200:
+                raise FlowError("Failed to get access token", r)
+            self.code = None
+            self.step = "done"
+            return r
+        return None
+
+    def _on_resume(self) -> None:
+        if self.step in ("username", "password"):
+            self.step = "authorize"
+            self.url = None
+            self.state = None
+            self.wake_at = None
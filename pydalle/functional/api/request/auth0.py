@@ -2,12 +2,12 @@
 This module contains functions which are used to construct requests to the Auth0 API.
 """
 
-import json
 from base64 import urlsafe_b64encode
 from hashlib import sha256
 from urllib.parse import urlencode
 
 from pydalle.functional.assumptions import AUTH0_TOKEN_URL_TEMPLATE, AUTH0_AUTHORIZE_URL_TEMPLATE
+from pydalle.functional.codec import get_json_codec
 from pydalle.functional.types import HttpRequest
 
 
@@ -15,7 +15,7 @@ def request_access_token(client_id, code, code_verifier, domain, redirect_uri):
     return HttpRequest(**{
         "method": "post",
         "url": (AUTH0_TOKEN_URL_TEMPLATE % domain),
-        "data": json.dumps({
+        "data": get_json_codec().dumps({
             "grant_type": "authorization_code",
             "code": code,
             "client_id": client_id,
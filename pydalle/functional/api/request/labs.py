@@ -2,7 +2,6 @@
 This module contains functions which are used to construct requests to the OpenAI Labs API.
 """
 
-import json
 from typing import Optional, List
 
 from pydalle.functional.api.response.labs import TaskType
@@ -10,6 +9,7 @@ from pydalle.functional.assumptions import OPENAI_LABS_TASKS_URL, OPENAI_LABS_LO
     OPENAI_LABS_TASK_URL_TEMPLATE,OPENAI_LABS_GENERATION_URL_TEMPLATE,  OPENAI_LABS_GENERATION_DOWNLOAD_URL_TEMPLATE, \
     OPENAI_LABS_GENERATION_SHARE_URL_TEMPLATE, OPENAI_LABS_COLLECTION_GENERATION_URL_TEMPLATE, \
     OPENAI_LABS_GENERATION_FLAG_URL_TEMPLATE, OPENAI_LABS_BILLING_CREDIT_SUMMARY_URL
+from pydalle.functional.codec import get_json_codec
 from pydalle.functional.types import HttpRequest
 from pydalle.functional.utils import filter_none
 
@@ -50,7 +50,7 @@ def create_task_request(bearer_token: str,
     image_key = _classify_image_parameter(parent_id_or_image)
     return HttpRequest(method="post",
                        url=OPENAI_LABS_TASKS_URL,
-                       data=json.dumps(
+                       data=get_json_codec().dumps(
                            filter_none(
                                {"task_type": task_type, "prompt":
                                    filter_none({"caption": caption,
@@ -82,7 +82,7 @@ def save_generations_request(bearer_token: str, generation_ids: List[str], colle
                              sleep: Optional[float] = None) -> HttpRequest:
     return HttpRequest(method="post",
                        url=OPENAI_LABS_COLLECTION_GENERATION_URL_TEMPLATE % collection_id_or_alias,
-                       data=json.dumps({"generation_ids": generation_ids}),
+                       data=get_json_codec().dumps({"generation_ids": generation_ids}),
                        headers={"Authorization": f"Bearer {bearer_token}",
                                 "Content-Type": "application/json"},
                        sleep=sleep)
@@ -92,7 +92,7 @@ def flag_generation_request(bearer_token: str, generation_id: str, description:
                             sleep: Optional[float] = None) -> HttpRequest:
     return HttpRequest(method="post",
                        url=OPENAI_LABS_GENERATION_FLAG_URL_TEMPLATE % generation_id,
-                       data=json.dumps({"description": description}),
+                       data=get_json_codec().dumps({"description": description}),
                        headers={"Authorization": f"Bearer {bearer_token}",
                                 "Content-Type": "application/json"},
                        sleep=sleep)
@@ -1,23 +1,148 @@
 """
 This module contains dataclasses which represent the Labs API's response objects.
+
+The objects are slotted, and each keeps the dict it was parsed from in ``raw``. To save memory when holding many of
+them, :func:`with_raw` can replace those dicts with a :class:`LazyRaw`, or drop them.
+
+The items of :class:`TaskList` and :class:`GenerationList` are parsed lazily (see :class:`LazyList`), so that a long
+list only costs as much as the items which are actually used.
 """
 
-from dataclasses import dataclass
-from typing import List, Optional, Literal, Union, Any
+import zlib
+from dataclasses import dataclass, fields
+from functools import partial
+from typing import List, Optional, Literal, Union, Any, Mapping, Iterator, Tuple, Dict, Sequence, Callable, \
+    TypeVar, Generic
 
 from pydalle.functional.assumptions import OPENAI_LABS_SHARE_URL_TEMPLATE
+from pydalle.functional.codec import get_json_codec
+
+Raw = Optional[Mapping[str, Any]]
+RAW_MODES = ("keep", "lazy", "drop")
+Path = Tuple[Union[str, int], ...]
+M = TypeVar("M")
+ErrorFactory = Callable[[int, Exception], Exception]
+
+# The fields of every response class other than raw, to walk nested objects without calling fields() each time
+_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _slotted(cls):
+    # Like dataclass(slots=True), which is only available from Python 3.10
+    names = tuple(f.name for f in fields(cls))
+    body = {k: v for k, v in cls.__dict__.items() if k not in names + ("__dict__", "__weakref__")}
+    body["__slots__"] = names
+    slotted = type(cls)(cls.__name__, cls.__bases__, body)
+    slotted.__qualname__ = cls.__qualname__
+    _FIELDS[slotted] = tuple(name for name in names if name != "raw")
+    return slotted
+
+
+class ParseError(ValueError):
+    """
+    Raised when an item of a :class:`LazyList` fails to parse, on first access.
+    """
+
+    def __init__(self, message: str, index: int):
+        super().__init__(message, index)
+        self.index = index
+
+
+def _parse_error(index: int, e: Exception) -> ParseError:
+    return ParseError(f"Failed to parse item {index} of the list: {e!r}", index)
+
+
+class LazyList(Sequence[M], Generic[M]):
+    """
+    A read-only list of response objects, which keeps the dicts of the items and parses each of them on first access,
+    by index or iteration. Once parsed, an item is kept (and the same object returned every time).
+
+    :param items: The dicts of the items. The list is copied, not the dicts.
+    :param parse: Parses the dict of an item, e.g. :meth:`Task.from_dict`.
+    :param error: Makes the exception raised when an item fails to parse, from its index and the exception raised
+        by ``parse``. Defaults to a :class:`ParseError`.
+    """
+    __slots__ = ("_items", "_parse", "_error")
 
+    def __init__(self, items: List[dict], parse: Callable[[dict], M], error: Optional[ErrorFactory] = None):
+        self._items: List[Union[dict, M]] = list(items)
+        self._parse = parse
+        self._error = error if error is not None else _parse_error
 
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+        item = self._items[index]
+        if type(item) is dict:
+            # Two threads may both parse an item the first time, and one of the two objects is then kept
+            item = self._items[index] = self._load(index, item)
+        return item
+
+    def __iter__(self) -> Iterator[M]:
+        items = self._items
+        for i, item in enumerate(items):
+            if type(item) is dict:
+                item = items[i] = self._load(i, item)
+            yield item
+
+    def _load(self, index: int, item: dict) -> M:
+        try:
+            return self._parse(item)
+        except Exception as e:
+            raise self._error(index if index >= 0 else index + len(self._items), e) from e
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def __reduce__(self):
+        return LazyList, (list(self), _parsed)
+
+    @property
+    def parsed(self) -> int:
+        """
+        The number of items parsed so far.
+        """
+        return sum(1 for item in self._items if type(item) is not dict)
+
+    def peek(self, index: int) -> Union[dict, M]:
+        """
+        Returns an item without parsing it: the parsed object if it has been parsed already, else its dict.
+        """
+        return self._items[index]
+
+
+def _parsed(item: Any) -> Any:
+    return item
+
+
+def _peek(items: Sequence[Any], index: int) -> Any:
+    return items.peek(index) if type(items) is LazyList else items[index]
+
+
+@_slotted
 @dataclass
 class TaskList:
-    raw: dict
+    raw: Raw
     object: Literal["list"]
-    data: List['Task']
+    data: LazyList['Task']
 
     @classmethod
-    def from_dict(cls, d: dict) -> 'TaskList':
+    def from_dict(cls, d: dict, error: Optional[ErrorFactory] = None) -> 'TaskList':
+        """
+        :param error: Makes the exception raised when a task, or a generation of one, fails to parse on first
+            access. See :class:`LazyList`.
+        """
         return cls(object=d["object"],
-                   data=[Task.from_dict(t) for t in d["data"]],
+                   data=LazyList(d["data"], partial(Task.from_dict, error=error) if error else Task.from_dict,
+                                 error),
                    raw=d)
 
     def __iter__(self):
@@ -29,13 +154,26 @@ class TaskList:
     def __getitem__(self, index):
         return self.data[index]
 
+    def generation_ids(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yields the ID of every generation of the tasks in the list, with the index of its task and its index in the
+        task's generations, without parsing anything which has not been parsed yet.
+        """
+        for i in range(len(self.data)):
+            task = _peek(self.data, i)
+            generations = task.get("generations", {}).get("data", ()) if type(task) is dict else task.generations
+            for j in range(len(generations or ())):
+                generation = _peek(generations, j)
+                yield generation["id"] if type(generation) is dict else generation.id, i, j
+
 
 TaskType = Union[Literal["inpainting"], Literal["text2im"], Literal["variations"]]
 
 
+@_slotted
 @dataclass
 class Task:
-    raw: dict
+    raw: Raw
     object: Literal["task"]
     id: str
     created: int
@@ -47,7 +185,11 @@ class Task:
     prompt: "Prompt"
 
     @classmethod
-    def from_dict(cls, d: dict) -> 'Task':
+    def from_dict(cls, d: dict, error: Optional[ErrorFactory] = None) -> 'Task':
+        """
+        :param error: Makes the exception raised when a generation fails to parse on first access. See
+            :class:`LazyList`.
+        """
         return cls(object=d["object"],
                    id=d["id"],
                    created=d["created"],
@@ -55,7 +197,7 @@ class Task:
                    status=d["status"],
                    status_information=StatusInformation.from_dict(d["status_information"]),
                    prompt_id=d["prompt_id"],
-                   generations=GenerationList.from_dict(d["generations"]) if "generations" in d else None,
+                   generations=GenerationList.from_dict(d["generations"], error) if "generations" in d else None,
                    prompt=Prompt.from_dict(d["prompt"]),
                    raw=d)
 
@@ -63,9 +205,10 @@ class Task:
         return f"Task(id={self.id}, task_type={self.task_type}, status={self.status})"
 
 
+@_slotted
 @dataclass
 class StatusInformation:
-    raw: dict
+    raw: Raw
     type: Optional[Literal["error"]] = None
     message: Optional[Literal["Your task failed as a result of our safety system."]] = None
     code: Optional[Literal["task_failed_text_safety_system"]] = None
@@ -78,9 +221,10 @@ class StatusInformation:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Prompt:
-    raw: dict
+    raw: Raw
     id: str
     object: Literal["prompt"]
     created: int
@@ -101,9 +245,10 @@ class Prompt:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class PromptData:
-    raw: dict
+    raw: Raw
     caption: Optional[str] = None
     image_path: Optional[str] = None
     masked_image_path: Optional[str] = None
@@ -116,16 +261,21 @@ class PromptData:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class GenerationList:
-    raw: dict
+    raw: Raw
     object: Literal["list"]
-    data: List["Generation"]
+    data: LazyList["Generation"]
 
     @classmethod
-    def from_dict(cls, d: dict) -> 'GenerationList':
+    def from_dict(cls, d: dict, error: Optional[ErrorFactory] = None) -> 'GenerationList':
+        """
+        :param error: Makes the exception raised when a generation fails to parse on first access. See
+            :class:`LazyList`.
+        """
         return cls(object=d["object"],
-                   data=[Generation.from_dict(g) for g in d["data"]],
+                   data=LazyList(d["data"], Generation.from_dict, error),
                    raw=d)
 
     def __iter__(self):
@@ -138,9 +288,10 @@ class GenerationList:
         return self.data[index]
 
 
+@_slotted
 @dataclass
 class Generation:
-    raw: dict
+    raw: Raw
     id: str
     object: Literal["generation"]
     created: int
@@ -168,9 +319,10 @@ class Generation:
         return OPENAI_LABS_SHARE_URL_TEMPLATE % (self.id.replace("generation-", "", 1))
 
 
+@_slotted
 @dataclass
 class GenerationData:
-    raw: dict
+    raw: Raw
     image_path: str
 
     @classmethod
@@ -179,9 +331,10 @@ class GenerationData:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Collection:
-    raw: dict
+    raw: Raw
     object: Literal["collection"]
     id: str
     created: int
@@ -202,9 +355,10 @@ class Collection:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Breakdown:
-    raw: dict
+    raw: Raw
     free: int
 
     @classmethod
@@ -213,9 +367,10 @@ class Breakdown:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class BillingInfo:
-    raw: dict
+    raw: Raw
     aggregate_credits: int
     next_grant_ts: int
     breakdown: Breakdown
@@ -228,9 +383,10 @@ class BillingInfo:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Features:
-    raw: dict
+    raw: Raw
     public_endpoints: bool
     image_uploads: bool
 
@@ -241,9 +397,10 @@ class Features:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Organization:
-    raw: dict
+    raw: Raw
     object: Literal["organization"]
     id: str
     created: int
@@ -270,9 +427,10 @@ class Organization:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class OrganizationList:
-    raw: dict
+    raw: Raw
     object: Literal["list"]
     data: List[Organization]
 
@@ -283,9 +441,10 @@ class OrganizationList:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Session:
-    raw: dict
+    raw: Raw
     sensitive_id: str
     object: Literal["session"]
     created: int
@@ -302,9 +461,10 @@ class Session:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class User:
-    raw: dict
+    raw: Raw
     object: Literal["user"]
     id: str
     email: str
@@ -339,9 +499,10 @@ class User:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class Login:
-    raw: dict
+    raw: Raw
     object: Literal["login"]
     user: User
     invites: List[Any]
@@ -358,9 +519,10 @@ class Login:
                    raw=d)
 
 
+@_slotted
 @dataclass
 class UserFlag:
-    raw: dict
+    raw: Raw
     object: Literal["user_flag"]
     id: str
     created: int
@@ -375,3 +537,149 @@ class UserFlag:
                    generation_id=d["generation_id"],
                    description=d["description"],
                    raw=d)
+
+
+class _Blob:
+    """
+    The compressed JSON of an outermost response object, shared by the :class:`LazyRaw` of every object nested in it.
+    It is decoded once, the first time any of them is used, and only the decoded value is kept from then on.
+    """
+    __slots__ = ("_data", "_value")
+
+    def __init__(self, data: bytes):
+        self._data: Optional[bytes] = data
+        self._value: Any = None
+
+    def decoded(self) -> Any:
+        data = self._data
+        if data is not None:
+            # Set before the compressed data is dropped, so that another thread sees one or the other
+            self._value = get_json_codec().loads(zlib.decompress(data))
+            self._data = None
+        return self._value
+
+
+class LazyRaw(Mapping):
+    """
+    A read-only stand-in for the ``raw`` dict of a response object, decoded on first use from the compressed JSON of
+    the outermost response object it is part of, which is shared by every object nested in it.
+    """
+    __slots__ = ("_blob", "_path", "_value")
+
+    def __init__(self, blob: _Blob, path: Path = ()):
+        self._blob = blob
+        self._path = path
+        self._value: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        """
+        Returns the decoded dict (the same one every time).
+        """
+        if self._value is None:
+            value = self._blob.decoded()
+            for key in self._path:
+                value = value[key]
+            self._value = value
+        return self._value
+
+    def __getitem__(self, key: str) -> Any:
+        return self.to_dict()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return len(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"LazyRaw({self.to_dict()!r})"
+
+
+def with_raw(obj: Any, mode: str) -> Any:
+    """
+    Changes how a response object (and every object nested in it) keeps the dicts it was parsed from, in place.
+
+    :param obj: The response object, e.g. a :class:`Task` or :class:`TaskList`.
+    :param mode: ``"keep"`` keeps them as they are. ``"lazy"`` replaces them with :class:`LazyRaw` mappings, which
+        share the compressed JSON of ``obj`` and are decoded only when they are used. ``"drop"`` drops them
+        (``raw`` is ``None``); see :func:`raw_dict` to get them back. Both parse every item of the lists in
+        ``obj``, since the dicts of unparsed items would otherwise be kept.
+    :return: ``obj``.
+    """
+    if mode not in RAW_MODES:
+        raise ValueError(f"mode must be one of {', '.join(map(repr, RAW_MODES))}, not {mode!r}")
+    if mode == "keep" or type(obj) not in _FIELDS or not isinstance(obj.raw, dict):
+        return obj
+    # Once the raw dicts are gone, the strings repeated across objects (IDs, types) can share a single copy
+    strings: Dict[str, str] = {}
+    if mode == "drop":
+        _drop_raw(obj, strings)
+    else:
+        data = get_json_codec().dumps(obj.raw)
+        _lazy_raw(obj, _Blob(zlib.compress(data.encode() if isinstance(data, str) else data, 1)), (), strings)
+    return obj
+
+
+def raw_dict(obj: Any) -> dict:
+    """
+    Returns the dict a response object was parsed from, however it keeps it (see :func:`with_raw`). If it was
+    dropped, it is rebuilt from the object's fields, without the keys pydalle does not parse or which are null.
+    """
+    if isinstance(obj.raw, dict):
+        return obj.raw
+    if isinstance(obj.raw, LazyRaw):
+        return obj.raw.to_dict()
+    return {name: _to_json(value) for name in _FIELDS[type(obj)] if (value := getattr(obj, name)) is not None}
+
+
+# Paths are interned, since the same ones (e.g. ("data", 0, "prompt")) come up in every response
+_PATHS: Dict[Path, Path] = {}
+_MAX_PATHS = 65536
+
+
+def _intern(path: Path) -> Path:
+    if len(_PATHS) < _MAX_PATHS:
+        return _PATHS.setdefault(path, path)
+    return _PATHS.get(path, path)
+
+
+def _to_json(value: Any) -> Any:
+    if type(value) in _FIELDS:
+        return raw_dict(value)
+    if isinstance(value, (list, LazyList)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _drop_raw(model: Any, strings: Dict[str, str]) -> None:
+    model.raw = None
+    for name in _FIELDS[type(model)]:
+        value = getattr(model, name)
+        kind = type(value)
+        if kind is str:
+            setattr(model, name, strings.setdefault(value, value))
+        elif kind in _FIELDS:
+            _drop_raw(value, strings)
+        elif (kind is list or kind is LazyList) and value and type(value[0]) in _FIELDS:
+            for item in value:
+                _drop_raw(item, strings)
+
+
+def _lazy_raw(model: Any, blob: _Blob, path: Path, strings: Dict[str, str]) -> None:
+    raw = model.raw
+    model.raw = LazyRaw(blob, _intern(path))
+    for name in _FIELDS[type(model)]:
+        value = getattr(model, name)
+        kind = type(value)
+        if kind is str:
+            setattr(model, name, strings.setdefault(value, value))
+        elif kind in _FIELDS:
+            # Objects whose raw dict is not where their field says (if any) keep it, to be safe
+            if value.raw is raw.get(name):
+                _lazy_raw(value, blob, path + (name,), strings)
+        elif (kind is list or kind is LazyList) and value and type(value[0]) in _FIELDS:
+            items = raw.get(name)
+            if type(items) is list and len(items) == len(value):
+                for i, item in enumerate(value):
+                    if item.raw is items[i]:
+                        _lazy_raw(item, blob, path + (name, i), strings)
@@ -0,0 +1,6 @@
+"""
+This package contains in-memory models of external APIs which answer :class:`pydalle.functional.types.HttpRequest`
+objects with :class:`pydalle.functional.types.HttpResponse` objects, for benchmarking and simulation.
+
+The models never perform I/O: the current time is always passed in by the caller.
+"""
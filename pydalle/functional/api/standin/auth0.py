@@ -0,0 +1,78 @@
+"""
+This module contains an in-memory stand-in for the parts of the Auth0 API used by
+:func:`pydalle.functional.api.flow.auth0.get_access_token_response_flow`.
+"""
+
+import json
+import random
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs, urlencode
+
+from pydalle.functional.types import HttpRequest, HttpResponse
+
+
+class StandInAuth0:
+    """
+    Accepts any username and password and walks the client through the same redirects as the real
+    authorization code flow. Every access token it hands out is remembered in :attr:`access_tokens`.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng if rng is not None else random.Random()
+        self.access_tokens = set()
+        self._redirect_uris: Dict[str, str] = {}
+        self._codes = set()
+
+    def handles(self, r: HttpRequest) -> bool:
+        path = urlparse(r.url).path
+        return path in ("/authorize", "/oauth/token", "/auth/callback") or path.startswith("/u/login/")
+
+    def handle(self, r: HttpRequest, now: float) -> HttpResponse:
+        path = urlparse(r.url).path
+        query = _query(r)
+        if path == "/authorize":
+            state = self._token("state")
+            self._redirect_uris[state] = urlparse(query.get("redirect_uri", "/auth/callback")).path
+            return _redirect(r, f"/u/login/identifier?state={state}")
+        if path == "/u/login/identifier":
+            return _redirect(r, f"/u/login/password?state={query.get('state', '')}")
+        if path == "/u/login/password":
+            code = self._token("code")
+            self._codes.add(code)
+            redirect_uri = self._redirect_uris.pop(query.get("state", ""), "/auth/callback")
+            return _redirect(r, f"{redirect_uri}?{urlencode({'code': code, 'state': query.get('state', '')})}")
+        if path == "/auth/callback":
+            return HttpResponse(status_code=200, url=r.url, content="", request=r)
+        if path == "/oauth/token":
+            try:
+                code = json.loads(r.text or "{}").get("code")
+            except json.JSONDecodeError:
+                code = None
+            if code not in self._codes:
+                return _json(r, 403, {"error": "invalid_grant", "error_description": "Invalid authorization code"})
+            self._codes.discard(code)
+            access_token = self._token("access")
+            self.access_tokens.add(access_token)
+            return _json(r, 200, {"access_token": access_token, "expires_in": 86400, "token_type": "Bearer"})
+        return _json(r, 404, {"error": "not_found"})
+
+    def _token(self, prefix: str) -> str:
+        return f"{prefix}-{self.rng.getrandbits(128):032x}"
+
+
+def _query(r: HttpRequest) -> Dict[str, str]:
+    query = {k: v[0] for k, v in parse_qs(urlparse(r.url).query).items()}
+    query.update({k: str(v) for k, v in (r.params or {}).items()})
+    data = r.text
+    if data and not data.startswith("{"):
+        query.update({k: v[0] for k, v in parse_qs(data).items() if k not in query})
+    return query
+
+
+def _redirect(r: HttpRequest, location: str) -> HttpResponse:
+    return HttpResponse(status_code=302, url=r.url, content="", request=r, headers={"Location": location})
+
+
+def _json(r: HttpRequest, status_code: int, body) -> HttpResponse:
+    return HttpResponse(status_code=status_code, url=r.url, content=json.dumps(body), request=r,
+                        headers={"Content-Type": "application/json"})
@@ -0,0 +1,294 @@
+"""
+This module contains an in-memory stand-in for the labs API.
+
+It answers every request made by the flows in :mod:`pydalle.functional.api.flow.labs`, models a
+queue of workers completing tasks, and can inject the 504s the real service is known for.
+"""
+
+import heapq
+import json
+import random
+import re
+import struct
+import zlib
+from typing import Dict, Optional, List, Any
+from urllib.parse import urlparse, parse_qs
+
+from pydalle.functional.api.standin.auth0 import StandInAuth0
+from pydalle.functional.types import HttpRequest, HttpResponse, JsonDict
+
+_TASK_PATH = re.compile(r"^/api/labs/tasks/(?P<task_id>[^/]+)$")
+_GENERATION_PATH = re.compile(r"^/api/labs/generations/(?P<generation_id>[^/]+)(?P<action>/download|/share|/flags)?$")
+_COLLECTION_PATH = re.compile(r"^/api/labs/collections/(?P<collection>[^/]+)/generations$")
+_IMAGE_PATH = re.compile(r"^/standin/images/(?P<generation_id>[^/]+)\.webp$")
+
+_TASK_COST = 1
+
+
+class StandInLabs:
+    """
+    An in-memory model of the labs API.
+
+    :param pending_time: How long (in seconds) a worker spends on each task.
+    :param pending_jitter: The fraction by which ``pending_time`` randomly varies per task.
+    :param workers: How many tasks are worked on at once. Tasks beyond that wait in a FIFO queue.
+        ``None`` means every task starts immediately.
+    :param error_rate: The probability that any labs request is answered with a 504.
+    :param reject_rate: The probability that a task is rejected by the "safety system".
+    :param credits: The number of credits the account starts with.
+    :param image_size: The width and height of the images handed out by the download endpoints.
+    :param image_origin: The origin used for the direct image URLs of generations.
+    :param seed: Seed for the random number generator, for reproducible runs.
+    """
+
+    def __init__(self,
+                 pending_time: float = 2.0,
+                 pending_jitter: float = 0.25,
+                 workers: Optional[int] = None,
+                 error_rate: float = 0.0,
+                 reject_rate: float = 0.0,
+                 credits: int = 1000,
+                 image_size: int = 512,
+                 image_origin: str = "https://labs.openai.com",
+                 seed: Optional[int] = None):
+        self.pending_time = pending_time
+        self.pending_jitter = pending_jitter
+        self.workers = workers
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.credits = credits
+        self.image_size = image_size
+        self.image_origin = image_origin.rstrip("/")
+
+        self.rng = random.Random(seed)
+        self.auth0 = StandInAuth0(self.rng)
+        self.tasks: Dict[str, JsonDict] = {}
+        self.generations: Dict[str, JsonDict] = {}
+        self.credits_used = 0
+        self.requests = 0
+        self.errors = 0
+        self._done_at: Dict[str, float] = {}
+        self._busy_until: List[float] = []
+        self._sessions = set()
+        self._image: Optional[bytes] = None
+
+    def handle(self, r: HttpRequest, now: float) -> HttpResponse:
+        """
+        Answers a request as the labs API (or, for authentication requests, Auth0) would at time ``now``.
+        """
+        self.requests += 1
+        if self.auth0.handles(r):
+            return self.auth0.handle(r, now)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return HttpResponse(status_code=504, url=r.url, content="Gateway Timeout", request=r)
+
+        path = urlparse(r.url).path
+        method = r.method.lower()
+        if m := _IMAGE_PATH.match(path):
+            return self._download(r, m["generation_id"])
+        if path == "/api/labs/auth/login" and method == "post":
+            return self._login(r, now)
+        if self._session(r) is None:
+            return _json(r, 401, {"error": {"code": "invalid_api_key", "message": "Incorrect API key provided",
+                                            "type": "invalid_request_error"}})
+        if path == "/api/labs/tasks":
+            if method == "post":
+                return self._create_task(r, now)
+            return self._list_tasks(r, now)
+        if m := _TASK_PATH.match(path):
+            if (task := self._task(m["task_id"], now)) is None:
+                return _json(r, 404, {"error": {"message": "Task not found"}})
+            return _json(r, 200, task)
+        if m := _GENERATION_PATH.match(path):
+            generation = self.generations.get(m["generation_id"])
+            if generation is None:
+                return _json(r, 404, {"error": {"message": "Generation not found"}})
+            if m["action"] == "/download":
+                return self._download(r, generation["id"])
+            if m["action"] == "/share":
+                generation["is_public"] = True
+            if m["action"] == "/flags":
+                return _json(r, 200, {"object": "user_flag", "id": self._id("userflag"), "created": int(now),
+                                      "generation_id": generation["id"],
+                                      "description": _body(r).get("description", "")})
+            return _json(r, 200, generation)
+        if m := _COLLECTION_PATH.match(path):
+            return _json(r, 200, {"object": "collection", "id": self._id("collection"), "created": int(now),
+                                  "name": "Private", "description": "", "is_public": False,
+                                  "alias": m["collection"]})
+        if path == "/api/labs/billing/credit_summary":
+            return _json(r, 200, self._billing_info(now))
+        return _json(r, 404, {"error": {"message": f"Unknown endpoint: {r.method.upper()} {path}"}})
+
+    def _session(self, r: HttpRequest) -> Optional[str]:
+        authorization = {k.lower(): v for k, v in (r.headers or {}).items()}.get("authorization", "")
+        token = authorization[len("Bearer "):]
+        return token if token in self._sessions else None
+
+    def _login(self, r: HttpRequest, now: float) -> HttpResponse:
+        authorization = {k.lower(): v for k, v in (r.headers or {}).items()}.get("authorization", "")
+        if authorization[len("Bearer "):] not in self.auth0.access_tokens:
+            return _json(r, 401, {"error": {"code": "invalid_api_key", "message": "Invalid access token"}})
+        session = self._id("sess")
+        self._sessions.add(session)
+        created = int(now)
+        return _json(r, 200, {
+            "object": "login",
+            "user": {
+                "object": "user", "id": "user-standin", "email": "standin@example.com", "name": "Stand-in",
+                "picture": "", "created": created, "accepted_terms_at": created,
+                "session": {"sensitive_id": session, "object": "session", "created": created,
+                            "last_use": created, "publishable": False},
+                "groups": [], "orgs": {"object": "list", "data": []}, "intercom_hash": "",
+                "accepted_terms": 1, "seen_upload_guidelines": 1, "seen_billing_onboarding": 1,
+            },
+            "invites": [],
+            "features": {"public_endpoints": False, "image_uploads": True},
+            "billing_info": self._billing_info(now),
+        })
+
+    def _billing_info(self, now: float) -> JsonDict:
+        remaining = max(self.credits - self.credits_used, 0)
+        return {"aggregate_credits": remaining, "next_grant_ts": int(now) + 30 * 24 * 3600,
+                "breakdown": {"free": remaining}}
+
+    def _create_task(self, r: HttpRequest, now: float) -> HttpResponse:
+        body = _body(r)
+        task_type = body.get("task_type")
+        prompt = body.get("prompt") or {}
+        if task_type not in ("text2im", "variations", "inpainting"):
+            return _json(r, 400, {"error": {"message": f"Invalid task_type: {task_type}"}})
+        if self.credits_used + _TASK_COST > self.credits:
+            return _json(r, 400, {"error": {"message": "Insufficient credits"}})
+        self.credits_used += _TASK_COST
+
+        task_id = self._id("task")
+        prompt_id = self._id("prompt")
+        created = int(now)
+        if task_type == "text2im":
+            prompt_type = "CaptionPrompt"
+        elif prompt.get("caption"):
+            prompt_type = "CaptionImagePrompt"
+        else:
+            prompt_type = "CaptionlessImagePrompt"
+        prompt_data = {k: prompt[k] for k in ("caption",) if k in prompt}
+        if "image" in prompt or "parent_generation_id" in prompt or "parent_prompt_id" in prompt:
+            prompt_data["image_path"] = f"{self.image_origin}/standin/prompts/{prompt_id}/image.png"
+        if "masked_image" in prompt:
+            prompt_data["masked_image_path"] = f"{self.image_origin}/standin/prompts/{prompt_id}/masked.png"
+        self.tasks[task_id] = {
+            "object": "task", "id": task_id, "created": created, "task_type": task_type, "status": "pending",
+            "status_information": {}, "prompt_id": prompt_id,
+            "prompt": {"id": prompt_id, "object": "prompt", "created": created, "prompt_type": prompt_type,
+                       "prompt": prompt_data, "parent_generation_id": prompt.get("parent_generation_id")},
+            "_batch_size": int(prompt.get("batch_size", 4)),
+        }
+        self._done_at[task_id] = self._schedule(now)
+        return _json(r, 200, self._task(task_id, now))
+
+    def _schedule(self, now: float) -> float:
+        duration = self.pending_time * (1 + self.rng.uniform(-self.pending_jitter, self.pending_jitter))
+        if self.workers is None:
+            return now + duration
+        start = now
+        if len(self._busy_until) >= self.workers:
+            start = max(now, heapq.heappop(self._busy_until))
+        heapq.heappush(self._busy_until, start + duration)
+        return start + duration
+
+    def _task(self, task_id: str, now: float) -> Optional[JsonDict]:
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if task["status"] == "pending" and now >= self._done_at[task_id]:
+            self._finish(task)
+        return {k: v for k, v in task.items() if not k.startswith("_")}
+
+    def _finish(self, task: JsonDict) -> None:
+        if self.reject_rate and self.rng.random() < self.reject_rate:
+            task["status"] = "rejected"
+            task["status_information"] = {"type": "error",
+                                          "message": "Your task failed as a result of our safety system.",
+                                          "code": "task_failed_text_safety_system"}
+            return
+        task["status"] = "succeeded"
+        data = []
+        for _ in range(task["_batch_size"]):
+            generation_id = self._id("generation")
+            generation = {
+                "id": generation_id, "object": "generation", "created": task["created"],
+                "generation_type": "ImageGeneration",
+                "generation": {"image_path": f"{self.image_origin}/standin/images/{generation_id}.webp"},
+                "task_id": task["id"], "prompt_id": task["prompt_id"], "is_public": False,
+            }
+            self.generations[generation_id] = generation
+            data.append(generation)
+        task["generations"] = {"object": "list", "data": data}
+
+    def _list_tasks(self, r: HttpRequest, now: float) -> HttpResponse:
+        query = {k: v[0] for k, v in parse_qs(urlparse(r.url).query).items()}
+        query.update({k: str(v) for k, v in (r.params or {}).items()})
+        limit = min(int(query.get("limit", 50)), 50)
+        tasks = sorted(self.tasks.values(), key=lambda t: t["created"])
+        if "from_ts" in query:
+            # Tasks created at or after from_ts, oldest first, so that pages can be walked forwards
+            from_ts = int(query["from_ts"])
+            selected = [t for t in tasks if t["created"] >= from_ts][:limit]
+        else:
+            selected = tasks[::-1][:limit]
+        return _json(r, 200, {"object": "list", "data": [self._task(t["id"], now) for t in selected]})
+
+    def _download(self, r: HttpRequest, generation_id: str) -> HttpResponse:
+        if generation_id not in self.generations:
+            return _json(r, 404, {"error": {"message": "Generation not found"}})
+        etag = f'"{generation_id}"'
+        if {k.lower(): v for k, v in (r.headers or {}).items()}.get("if-none-match") == etag:
+            return HttpResponse(status_code=304, url=r.url, content=b"", request=r, headers={"ETag": etag})
+        if self._image is None:
+            self._image = _noise_png(self.image_size, self.image_size, self.rng)
+        return HttpResponse(status_code=200, url=r.url, content=self._image, request=r,
+                            headers={"Content-Type": "image/png", "ETag": etag})
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}-{self.rng.getrandbits(96):024x}"
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns counters describing what the stand-in has seen so far.
+        """
+        statuses: Dict[str, int] = {}
+        for task in self.tasks.values():
+            statuses[task["status"]] = statuses.get(task["status"], 0) + 1
+        return {"requests": self.requests, "errors": self.errors, "credits_used": self.credits_used,
+                "tasks": statuses}
+
+
+def _body(r: HttpRequest) -> JsonDict:
+    try:
+        body = json.loads(r.text or "{}")
+    except (TypeError, ValueError):
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _json(r: HttpRequest, status_code: int, body: Any) -> HttpResponse:
+    return HttpResponse(status_code=status_code, url=r.url, content=json.dumps(body), request=r,
+                        headers={"Content-Type": "application/json"})
+
+
+def _noise_png(width: int, height: int, rng: random.Random) -> bytes:
+    """
+    Encodes an RGB image of random noise as a PNG, so downloads are about as large as real ones.
+    """
+    row_size = width * 3
+    pixels = rng.getrandbits(8 * row_size * height).to_bytes(row_size * height, "little")
+    raw = b"".join(b"\x00" + pixels[y * row_size:(y + 1) * row_size] for y in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + _png_chunk(b"IDAT", zlib.compress(raw, 1))
+            + _png_chunk(b"IEND", b""))
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
@@ -26,3 +26,5 @@ OPENAI_LABS_GENERATION_FLAG_URL_TEMPLATE = f"{OPENAI_LABS_GENERATION_URL}/%s/fla
 OPENAI_LABS_COLLECTION_URL = f"{OPENAI_LABS_API_URL}/collections"
 OPENAI_LABS_COLLECTION_GENERATION_URL_TEMPLATE = f"{OPENAI_LABS_COLLECTION_URL}/%s/generations"
 OPENAI_LABS_SHARE_URL_TEMPLATE = "https://labs.openai.com/s/%s"
+
+OPENAI_LABS_IMAGE_SIZE = 1024
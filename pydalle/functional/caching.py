@@ -0,0 +1,148 @@
+"""
+This module contains the rules deciding which responses of the labs API may be cached, and for how long.
+
+Finished tasks, generations and images never change, so they are cached indefinitely, while pending tasks are
+never cached. Login info and billing info change over time and are cached for a configurable time. Requests
+which change something on the server invalidate the cached responses they make stale.
+"""
+
+import math
+import re
+from dataclasses import dataclass, replace
+from hashlib import sha256
+from typing import Optional, List
+from urllib.parse import urlparse, urlencode, urlunparse
+
+from pydalle.functional.types import HttpRequest, HttpResponse
+
+FOREVER = math.inf
+
+_LOGIN_PATH = "/api/labs/auth/login"
+_BILLING_PATH = "/api/labs/billing/credit_summary"
+_TASK_PATH = re.compile(r"^/api/labs/tasks/(?P<task_id>[^/]+)$")
+_GENERATION_PATH = re.compile(r"^/api/labs/generations/(?P<generation_id>[^/]+)(?P<action>/download|/share|/flags)?$")
+_FINISHED_STATUSES = ("succeeded", "rejected")
+
+
+@dataclass
+class CachePolicy:
+    """
+    Decides which responses are cached, and for how long.
+
+    :param login_ttl: Seconds to cache login info for. ``0`` disables caching it.
+    :param billing_ttl: Seconds to cache billing info (i.e. the credit summary) for. ``0`` disables caching it.
+    :param direct_images: Whether to cache images fetched outside of the labs API without an Authorization header
+        (i.e. from the signed direct image URLs of generations) indefinitely. Only responses whose
+        ``Content-Type`` is an image are cached this way, so that e.g. the Auth0 login pages are not.
+    :param revalidate: Whether to keep responses which came with an ``ETag`` even if they must not be served
+        without asking the server first, and revalidate them with ``If-None-Match`` instead of refetching them.
+    """
+    login_ttl: float = 300.0
+    billing_ttl: float = 60.0
+    direct_images: bool = True
+    revalidate: bool = True
+
+    def key(self, r: HttpRequest) -> Optional[str]:
+        """
+        Returns the cache key of a request, made of its method, URL and parameters and a digest of the identity
+        it was sent with (its Authorization header), or ``None`` if requests like it are never cached.
+        """
+        method = r.method.lower()
+        if method == "post" and urlparse(r.url).path == _LOGIN_PATH:
+            return request_key("post", r.url, _authorization(r))
+        if method != "get":
+            return None
+        url = r.url
+        if r.params:
+            parsed = urlparse(url)
+            query = urlencode(sorted((k, str(v)) for k, v in r.params.items()))
+            url = urlunparse(parsed._replace(query=f"{parsed.query}&{query}" if parsed.query else query))
+        return request_key("get", url, _authorization(r))
+
+    def ttl(self, r: HttpRequest, response: HttpResponse) -> Optional[float]:
+        """
+        Returns how many seconds ``response`` may be served from the cache for (possibly :data:`FOREVER`),
+        ``0`` if it may only be served after revalidating its ETag, or ``None`` if it must not be stored.
+        """
+        if response.status_code != 200:
+            return None
+        path = urlparse(r.url).path
+        if r.method.lower() == "post":
+            ttl = self.login_ttl if path == _LOGIN_PATH else 0
+        elif path == _BILLING_PATH:
+            ttl = self.billing_ttl
+        elif _TASK_PATH.match(path):
+            status = _task_status(response)
+            if status not in _FINISHED_STATUSES:
+                # Pending tasks are about to change, so there is no point in keeping them at all
+                return None
+            ttl = FOREVER
+        elif (m := _GENERATION_PATH.match(path)) and m["action"] in (None, "/download"):
+            ttl = FOREVER
+        elif self.direct_images and _authorization(r) is None and not path.startswith("/api/") \
+                and _content_type(response).startswith("image/"):
+            ttl = FOREVER
+        else:
+            ttl = 0
+        if ttl:
+            return ttl
+        if self.revalidate and etag_of(response) is not None:
+            return 0
+        return None
+
+    def invalidates(self, r: HttpRequest) -> List[str]:
+        """
+        Returns the keys of the cached responses which sending ``r`` makes stale.
+        """
+        parsed = urlparse(r.url)
+        if r.method.lower() == "get" or parsed.path == _LOGIN_PATH:
+            # Logging in spends no credits either
+            return []
+        authorization = _authorization(r)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        # Creating tasks spends credits, and anything else could too as far as we know
+        keys = [request_key("get", origin + _BILLING_PATH, authorization)]
+        m = _GENERATION_PATH.match(parsed.path)
+        if m and m["action"] == "/share":
+            keys.append(request_key("get", f"{origin}/api/labs/generations/{m['generation_id']}", authorization))
+        return keys
+
+
+def request_key(method: str, url: str, authorization: Optional[str]) -> str:
+    identity = sha256(authorization.encode()).hexdigest() if authorization is not None else ""
+    return sha256(f"{method.lower()} {url} {identity}".encode()).hexdigest()
+
+
+def etag_of(response: HttpResponse) -> Optional[str]:
+    for key, value in (response.headers or {}).items():
+        if key.lower() == "etag":
+            return value
+    return None
+
+
+def _content_type(response: HttpResponse) -> str:
+    for key, value in (response.headers or {}).items():
+        if key.lower() == "content-type":
+            return value.lower()
+    return ""
+
+
+def with_if_none_match(r: HttpRequest, etag: str) -> HttpRequest:
+    """
+    Returns a copy of ``r`` which asks the server to answer with a 304 if the response still has this ETag.
+    """
+    return replace(r, headers={**(r.headers or {}), "If-None-Match": etag})
+
+
+def _authorization(r: HttpRequest) -> Optional[str]:
+    for key, value in (r.headers or {}).items():
+        if key.lower() == "authorization":
+            return value
+    return None
+
+
+def _task_status(response: HttpResponse) -> Optional[str]:
+    try:
+        return response.json().get("status")
+    except (TypeError, ValueError, AttributeError):
+        return None
@@ -0,0 +1,51 @@
+"""
+This module contains the JSON codec pydalle encodes request bodies and decodes responses with.
+
+The default codec is built on the standard library's :mod:`json` module. Faster ones, built on optional dependencies,
+are in :mod:`pydalle.imperative.outside.jsoncodec`, and are only used once installed with
+:func:`pydalle.imperative.outside.jsoncodec.use_json_codec`.
+"""
+
+import json
+from typing import Any, Union, Optional
+
+
+class JsonCodec:
+    """
+    Encodes and decodes JSON with the standard library's :mod:`json` module. Subclasses override :meth:`loads` and
+    :meth:`dumps` to use a faster library.
+    """
+    name = "json"
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """
+        Decodes a JSON document, given as text or as UTF-8 bytes, so that a response needn't be decoded to text first.
+        """
+        return json.loads(data)
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        """
+        Encodes a value as JSON, as text or as UTF-8 bytes, whichever the codec produces without an extra copy.
+        """
+        return json.dumps(value, separators=(",", ":"))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+
+_codec: JsonCodec = JsonCodec()
+
+
+def get_json_codec() -> JsonCodec:
+    """
+    Returns the codec in use.
+    """
+    return _codec
+
+
+def set_json_codec(codec: Optional[JsonCodec]) -> None:
+    """
+    Sets the codec pydalle encodes request bodies and decodes responses with. ``None`` restores the default one.
+    """
+    global _codec
+    _codec = codec if codec is not None else JsonCodec()
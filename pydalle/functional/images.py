@@ -0,0 +1,90 @@
+"""
+This module contains pure functions for inspecting encoded images without decoding them, so that images which
+are already fit for uploading can be sent as they are.
+"""
+
+import base64
+import binascii
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from pydalle.functional.assumptions import OPENAI_LABS_IMAGE_SIZE
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_SIGNATURES = (
+    (PNG_SIGNATURE, "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"BM", "bmp"),
+)
+
+
+@dataclass(frozen=True)
+class UploadImageOptions:
+    """
+    How images are prepared before they are uploaded for variations or inpainting.
+
+    :param size: The largest width and height images are uploaded at. Larger images are scaled down to fit,
+        keeping their aspect ratio, while smaller ones are left as they are. ``None`` uploads images at whatever
+        size they are.
+    :param crop: Whether to upload images at exactly ``size`` by ``size`` instead, cropping them to a centered
+        square and resizing them (up or down) in one pass.
+    :param compress_level: The zlib compression level (0-9) of PNGs which have to be encoded. Lower levels
+        are much faster, and barely larger for photographic images.
+    """
+    size: Optional[int] = OPENAI_LABS_IMAGE_SIZE
+    compress_level: int = 1
+    crop: bool = False
+
+    def accepts_png(self, header: bytes) -> bool:
+        """
+        Returns whether a PNG, given by (at least) its first 24 bytes, can be uploaded without re-encoding it.
+        """
+        size = png_size(header)
+        if size is None or self.size is None:
+            return size is not None
+        if self.crop:
+            return size == (self.size, self.size)
+        return max(size) <= self.size
+
+
+DEFAULT_UPLOAD_IMAGE_OPTIONS = UploadImageOptions()
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """
+    Returns the format of an encoded image from its magic bytes (``"png"``, ``"jpeg"``, ``"webp"``, ``"gif"``,
+    ``"tiff"`` or ``"bmp"``), or ``None`` if it is not recognized.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    for signature, name in _SIGNATURES:
+        if data.startswith(signature):
+            return name
+    return None
+
+
+def png_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Returns the ``(width, height)`` of a PNG from its header, or ``None`` if ``data`` does not start with one.
+    """
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def b64decode_strict(data: bytes) -> Optional[bytes]:
+    """
+    Decodes ``data`` if it is entirely valid, padded base64, or returns ``None`` if it is not.
+    """
+    if not data or len(data) % 4:
+        return None
+    try:
+        return base64.b64decode(data, validate=True)
+    except binascii.Error:
+        return None
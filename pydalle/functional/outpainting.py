@@ -0,0 +1,153 @@
+"""
+This module contains the planner for outpainting, i.e. growing an image into a larger canvas one inpainting
+task (tile) at a time.
+
+Every tile overlaps the part of the canvas which is already painted, so that it has something to continue.
+A tile depends on the tiles painted before it which it overlaps, and tiles which do not depend on each other
+can be painted at the same time. Tiles are ordered in rings around the starting image, and within a ring by the
+parity of their row and column, so that neighbouring tiles of a ring end up in different waves.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Tuple, Optional
+
+from pydalle.functional.assumptions import OPENAI_LABS_IMAGE_SIZE
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class Tile:
+    """
+    A square of the canvas to paint with one inpainting task.
+
+    :param index: The position of the tile in :attr:`OutpaintingPlan.tiles`.
+    :param x: The left edge of the tile on the canvas.
+    :param y: The top edge of the tile on the canvas.
+    :param size: The width and height of the tile.
+    :param depends_on: The indexes of the tiles which must be painted first.
+    :param wave: The wave the tile can be painted in, once every earlier wave is done.
+    """
+    index: int
+    x: int
+    y: int
+    size: int
+    depends_on: List[int] = field(default_factory=list)
+    wave: int = 0
+
+    @property
+    def box(self) -> Box:
+        return self.x, self.y, self.x + self.size, self.y + self.size
+
+
+@dataclass
+class OutpaintingPlan:
+    """
+    The tiles to paint to grow the image at ``seed`` (a ``(left, top, right, bottom)`` box) to the whole canvas.
+    """
+    width: int
+    height: int
+    seed: Box
+    tile_size: int
+    overlap: int
+    tiles: List[Tile]
+
+    @property
+    def waves(self) -> List[List[Tile]]:
+        """
+        The tiles grouped by wave. The tiles of a wave do not overlap and can be painted at the same time.
+        """
+        waves: List[List[Tile]] = [[] for _ in range(max((t.wave for t in self.tiles), default=-1) + 1)]
+        for tile in self.tiles:
+            waves[tile.wave].append(tile)
+        return waves
+
+    def known_boxes(self, tile: Tile) -> List[Box]:
+        """
+        Returns the parts of ``tile`` which are painted by the time it is painted, relative to the tile.
+        """
+        boxes = []
+        for box in [self.seed] + [self.tiles[i].box for i in tile.depends_on]:
+            if (overlap := _intersection(box, tile.box)) is not None:
+                boxes.append((overlap[0] - tile.x, overlap[1] - tile.y, overlap[2] - tile.x, overlap[3] - tile.y))
+        return boxes
+
+
+def plan_outpainting(width: int, height: int, seed: Box, tile_size: int = OPENAI_LABS_IMAGE_SIZE,
+                     overlap: int = OPENAI_LABS_IMAGE_SIZE // 4) -> OutpaintingPlan:
+    """
+    Plans the tiles to paint to grow an image into a canvas.
+
+    :param width: The width of the canvas.
+    :param height: The height of the canvas.
+    :param seed: Where the starting image is on the canvas, as a ``(left, top, right, bottom)`` box.
+    :param tile_size: The width and height of every tile, i.e. of the images inpainting works on.
+    :param overlap: How far neighbouring tiles overlap. Larger overlaps give every tile more to go on, at the
+        cost of more tiles.
+    :return: The plan. Tiles which the seed already covers are left out.
+    """
+    if width < tile_size or height < tile_size:
+        raise ValueError(f"The canvas ({width}x{height}) must be at least as large as a tile ({tile_size})")
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"overlap must be at least 0 and less than the tile size ({tile_size}), not {overlap}")
+    left, top, right, bottom = seed
+    if not (0 <= left < right <= width and 0 <= top < bottom <= height):
+        raise ValueError(f"The seed {seed} must lie within the {width}x{height} canvas")
+
+    xs = _positions(width, tile_size, overlap)
+    ys = _positions(height, tile_size, overlap)
+    grid = {(row, col): (x, y) for row, y in enumerate(ys) for col, x in enumerate(xs)}
+
+    # Rings: tiles overlapping the seed first, then tiles overlapping those, and so on
+    ring = {cell: 1 for cell, (x, y) in grid.items()
+            if _intersection(seed, (x, y, x + tile_size, y + tile_size)) is not None}
+    queue = deque(ring)
+    while queue:
+        row, col = queue.popleft()
+        for neighbour in _neighbours(row, col):
+            if neighbour in grid and neighbour not in ring:
+                ring[neighbour] = ring[(row, col)] + 1
+                queue.append(neighbour)
+
+    order = sorted(grid, key=lambda cell: (ring[cell], cell[0] % 2, cell[1] % 2, cell))
+    tiles: List[Tile] = []
+    for row, col in order:
+        x, y = grid[(row, col)]
+        box = (x, y, x + tile_size, y + tile_size)
+        # Tiles the seed covers are skipped, but no others: the grid makes neighbouring tiles overlap, so
+        # leaving out a tile which other tiles happen to cover could leave two of them merely touching
+        if _intersection(seed, box) == box:
+            continue
+        depends_on = [t.index for t in tiles if _intersection(t.box, box) is not None]
+        wave = max((tiles[i].wave + 1 for i in depends_on), default=0)
+        tiles.append(Tile(index=len(tiles), x=x, y=y, size=tile_size, depends_on=depends_on, wave=wave))
+    return OutpaintingPlan(width=width, height=height, seed=seed, tile_size=tile_size, overlap=overlap,
+                           tiles=tiles)
+
+
+def centered_seed(width: int, height: int, seed_width: int, seed_height: int) -> Box:
+    """
+    Returns the box of an image of the given size in the middle of the canvas.
+    """
+    left = (width - seed_width) // 2
+    top = (height - seed_height) // 2
+    return left, top, left + seed_width, top + seed_height
+
+
+def _positions(length: int, tile_size: int, overlap: int) -> List[int]:
+    # Evenly spread tiles with at least the requested overlap, the last one flush with the far edge
+    count = max(1, -(-(length - overlap) // (tile_size - overlap)))
+    if count == 1:
+        return [0]
+    return [round(i * (length - tile_size) / (count - 1)) for i in range(count)]
+
+
+def _neighbours(row: int, col: int) -> List[Tuple[int, int]]:
+    return [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+
+def _intersection(a: Box, b: Box) -> Optional[Box]:
+    box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
@@ -0,0 +1,292 @@
+"""
+This module contains a discrete-event simulator which runs flows against a stand-in API on a virtual clock.
+
+Flows only describe the requests they want sent (including how long to ``sleep`` before each one), so
+thousands of them can be run concurrently against a
+:class:`pydalle.functional.api.standin.labs.StandInLabs` in a fraction of a second of wall time. This makes
+it cheap to compare polling strategies under different queueing, pending times and error rates.
+"""
+
+import heapq
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from pydalle.functional.api.flow.auth0 import get_access_token_flow
+from pydalle.functional.api.flow.labs import DEFAULT_INTERVAL, get_bearer_token_flow, create_text2im_task_flow, \
+    poll_for_task_completion_flow
+from pydalle.functional.api.response.labs import Task
+from pydalle.functional.api.standin.labs import StandInLabs
+from pydalle.functional.assumptions import OPENAI_AUTH0_DOMAIN, OPENAI_AUTH0_CLIENT_ID, OPENAI_AUTH0_AUDIENCE, \
+    OPENAI_LABS_REDIRECT_URI, OPENAI_AUTH0_SCOPE
+from pydalle.functional.types import HttpFlow, HttpRequest, HttpResponse, HttpBatch
+
+MAX_REDIRECTS = 30
+
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class SimulatedFlow:
+    """
+    A flow started by a :class:`Simulator`, and what became of it.
+    """
+
+    def __init__(self, flow: HttpFlow[Any], started: float,
+                 on_done: Optional[Callable[['SimulatedFlow'], None]] = None):
+        self.flow = flow
+        self.started = started
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.requests = 0
+        self._on_done = on_done
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+    def _finish(self, now: float, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.finished = now
+        self.result = result
+        self.error = error
+        if self._on_done is not None:
+            self._on_done(self)
+
+
+class Simulator:
+    """
+    Runs flows concurrently against a backend on a virtual clock.
+
+    Every request is sent after the ``sleep`` it asks for, reaches the backend after half of ``latency``,
+    and its response reaches the flow after the other half. Redirects are followed the way HTTP clients
+    do, each costing another round trip. The requests of an :class:`pydalle.functional.types.HttpBatch`
+    are sent concurrently.
+
+    :param backend: Anything with a ``handle(request, now)`` method, such as
+        :class:`pydalle.functional.api.standin.labs.StandInLabs`.
+    :param latency: The round-trip time of every request, in virtual seconds.
+    :param start: The virtual time to start the clock at.
+    """
+
+    def __init__(self, backend: Any, latency: float = 0.1, start: float = 0.0):
+        self.backend = backend
+        self.latency = latency
+        self.now = start
+        self.requests = 0
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+
+    def schedule(self, at: float, fn: Callable[[], None]) -> None:
+        """
+        Calls ``fn`` once the virtual clock reaches ``at``.
+        """
+        heapq.heappush(self._events, (at, next(self._seq), fn))
+
+    def spawn(self, flow: HttpFlow[Any], at: Optional[float] = None,
+              on_done: Optional[Callable[[SimulatedFlow], None]] = None) -> SimulatedFlow:
+        """
+        Starts running ``flow`` at virtual time ``at`` (default: now).
+
+        :param on_done: Called with the :class:`SimulatedFlow` once it returns or raises.
+        """
+        simulated = SimulatedFlow(flow, self.now if at is None else at, on_done)
+        self.schedule(simulated.started, lambda: self._step(simulated, None))
+        return simulated
+
+    def _step(self, simulated: SimulatedFlow, response: Union[HttpResponse, List[HttpResponse], None]) -> None:
+        try:
+            request = simulated.flow.send(response)
+        except StopIteration as e:
+            simulated._finish(self.now, result=e.value)
+            return
+        except Exception as e:
+            simulated._finish(self.now, error=e)
+            return
+        if isinstance(request, HttpBatch):
+            return self._send_batch(simulated, request.requests)
+        self._send(simulated, request, lambda response: self._step(simulated, response))
+
+    def _send(self, simulated: SimulatedFlow, request: HttpRequest,
+              callback: Callable[[HttpResponse], None]) -> None:
+        simulated.requests += 1
+        self.requests += 1
+        arrives = self.now + (request.sleep or 0) + self.latency / 2
+        self.schedule(arrives, lambda: self._serve(request, callback))
+
+    def _send_batch(self, simulated: SimulatedFlow, requests: List[HttpRequest]) -> None:
+        responses: List[Optional[HttpResponse]] = [None] * len(requests)
+        remaining = len(requests)
+
+        def answered(i: int, response: HttpResponse) -> None:
+            nonlocal remaining
+            responses[i] = response
+            remaining -= 1
+            if remaining == 0:
+                self._step(simulated, responses)
+
+        if not requests:
+            self.schedule(self.now, lambda: self._step(simulated, responses))
+        for i, request in enumerate(requests):
+            self._send(simulated, request, lambda response, i=i: answered(i, response))
+
+    def _serve(self, request: HttpRequest, callback: Callable[[HttpResponse], None], redirects: int = 0) -> None:
+        response = self.backend.handle(request, self.now)
+        location = (response.headers or {}).get("Location")
+        if response.status_code in _REDIRECT_CODES and location and redirects < MAX_REDIRECTS:
+            method = request.method
+            if response.status_code in (301, 302, 303) and method.lower() != "head":
+                method = "get"
+            followed = HttpRequest(method=method, url=urljoin(response.url, location), headers=request.headers,
+                                   data=request.data if method == request.method else None,
+                                   decode=request.decode)
+            self.requests += 1
+            self.schedule(self.now + self.latency, lambda: self._serve(followed, callback, redirects + 1))
+            return
+        self.schedule(self.now + self.latency / 2, lambda: callback(response))
+
+    def run(self, until: Optional[float] = None) -> float:
+        """
+        Processes events until there are none left, or until the virtual clock would pass ``until``.
+
+        :return: The virtual time the simulation stopped at.
+        """
+        while self._events and (until is None or self._events[0][0] <= until):
+            self.now, _, fn = heapq.heappop(self._events)
+            fn()
+        if until is not None:
+            self.now = max(self.now, until)
+        return self.now
+
+
+@dataclass
+class PollStrategy:
+    """
+    A way of polling for task completion, as compared by :func:`simulate_polling`.
+
+    :param name: The name to report the strategy under.
+    :param interval: Seconds to wait between polls (and between retries after a 504).
+    :param max_attempts: How many polls to make before giving up on a task.
+    :param flow: Polls with this instead of
+        :func:`pydalle.functional.api.flow.labs.poll_for_task_completion_flow`, to try out other behaviours.
+        Called with the bearer token and the task ID.
+    """
+    name: str
+    interval: float = DEFAULT_INTERVAL
+    max_attempts: int = 1000
+    flow: Optional[Callable[[str, str], HttpFlow[Task]]] = None
+
+    def poll(self, bearer_token: str, task_id: str) -> HttpFlow[Task]:
+        if self.flow is not None:
+            return self.flow(bearer_token, task_id)
+        return poll_for_task_completion_flow(bearer_token, task_id, interval=self.interval,
+                                             _max_attempts=self.max_attempts)
+
+
+@dataclass
+class SimulationResult:
+    """
+    What happened to the jobs run by :func:`simulate_polling`. All times are in virtual seconds.
+    """
+    strategy: PollStrategy
+    jobs: int
+    succeeded: int = 0
+    rejected: int = 0
+    failed: int = 0
+    requests: int = 0
+    server_errors: int = 0
+    credits_used: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def requests_per_job(self) -> float:
+        return self.requests / self.jobs if self.jobs else 0.0
+
+
+def simulate_polling(strategy: PollStrategy,
+                     jobs: int = 1000,
+                     arrival_rate: Optional[float] = None,
+                     backend: Optional[StandInLabs] = None,
+                     latency: float = 0.1,
+                     caption: str = "A cute cat",
+                     seed: Optional[int] = None) -> SimulationResult:
+    """
+    Logs in, then creates ``jobs`` text2im tasks and polls each one to completion with ``strategy``.
+
+    :param strategy: How to poll for task completion.
+    :param jobs: How many tasks to create.
+    :param arrival_rate: How many jobs start per virtual second on average (as a Poisson process).
+        ``None`` starts them all at once.
+    :param backend: The backend to run against. Use a fresh one per strategy to compare them fairly.
+    :param latency: The round-trip time of every request, in virtual seconds.
+    :param caption: The caption of every task.
+    :param seed: Seed for the job arrival times (and the default backend), for reproducible runs.
+    :return: The outcome of every job. ``latencies`` holds the time from the start of each job
+        which did not fail to its completion.
+    """
+    if backend is None:
+        backend = StandInLabs(seed=seed, credits=max(jobs, 1))
+    rng = random.Random(seed)
+    simulator = Simulator(backend, latency=latency)
+    result = SimulationResult(strategy=strategy, jobs=jobs)
+    credits_before = backend.credits_used
+    errors_before = backend.errors
+
+    def fail(simulated: SimulatedFlow) -> None:
+        result.failed += 1
+        name = type(simulated.error).__name__
+        result.errors[name] = result.errors.get(name, 0) + 1
+
+    def start_job(bearer_token: str, at: float) -> None:
+        def created(simulated: SimulatedFlow) -> None:
+            if simulated.error is not None:
+                return fail(simulated)
+            simulator.spawn(strategy.poll(bearer_token, simulated.result.id), on_done=completed)
+
+        def completed(simulated: SimulatedFlow) -> None:
+            if simulated.error is not None:
+                return fail(simulated)
+            result.latencies.append(simulator.now - at)
+            if simulated.result.status == "rejected":
+                result.rejected += 1
+            else:
+                result.succeeded += 1
+
+        simulator.spawn(create_text2im_task_flow(bearer_token, caption), at=at, on_done=created)
+
+    def logged_in(simulated: SimulatedFlow) -> None:
+        if simulated.error is not None:
+            raise simulated.error
+        at = simulator.now
+        for _ in range(jobs):
+            if arrival_rate is not None:
+                at += rng.expovariate(arrival_rate)
+            start_job(simulated.result, at)
+
+    login = simulator.spawn(_login_flow(), on_done=logged_in)
+    simulator.run()
+    result.requests = simulator.requests - login.requests
+    result.server_errors = backend.errors - errors_before
+    result.credits_used = backend.credits_used - credits_before
+    result.duration = simulator.now - login.finished
+    return result
+
+
+def _login_flow() -> HttpFlow[str]:
+    access_token = yield from get_access_token_flow("simulated", "simulated",
+                                                    domain=OPENAI_AUTH0_DOMAIN,
+                                                    client_id=OPENAI_AUTH0_CLIENT_ID,
+                                                    audience=OPENAI_AUTH0_AUDIENCE,
+                                                    redirect_uri=OPENAI_LABS_REDIRECT_URI,
+                                                    scope=OPENAI_AUTH0_SCOPE,
+                                                    code_verifier="simulated",
+                                                    initial_state="simulated",
+                                                    nonce="simulated")
+    return (yield from get_bearer_token_flow(access_token))
@@ -8,6 +8,8 @@ from dataclasses import dataclass
 from typing import TypeVar, Protocol, Optional, Dict, Generator, Callable, Any, Union, List
 from urllib.parse import urlencode, parse_qs
 
+from pydalle.functional.codec import get_json_codec
+
 T = TypeVar("T")
 _T_co = TypeVar("_T_co", covariant=True)
 
@@ -24,10 +26,21 @@ class HttpRequest:
     url: str
     params: Optional[Dict[str, Union[int, str]]] = None
     headers: Optional[Dict[str, str]] = None
-    data: Optional[str] = None
+    data: Optional[Union[str, bytes]] = None
     sleep: Optional[float] = None
+    # Whether the body of the response is text. Transports may still leave it as bytes, see HttpResponse.text
     decode: bool = True
 
+    @property
+    def text(self) -> Optional[str]:
+        """
+        The body as text. It is decoded from UTF-8 if it is bytes, as the bodies encoded by a JSON codec such as
+        :class:`pydalle.imperative.outside.jsoncodec.OrjsonCodec` are.
+        """
+        if isinstance(self.data, bytes):
+            return self.data.decode("utf-8", errors="replace")
+        return self.data
+
 
 _CENSORED_REQUEST_KEYS = {"authorization", "password", "code", "code_verifier"}
 
@@ -38,9 +51,22 @@ class HttpResponse:
     url: str
     content: Union[str, bytes]
     request: HttpRequest
+    headers: Optional[Dict[str, str]] = None
 
     def json(self, **kwargs) -> 'JsonValue':
-        return json.loads(self.content, **kwargs)
+        if kwargs:
+            return json.loads(self.content, **kwargs)
+        return get_json_codec().loads(self.content)
+
+    @property
+    def text(self) -> str:
+        """
+        The content as text. Text responses are decoded from UTF-8 here if the transport left them as bytes, so that
+        those which are only parsed as JSON are never decoded.
+        """
+        if isinstance(self.content, str):
+            return self.content
+        return self.content.decode("utf-8", errors="replace")
 
     def _to_censored_response(self) -> 'HttpResponse':
         """
@@ -59,6 +85,7 @@ class HttpResponse:
                     new.request.headers[header] = "***REDACTED***"
         # Censor data
         if new.request.data:
+            new.request.data = new.request.text
             try:
                 # If it's JSON...
                 data = json.loads(new.request.data)
@@ -66,7 +93,7 @@ class HttpResponse:
                     if key.lower() in _CENSORED_REQUEST_KEYS:
                         data[key] = "***REDACTED***"
                 new.request.data = json.dumps(data)
-            except json.JSONDecodeError:
+            except (TypeError, ValueError):
                 pass
             try:
                 # If it's a query string...
@@ -80,8 +107,18 @@ class HttpResponse:
         return new
 
 
+@dataclass
+class HttpBatch:
+    """
+    Yielded by a flow instead of a single :class:`HttpRequest` to have several requests sent concurrently.
+    The flow is sent back a list of the responses, in the same order as the requests.
+    """
+    requests: List[HttpRequest]
+
+
 HttpFlow = Generator[HttpRequest, HttpResponse, T]
 HttpFlowFunc = Callable[[Any], HttpFlow[T]]
+HttpBatchFlow = Generator[Union[HttpRequest, HttpBatch], Union[HttpResponse, List[HttpResponse]], T]
 
 
 class FlowError(Exception):
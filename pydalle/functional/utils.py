@@ -2,10 +2,11 @@
 This module contains functional utilities used throughout the codebase.
 """
 
-from typing import Optional
+import unicodedata
+from typing import Optional, List, Union, Dict, Any, Tuple, Sequence, Callable
 from urllib.parse import parse_qs, urlparse
 
-from pydalle.functional.types import HttpResponse, JsonDict, FlowError
+from pydalle.functional.types import HttpResponse, JsonDict, FlowError, HttpRequest, HttpBatch, HttpBatchFlow, T
 
 
 def get_query_param(url: str, param: str) -> str:
@@ -33,5 +34,100 @@ def try_json(r: HttpResponse, status_code: Optional[int] = None) -> JsonDict:
     return out
 
 
+def parse_error(r: HttpResponse) -> Callable[[int, Exception], FlowError]:
+    """
+    Returns the ``error`` factory to parse the lists in a response with, so that an item which fails to parse on
+    first access (possibly long after the flow has returned) raises a :class:`FlowError` with the response, like
+    any other parse failure.
+    """
+    return lambda index, e: FlowError(f"Failed to parse item {index} of a list in the response", r)
+
+
 def filter_none(d: JsonDict) -> JsonDict:
     return {k: v for k, v in d.items() if v is not None}
+
+
+def normalize_caption(caption: str) -> str:
+    """
+    Normalizes a caption for comparison: Unicode compatibility forms are folded, case is ignored and runs of
+    whitespace count as a single space.
+    """
+    return " ".join(unicodedata.normalize("NFKC", caption).casefold().split())
+
+
+def gather_flows(*flows: HttpBatchFlow[T]) -> HttpBatchFlow[List[T]]:
+    """
+    Runs the given flows side by side and returns a list of their results, in order.
+
+    Each time, the next request of every unfinished flow is yielded as one :class:`HttpBatch`, so that the
+    requests can be sent concurrently. If any flow raises, the others are closed and the exception propagates.
+    """
+    results: List[Any] = [None] * len(flows)
+    pending: Dict[int, Union[HttpRequest, HttpBatch]] = {}
+    try:
+        for i, flow in enumerate(flows):
+            try:
+                pending[i] = next(flow)
+            except StopIteration as e:
+                results[i] = e.value
+        while pending:
+            for i, value in _split_responses(pending, (yield _merge_requests(pending.values()))):
+                try:
+                    pending[i] = flows[i].send(value)
+                except StopIteration as e:
+                    del pending[i]
+                    results[i] = e.value
+        return results
+    finally:
+        for i in pending:
+            flows[i].close()
+
+
+def race_flows(*flows: HttpBatchFlow[T]) -> HttpBatchFlow[T]:
+    """
+    Runs the given flows side by side, like :func:`gather_flows`, and returns the result of whichever
+    finishes first (the earliest given, if several finish on the same batch). The other flows are closed.
+    """
+    if not flows:
+        raise ValueError("race_flows needs at least one flow")
+    pending: Dict[int, Union[HttpRequest, HttpBatch]] = {}
+    try:
+        for i, flow in enumerate(flows):
+            try:
+                pending[i] = next(flow)
+            except StopIteration as e:
+                return e.value
+        while True:
+            for i, value in _split_responses(pending, (yield _merge_requests(pending.values()))):
+                try:
+                    pending[i] = flows[i].send(value)
+                except StopIteration as e:
+                    del pending[i]
+                    return e.value
+    finally:
+        for i in pending:
+            flows[i].close()
+
+
+def _merge_requests(items: Sequence[Union[HttpRequest, HttpBatch]]) -> HttpBatch:
+    requests = []
+    for item in items:
+        if isinstance(item, HttpBatch):
+            requests.extend(item.requests)
+        else:
+            requests.append(item)
+    return HttpBatch(requests)
+
+
+def _split_responses(pending: Dict[int, Union[HttpRequest, HttpBatch]],
+                     responses: List[HttpResponse]) -> List[Tuple[int, Union[HttpResponse, List[HttpResponse]]]]:
+    out = []
+    offset = 0
+    for i, item in pending.items():
+        if isinstance(item, HttpBatch):
+            out.append((i, responses[offset:offset + len(item.requests)]))
+            offset += len(item.requests)
+        else:
+            out.append((i, responses[offset]))
+            offset += 1
+    return out
@@ -1,17 +1,24 @@
 """
 This module contains the implementations of calls to the Auth0 API.
 """
-from typing import Optional, Dict
+import time
+from functools import partial
+from os import PathLike
+from typing import Optional, Dict, Union
 
 from pydalle.functional.api.flow.auth0 import get_access_token_flow
+from pydalle.functional.api.flow.resumable import AccessTokenState
 from pydalle.functional.api.request.auth0 import urlsafe_b64encode_string
-from pydalle.imperative.outside.internet import session_flow, session_flow_async
+from pydalle.imperative.outside.files import write_flow_state
+from pydalle.imperative.outside.internet import session_flow, session_flow_async, Transport
 from pydalle.imperative.outside.sysrand import secure_random_choice
 
 
 def get_access_token_from_credentials(username: str, password: str, domain: str, client_id: str,
-                                      audience: str, redirect_uri: str, scope: str, headers: Optional[Dict[str, str]] = None) -> str:
-    return session_flow(get_access_token_flow, headers,
+                                      audience: str, redirect_uri: str, scope: str,
+                                      headers: Optional[Dict[str, str]] = None,
+                                      transport: Optional[Transport] = None) -> str:
+    return session_flow(get_access_token_flow, headers, transport,
                         username=username, password=password, domain=domain,
                         client_id=client_id, audience=audience,
                         redirect_uri=redirect_uri, scope=scope,
@@ -22,8 +29,9 @@ def get_access_token_from_credentials(username: str, password: str, domain: str,
 
 async def get_access_token_from_credentials_async(username: str, password: str, domain: str, client_id: str,
                                  audience: str, redirect_uri: str, scope: str,
-                                 headers: Optional[Dict[str, str]] = None) -> str:
-    return await session_flow_async(get_access_token_flow, headers,
+                                 headers: Optional[Dict[str, str]] = None,
+                                 transport: Optional[Transport] = None) -> str:
+    return await session_flow_async(get_access_token_flow, headers, transport,
                                     username=username, password=password, domain=domain,
                                     client_id=client_id, audience=audience,
                                     redirect_uri=redirect_uri, scope=scope,
@@ -32,6 +40,32 @@ async def get_access_token_from_credentials_async(username: str, password: str,
                                     nonce=_random_secure_urlsafe_b64encoded_string())
 
 
+def new_access_token_state(domain: str, client_id: str, audience: str, redirect_uri: str,
+                           scope: str) -> AccessTokenState:
+    return AccessTokenState(domain=domain, client_id=client_id, audience=audience, redirect_uri=redirect_uri,
+                            scope=scope, code_verifier=_random_secure_string(),
+                            initial_state=_random_secure_urlsafe_b64encoded_string(),
+                            nonce=_random_secure_urlsafe_b64encoded_string())
+
+
+def resume_access_token_from_credentials(username: str, password: str, state: AccessTokenState,
+                                         checkpoint: Optional[Union[str, PathLike]] = None,
+                                         headers: Optional[Dict[str, str]] = None,
+                                         transport: Optional[Transport] = None) -> str:
+    on_checkpoint = partial(write_flow_state, checkpoint) if checkpoint is not None else None
+    return session_flow(state.access_token_flow, headers, transport, username=username, password=password,
+                        clock=time.time, on_checkpoint=on_checkpoint)
+
+
+async def resume_access_token_from_credentials_async(username: str, password: str, state: AccessTokenState,
+                                                     checkpoint: Optional[Union[str, PathLike]] = None,
+                                                     headers: Optional[Dict[str, str]] = None,
+                                                     transport: Optional[Transport] = None) -> str:
+    on_checkpoint = partial(write_flow_state, checkpoint) if checkpoint is not None else None
+    return await session_flow_async(state.access_token_flow, headers, transport, username=username,
+                                    password=password, clock=time.time, on_checkpoint=on_checkpoint)
+
+
 def _random_secure_urlsafe_b64encoded_string() -> str:
     """
     https://auth0.com/docs/get-started/authentication-and-authorization-flow/call-your-api-using-the-authorization-code-flow-with-pkce#javascript-sample
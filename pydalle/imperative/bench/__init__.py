@@ -0,0 +1,4 @@
+"""
+This package contains tools for measuring the performance of pydalle, such as the load generator
+behind ``pydalle bench`` and the polling strategy simulator behind ``pydalle simulate``.
+"""
@@ -0,0 +1,388 @@
+"""
+This module contains the end-to-end load generator behind ``pydalle bench``.
+
+It drives a weighted mix of operations through a real :class:`pydalle.imperative.client.dalle.Dalle`
+client, either against a given base URL or against an in-process
+:class:`pydalle.imperative.outside.standin.StandInServer`, and reports throughput and latency as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple, Any, Deque
+
+from pydalle.functional.api.standin.labs import StandInLabs
+from pydalle.imperative.client.dalle import Dalle
+from pydalle.imperative.client.responses import WrappedTask, WrappedGeneration
+from pydalle.imperative.outside.cassette import RecordingTransport, ReplayTransport
+from pydalle.imperative.outside.internet import CountingTransport, RebaseTransport
+from pydalle.imperative.outside.standin import StandInServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+OPERATIONS = ("text2im", "variations", "inpainting", "poll", "download")
+MODES = ("sync", "threads", "async")
+DEFAULT_MIX = {"text2im": 2, "variations": 1, "inpainting": 1, "poll": 3, "download": 4}
+
+_CAPTIONS = ("A cute cat", "An astronaut riding a horse", "A bowl of soup that is a portal to another dimension")
+_KEEP = 64
+
+
+class _State:
+    """
+    Tasks and images produced by earlier operations, which later operations build on.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pending: Deque[WrappedTask] = deque()
+        self.generations: Deque[WrappedGeneration] = deque(maxlen=_KEEP)
+        self.images: Deque[bytes] = deque(maxlen=8)
+        self.latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+        self.errors: Dict[str, int] = {op: 0 for op in OPERATIONS}
+        self.completed_tasks = 0
+        self.started = 0
+
+    def claim(self, total: int) -> bool:
+        with self.lock:
+            if self.started >= total:
+                return False
+            self.started += 1
+            return True
+
+    def take(self, op: str) -> Tuple[str, Tuple[Any, ...]]:
+        """
+        Picks the arguments for ``op``, falling back to the operation which produces them if there are none yet.
+        """
+        with self.lock:
+            if op == "inpainting" and not self.images:
+                op = "download"
+            if op in ("variations", "inpainting", "download") and not self.generations:
+                op = "poll"
+            if op == "poll" and not self.pending:
+                op = "text2im"
+            if op == "text2im":
+                return op, (self.rng.choice(_CAPTIONS),)
+            if op == "poll":
+                return op, (self.pending.popleft(),)
+            if op == "inpainting":
+                return op, (self.rng.choice(self.generations), self.rng.choice(self.images))
+            return op, (self.rng.choice(self.generations),)
+
+    def created(self, task: WrappedTask) -> None:
+        with self.lock:
+            self.pending.append(task)
+
+    def finished(self, task: WrappedTask) -> None:
+        with self.lock:
+            self.completed_tasks += 1
+            if task.generations:
+                self.generations.extend(task.generations)
+
+    def downloaded(self, image: bytes) -> None:
+        with self.lock:
+            self.images.append(image)
+
+    def record(self, op: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                self.latencies[op].append(seconds)
+            else:
+                self.errors[op] += 1
+
+
+def _run_op(client: Dalle, state: _State, op: str, interval: float, direct: bool) -> None:
+    op, args = state.take(op)
+    start = time.perf_counter()
+    ok = False
+    try:
+        if op == "text2im":
+            state.created(client.create_text2im_task(args[0]))
+        elif op == "variations":
+            state.created(client.create_variations_task(args[0]))
+        elif op == "inpainting":
+            state.created(client.create_inpainting_task("A cute cat, with a dark side", masked_image=args[1],
+                                                        parent=args[0]))
+        elif op == "poll":
+            state.finished(client.poll_for_task_completion(args[0], interval=interval))
+        else:
+            state.downloaded(bytes(client.download_generation(args[0], direct=direct)))
+        ok = True
+    finally:
+        state.record(op, time.perf_counter() - start, ok)
+
+
+async def _run_op_async(client: Dalle, state: _State, op: str, interval: float, direct: bool) -> None:
+    op, args = state.take(op)
+    start = time.perf_counter()
+    ok = False
+    try:
+        if op == "text2im":
+            state.created(await client.create_text2im_task_async(args[0]))
+        elif op == "variations":
+            state.created(await client.create_variations_task_async(args[0]))
+        elif op == "inpainting":
+            state.created(await client.create_inpainting_task_async("A cute cat, with a dark side",
+                                                                    masked_image=args[1], parent=args[0]))
+        elif op == "poll":
+            state.finished(await client.poll_for_task_completion_async(args[0], interval=interval))
+        else:
+            state.downloaded(bytes(await client.download_generation_async(args[0], direct=direct)))
+        ok = True
+    finally:
+        state.record(op, time.perf_counter() - start, ok)
+
+
+def _pick(state: _State, mix: Dict[str, float]) -> str:
+    with state.lock:
+        return state.rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+def _worker(client: Dalle, state: _State, mix: Dict[str, float], operations: int, deadline: float,
+            interval: float, direct: bool) -> None:
+    while time.perf_counter() < deadline and state.claim(operations):
+        try:
+            _run_op(client, state, _pick(state, mix), interval, direct)
+        except Exception:
+            pass
+
+
+async def _worker_async(client: Dalle, state: _State, mix: Dict[str, float], operations: int, deadline: float,
+                        interval: float, direct: bool) -> None:
+    while time.perf_counter() < deadline and state.claim(operations):
+        try:
+            await _run_op_async(client, state, _pick(state, mix), interval, direct)
+        except Exception:
+            pass
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    Returns the ``p``-th percentile (0-100) of ``values`` using the nearest-rank method.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(-(-p * len(ordered) // 100)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Returns the peak resident set size of this process in bytes, if the platform can tell.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_bench(base_url: Optional[str] = None,
+              mode: str = "sync",
+              workers: int = 4,
+              operations: int = 200,
+              duration: Optional[float] = None,
+              mix: Optional[Dict[str, float]] = None,
+              interval: float = 0.25,
+              direct: bool = False,
+              username: str = "bench",
+              password: str = "bench",
+              standin: Optional[StandInLabs] = None,
+              seed: Optional[int] = None,
+              record: Optional[str] = None,
+              replay: Optional[str] = None,
+              replay_speed: Optional[float] = None,
+              trace_allocations: bool = False) -> Dict[str, Any]:
+    """
+    Runs a workload against ``base_url`` (or an in-process stand-in server) and returns the results.
+
+    :param base_url: The server to send all labs and Auth0 requests to. If not given, a
+        :class:`pydalle.imperative.outside.standin.StandInServer` is started for the duration of the run.
+    :param mode: ``"sync"`` (one thread), ``"threads"`` (a pool of ``workers`` threads) or
+        ``"async"`` (``workers`` coroutines on one event loop).
+    :param workers: The number of concurrent workers for the ``"threads"`` and ``"async"`` modes.
+    :param operations: The total number of operations to run.
+    :param duration: Optionally stop after this many seconds, even if not all operations have run.
+    :param mix: Relative weights of the operations in :data:`OPERATIONS`. Defaults to :data:`DEFAULT_MIX`.
+    :param interval: The polling interval to use when waiting for tasks.
+    :param direct: Whether to download generations directly instead of through the download endpoint.
+    :param username: The username to log in with.
+    :param password: The password to log in with.
+    :param standin: The stand-in to serve if no ``base_url`` is given.
+    :param seed: Seed for choosing operations, for reproducible runs.
+    :param record: Record all traffic to this cassette file
+        (see :class:`pydalle.imperative.outside.cassette.RecordingTransport`).
+    :param replay: Answer all requests from this cassette file instead of a server
+        (see :class:`pydalle.imperative.outside.cassette.ReplayTransport`).
+    :param replay_speed: How fast to replay recorded latency and sleeps. ``None`` skips them entirely.
+    :param trace_allocations: Whether to report the peak memory allocated by Python during the run.
+        This slows the run down noticeably.
+    :return: A JSON-serializable dictionary of results.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    mix = {op: weight for op, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+    if unknown := set(mix) - set(OPERATIONS):
+        raise ValueError(f"Unknown operations in mix: {sorted(unknown)}")
+    if not mix:
+        raise ValueError("mix must give at least one operation a positive weight")
+
+    with ExitStack() as stack:
+        server = None
+        if replay is not None:
+            inner = ReplayTransport(replay, speed=replay_speed)
+        else:
+            if base_url is None:
+                server = stack.enter_context(StandInServer(
+                    standin if standin is not None else StandInLabs(pending_time=1.0, credits=10 ** 9)))
+            inner = RebaseTransport(server.base_url if server is not None else base_url)
+        if record is not None:
+            inner = stack.enter_context(RecordingTransport(record, inner))
+        transport = CountingTransport(inner)
+        client = Dalle(username, password, transport=transport)
+        if trace_allocations:
+            tracemalloc.start()
+            stack.callback(tracemalloc.stop)
+        cpu_start = time.process_time()
+        state = _State(seed)
+        deadline = float("inf") if duration is None else time.perf_counter() + duration
+        worker_args = (client, state, mix, operations, deadline, interval, direct)
+
+        if mode == "async":
+            async def main():
+                await client.refresh_tokens_async()
+                start = time.perf_counter()
+                await asyncio.gather(*(_worker_async(*worker_args) for _ in range(workers)))
+                return start
+
+            start = asyncio.run(main())
+        else:
+            client.refresh_tokens()
+            start = time.perf_counter()
+            if mode == "sync":
+                _worker(*worker_args)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for future in [executor.submit(_worker, *worker_args) for _ in range(workers)]:
+                        future.result()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        results = {
+            "mode": mode,
+            "workers": 1 if mode == "sync" else workers,
+            "base_url": base_url,
+            "elapsed_s": elapsed,
+            "cpu_s": cpu,
+            "operations": sum(len(v) for v in state.latencies.values()) + sum(state.errors.values()),
+            "requests": transport.requests,
+            "requests_per_s": transport.requests / elapsed if elapsed else None,
+            "completed_tasks": state.completed_tasks,
+            "completed_tasks_per_s": state.completed_tasks / elapsed if elapsed else None,
+            "retries": transport.retries,
+            "bytes_sent": transport.bytes_sent,
+            "bytes_received": transport.bytes_received,
+            "latency_s": {op: {"count": len(values),
+                               "errors": state.errors[op],
+                               "p50": percentile(values, 50),
+                               "p95": percentile(values, 95),
+                               "p99": percentile(values, 99)}
+                          for op, values in state.latencies.items() if values or state.errors[op]},
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+        if trace_allocations:
+            results["peak_allocated_bytes"] = tracemalloc.get_traced_memory()[1]
+        if replay is not None:
+            results["replay"] = {"path": replay, "speed": replay_speed, "misses": inner.misses}
+        if server is not None:
+            results["standin"] = server.backend.summary()
+        return results
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        op, _, weight = part.partition("=")
+        try:
+            mix[op.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {op!r}: {weight!r}")
+    return mix
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--base-url", help="Send all requests to this server instead of an in-process stand-in")
+    parser.add_argument("--mode", choices=MODES, default="sync")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent workers (threads and async modes)")
+    parser.add_argument("--operations", type=int, default=200, help="Total number of operations to run")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="Operation weights, e.g. text2im=2,variations=1,inpainting=1,poll=3,download=4")
+    parser.add_argument("--interval", type=float, default=0.25, help="Polling interval in seconds")
+    parser.add_argument("--direct", action="store_true", help="Download generations without the watermark")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--pending-time", type=float, default=1.0,
+                        help="Seconds the in-process stand-in takes per task")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Probability of a 504 from the in-process stand-in")
+    parser.add_argument("--standin-workers", type=int,
+                        help="Tasks the in-process stand-in works on at once (default: unbounded)")
+    parser.add_argument("--record", help="Record all traffic to this cassette file")
+    parser.add_argument("--replay", help="Answer all requests from this cassette file instead of a server")
+    parser.add_argument("--replay-speed", type=float,
+                        help="Replay recorded latency and sleeps at this speed (default: skip them)")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="Report the peak memory allocated by Python (slow)")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+
+
+def main(args: argparse.Namespace) -> int:
+    standin = StandInLabs(pending_time=args.pending_time, error_rate=args.error_rate, workers=args.standin_workers,
+                          credits=10 ** 9, seed=args.seed)
+    results = run_bench(base_url=args.base_url, mode=args.mode, workers=args.workers, operations=args.operations,
+                        duration=args.duration, mix=args.mix, interval=args.interval, direct=args.direct,
+                        username=args.username, password=args.password, standin=standin, seed=args.seed,
+                        record=args.record, replay=args.replay, replay_speed=args.replay_speed,
+                        trace_allocations=args.trace_allocations)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+def add_standin_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pending-time", type=float, default=1.0, help="Seconds the stand-in takes per task")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 504 per labs request")
+    parser.add_argument("--workers", type=int, help="Tasks the stand-in works on at once (default: unbounded)")
+    parser.add_argument("--seed", type=int)
+
+
+def standin_main(args: argparse.Namespace) -> int:
+    standin = StandInLabs(pending_time=args.pending_time, error_rate=args.error_rate, workers=args.workers,
+                          credits=10 ** 9, seed=args.seed)
+    server = StandInServer(standin, host=args.host, port=args.port)
+    print(f"Serving a stand-in labs API on {server.base_url} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,112 @@
+"""
+This module contains the polling strategy comparison behind ``pydalle simulate``.
+
+It runs :func:`pydalle.functional.simulation.simulate_polling` once per strategy, each against a fresh
+:class:`pydalle.functional.api.standin.labs.StandInLabs` with the same seed, and reports request volume,
+completion latency and credit usage as JSON, along with how much wall time each simulation took.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import List, Dict, Any, Optional
+
+from pydalle.functional.api.standin.labs import StandInLabs
+from pydalle.functional.simulation import PollStrategy, simulate_polling
+from pydalle.imperative.bench.load import percentile
+
+DEFAULT_STRATEGIES = (
+    PollStrategy("interval=0.25", interval=0.25),
+    PollStrategy("interval=0.5", interval=0.5),
+    PollStrategy("interval=1", interval=1.0),
+    PollStrategy("interval=2", interval=2.0),
+    PollStrategy("interval=5", interval=5.0),
+)
+
+
+def compare_strategies(strategies: List[PollStrategy],
+                       jobs: int = 1000,
+                       arrival_rate: Optional[float] = None,
+                       latency: float = 0.1,
+                       seed: Optional[int] = None,
+                       **standin_kwargs: Any) -> Dict[str, Any]:
+    """
+    Simulates every strategy on the same workload and returns a JSON-serializable report.
+
+    :param strategies: The polling strategies to compare.
+    :param jobs: How many tasks to create and poll per strategy.
+    :param arrival_rate: How many jobs start per virtual second on average. ``None`` starts them all at once.
+    :param latency: The round-trip time of every request, in virtual seconds.
+    :param seed: Seed for the stand-in and the job arrival times, for reproducible runs.
+    :param standin_kwargs: Passed on to :class:`pydalle.functional.api.standin.labs.StandInLabs`.
+    :return: A JSON-serializable dictionary of results, keyed by strategy name.
+    """
+    standin_kwargs.setdefault("credits", max(jobs, 1))
+    report = {}
+    for strategy in strategies:
+        backend = StandInLabs(seed=seed, **standin_kwargs)
+        start = time.perf_counter()
+        result = simulate_polling(strategy, jobs=jobs, arrival_rate=arrival_rate, backend=backend,
+                                  latency=latency, seed=seed)
+        wall = time.perf_counter() - start
+        report[strategy.name] = {
+            "interval": strategy.interval,
+            "max_attempts": strategy.max_attempts,
+            "jobs": result.jobs,
+            "succeeded": result.succeeded,
+            "rejected": result.rejected,
+            "failed": result.failed,
+            "errors": result.errors,
+            "requests": result.requests,
+            "requests_per_job": result.requests_per_job,
+            "server_errors": result.server_errors,
+            "credits_used": result.credits_used,
+            "latency_s": {"mean": statistics.mean(result.latencies) if result.latencies else None,
+                          "p50": percentile(result.latencies, 50),
+                          "p95": percentile(result.latencies, 95),
+                          "p99": percentile(result.latencies, 99)},
+            "simulated_s": result.duration,
+            "wall_s": wall,
+        }
+    return report
+
+
+def _parse_strategy(value: str) -> PollStrategy:
+    interval, _, max_attempts = value.partition(":")
+    try:
+        return PollStrategy(value, interval=float(interval), max_attempts=int(max_attempts) if max_attempts else 1000)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid strategy {value!r}, expected INTERVAL[:MAX_ATTEMPTS]")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--strategy", type=_parse_strategy, action="append", dest="strategies",
+                        help="A polling strategy as INTERVAL[:MAX_ATTEMPTS], e.g. 0.5 or 2:30. "
+                             "May be given more than once (default: intervals of 0.25, 0.5, 1, 2 and 5)")
+    parser.add_argument("--jobs", type=int, default=1000, help="Tasks to create and poll per strategy")
+    parser.add_argument("--arrival-rate", type=float,
+                        help="Jobs started per simulated second (default: all at once)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Round-trip time of every request in seconds")
+    parser.add_argument("--pending-time", type=float, default=10.0, help="Seconds the stand-in takes per task")
+    parser.add_argument("--pending-jitter", type=float, default=0.25,
+                        help="Fraction by which the pending time randomly varies per task")
+    parser.add_argument("--workers", type=int, help="Tasks the stand-in works on at once (default: unbounded)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 504 per labs request")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Probability of a task being rejected")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+
+
+def main(args: argparse.Namespace) -> int:
+    report = compare_strategies(args.strategies or list(DEFAULT_STRATEGIES), jobs=args.jobs,
+                                arrival_rate=args.arrival_rate, latency=args.latency, seed=args.seed,
+                                pending_time=args.pending_time, pending_jitter=args.pending_jitter,
+                                workers=args.workers, error_rate=args.error_rate, reject_rate=args.reject_rate)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
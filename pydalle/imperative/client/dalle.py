@@ -2,17 +2,51 @@
 A user-friendly interface for the low-level functional API of pydalle.
 """
 
-from typing import Optional, Union, Iterable
-
-from pydalle.functional.api.response.labs import Generation, Task
-from pydalle.functional.types import HttpRequest
+import asyncio
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor, Future
+from typing import Optional, Union, Iterable, Tuple, Iterator, AsyncIterable, AsyncIterator, Dict, List, Set
+
+from pydalle.functional.api.response.labs import Generation, Task, TaskList, RAW_MODES
+from pydalle.functional.images import UploadImageOptions, DEFAULT_UPLOAD_IMAGE_OPTIONS
+from pydalle.functional.types import HttpRequest, T
 from pydalle.imperative.api import labs
-from pydalle.imperative.outside.internet import request, request_async
+from pydalle.imperative.outside.cache import ResponseCache, CachingTransport, ImageCache, UploadCache
+from pydalle.imperative.outside.index import TaskIndex
+from pydalle.imperative.outside.internet import Transport
 from pydalle.imperative.client.responses import WrappedLogin, WrappedBillingInfo, WrappedUserFlag, WrappedCollection, \
     WrappedGeneration, WrappedImage, WrappedTask, WrappedTaskList, GenerationLike, get_generation_id, TaskLike, \
     get_task_id, ParentLike, get_parent_id_or_png_base64, get_parent_id_or_png_base64_async, ImageLike, \
-    get_image_png_base64, get_image_png_base64_async
+    get_image_png_base64, get_image_png_base64_async, get_upload_key, get_parent_id, Downloadable, DownloadResult, \
+    download_all, download_all_async
+from pydalle.imperative.client.outpainting import Outpainter, SeedLike
 from pydalle.imperative.client.utils import requires_authentication, requires_authentication_async
+from pydalle.imperative.outside.pil import PILImageType
+
+_FILETYPES = {"watermarked": "png", "direct": "webp"}
+_GENERATION_INDEX_SIZE = 4096
+# How many prefetched images are kept in memory without an image cache, and how many tasks created with an uploaded
+# image may be waiting to succeed before their prompt is recorded as the image's parent
+_PREFETCH_KEEP = 64
+_PENDING_PARENTS_SIZE = 1024
+
+
+def _next_page_cursor(page: TaskList, from_ts: int, page_size: int) -> Optional[Tuple[int, Set[str]]]:
+    # from_ts is inclusive, so the next page starts at the newest timestamp of this one, and the tasks of this page
+    # created at that time are skipped there. A page whose tasks were all created at from_ts can't move the cursor,
+    # so the next one starts a second later. The history ends with an empty page; a short page doesn't mean much,
+    # as the server may return fewer tasks than asked for.
+    if not page:
+        return None
+    newest = max(task.created for task in page)
+    if newest == from_ts:
+        if len(page) >= page_size:
+            warnings.warn(f"At least {len(page)} tasks were created at {from_ts}, so some of them may be skipped",
+                          RuntimeWarning)
+        return from_ts + 1, set()
+    return newest, {task.id for task in page if task.created == newest}
 
 
 class Dalle:
@@ -20,18 +54,56 @@ class Dalle:
     A user-friendly interface for the low-level functional API of pydalle.
     """
 
-    def __init__(self, username: str, password: str, /, headers: Optional[dict] = None):
+    def __init__(self, username: str, password: str, /, headers: Optional[dict] = None,
+                 transport: Optional[Transport] = None, cache: Optional[ResponseCache] = None,
+                 image_cache: Optional[ImageCache] = None, image_executor: Optional[Executor] = None,
+                 upload_options: Optional[UploadImageOptions] = None, upload_cache: Optional[UploadCache] = None,
+                 prefetch: Optional[str] = None, prefetch_workers: int = 4, task_index: Optional[TaskIndex] = None,
+                 raw_mode: str = "keep"):
         """
         Creates a new Dalle instance.
 
         :param username: The username to use when logging in.
         :param password: The password to use when logging in.
         :param headers: Optional headers to use when making requests.
+        :param transport: Optional transport to send requests with (e.g. a
+            :class:`pydalle.imperative.outside.internet.RebaseTransport` pointing at a stand-in server).
+        :param cache: Optional cache to answer repeated requests from, e.g. a
+            :class:`pydalle.imperative.outside.cache.MemoryCache` or a
+            :class:`pydalle.imperative.outside.cache.DiskCache`.
+            Finished tasks, generations and images are cached indefinitely, and login and billing info for a while.
+            For finer control, pass a :class:`pydalle.imperative.outside.cache.CachingTransport` as ``transport``.
+        :param image_cache: Optional :class:`pydalle.imperative.outside.cache.ImageCache` to keep downloaded
+            images in, so that each generation is only downloaded once (per variant).
+        :param image_executor: Optional executor for the async API to convert images on, e.g. a
+            ``ProcessPoolExecutor``. Defaults to the one set with
+            :func:`pydalle.imperative.outside.pil.set_image_executor`, or else the event loop's default executor.
+        :param upload_options: How to prepare images uploaded for variations and inpainting (the size to
+            upload them at and how hard to compress them), as a
+            :class:`pydalle.functional.images.UploadImageOptions`.
+        :param upload_cache: Optional :class:`pydalle.imperative.outside.cache.UploadCache` remembering uploaded
+            images, so that editing the same image again refers to it by its prompt ID instead of uploading it.
+        :param prefetch: Optionally, which images to start downloading as soon as a task polled for succeeds:
+            ``"watermarked"`` or ``"direct"`` (see :meth:`download_generation`). Downloading a generation then
+            returns the prefetched image, or waits for the download in flight. Prefetched images are put in the
+            ``image_cache``, or without one, are kept in memory until they are downloaded, up to the 64 most
+            recently prefetched ones.
+        :param prefetch_workers: How many threads the synchronous API prefetches images with.
+        :param task_index: Optional :class:`pydalle.imperative.outside.index.TaskIndex` to add every task polled
+            for to, and to find tasks to reuse in (see :meth:`text2im`).
+        :param raw_mode: How response objects keep the dicts they were parsed from (their ``raw`` attributes):
+            ``"keep"`` as they are, ``"lazy"`` as compact JSON which is decoded on first use, or ``"drop"`` not at
+            all. See :func:`pydalle.functional.api.response.labs.with_raw`. The latter two take a fraction of the
+            memory when holding many tasks.
         """
         if not username:
             raise ValueError("username must not be empty")
         if not password:
             raise ValueError("password must not be empty")
+        if raw_mode not in RAW_MODES:
+            raise ValueError(f"raw_mode must be one of {', '.join(map(repr, RAW_MODES))}, not {raw_mode!r}")
+        if prefetch is not None and prefetch not in _FILETYPES:
+            raise ValueError(f"prefetch must be one of {', '.join(map(repr, _FILETYPES))} or None, not {prefetch!r}")
 
         self.__username = username
         self.__password = password
@@ -39,6 +111,26 @@ class Dalle:
         self.__bearer_token = None
 
         self.headers = headers
+        self.transport = transport if transport is not None else Transport()
+        if cache is not None:
+            self.transport = CachingTransport(cache, inner=self.transport)
+        self.image_cache = image_cache
+        self.image_executor = image_executor
+        self.upload_options = upload_options if upload_options is not None else DEFAULT_UPLOAD_IMAGE_OPTIONS
+        self.upload_cache = upload_cache
+        self.prefetch = prefetch
+        self.prefetch_workers = prefetch_workers
+        self.task_index = task_index
+        self.raw_mode = raw_mode
+        self._prefetch_executor: Optional[ThreadPoolExecutor] = None
+        self._prefetches: Dict[Tuple[str, str], Union[Future, asyncio.Future]] = {}
+        self._prefetch_lock = threading.Lock()
+        # The upload cache keys of the images tasks were created with, by task ID, until the tasks finish
+        self._pending_parents: 'OrderedDict[str, str]' = OrderedDict()
+        self._pending_parents_lock = threading.Lock()
+        # The generations of tasks seen recently, so that generation IDs can be resolved without a request
+        self._generation_index: 'OrderedDict[str, Union[Generation, Tuple[TaskList, int, int]]]' = OrderedDict()
+        self._generation_index_lock = threading.Lock()
         self.has_authenticated = False
 
     def refresh_tokens(self) -> None:
@@ -46,9 +138,9 @@ class Dalle:
         Refreshes the access token and bearer token.
         """
         self.__access_token = labs.get_access_token(username=self.__username, password=self.__password,
-                                                    headers=self.headers)
+                                                    headers=self.headers, transport=self.transport)
         self.__bearer_token = labs.get_bearer_token_from_access_token(access_token=self.__access_token,
-                                                                      headers=self.headers)
+                                                                      headers=self.headers, transport=self.transport)
         self.has_authenticated = True
 
     async def refresh_tokens_async(self) -> None:
@@ -56,9 +148,10 @@ class Dalle:
         Asynchronously refreshes the access token and bearer token.
         """
         self.__access_token = await labs.get_access_token_async(username=self.__username, password=self.__password,
-                                                                headers=self.headers)
+                                                                headers=self.headers, transport=self.transport)
         self.__bearer_token = await labs.get_bearer_token_from_access_token_async(access_token=self.__access_token,
-                                                                                  headers=self.headers)
+                                                                                  headers=self.headers,
+                                                                                  transport=self.transport)
         self.has_authenticated = True
 
     @requires_authentication
@@ -71,7 +164,8 @@ class Dalle:
         :return: A list of tasks.
         """
         return WrappedTaskList(
-            labs.get_tasks(bearer_token=self.__bearer_token, from_ts=from_ts, headers=self.headers, limit=limit),
+            self._indexed(labs.get_tasks(bearer_token=self.__bearer_token, from_ts=from_ts, headers=self.headers,
+                                         transport=self.transport, limit=limit)),
             self)
 
     @requires_authentication_async
@@ -84,8 +178,62 @@ class Dalle:
         :return: A list of tasks.
         """
         return WrappedTaskList(
-            await labs.get_tasks_async(bearer_token=self.__bearer_token, from_ts=from_ts, headers=self.headers,
-                                       limit=limit), self)
+            self._indexed(await labs.get_tasks_async(bearer_token=self.__bearer_token, from_ts=from_ts,
+                                                     headers=self.headers, transport=self.transport, limit=limit)),
+            self)
+
+    def iter_tasks(self, since: Optional[int] = None, page_size: int = 50) -> Iterator[WrappedTask]:
+        """
+        Iterates over the task history, oldest first, fetching it a page at a time. The next page is fetched
+        while the current one is being consumed, and at most two pages are held at a time.
+
+        :param since: Optional unix timestamp of the oldest tasks to include. Defaults to the whole history.
+        :param page_size: The number of tasks to fetch per request.
+        :return: The tasks.
+        """
+        from_ts = since or 0
+        seen: Set[str] = set()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pydalle-pages") as executor:
+            page: Optional[Future] = executor.submit(self.get_tasks, page_size, from_ts)
+            try:
+                while page is not None:
+                    tasks = page.result()
+                    page = None
+                    cursor = _next_page_cursor(tasks.wrapped, from_ts, page_size)
+                    if cursor is not None:
+                        from_ts, boundary = cursor
+                        page = executor.submit(self.get_tasks, page_size, from_ts)
+                    yield from (task for task in tasks if task.id not in seen)
+                    seen = boundary if cursor is not None else set()
+            finally:
+                if page is not None:
+                    page.cancel()
+
+    async def iter_tasks_async(self, since: Optional[int] = None, page_size: int = 50) -> AsyncIterator[WrappedTask]:
+        """
+        Asynchronously iterates over the task history, oldest first, fetching it a page at a time.
+        See :meth:`iter_tasks`, which takes the same parameters.
+
+        :return: The tasks.
+        """
+        from_ts = since or 0
+        seen: Set[str] = set()
+        page: Optional[asyncio.Future] = asyncio.ensure_future(self.get_tasks_async(page_size, from_ts))
+        try:
+            while page is not None:
+                tasks = await page
+                page = None
+                cursor = _next_page_cursor(tasks.wrapped, from_ts, page_size)
+                if cursor is not None:
+                    from_ts, boundary = cursor
+                    page = asyncio.ensure_future(self.get_tasks_async(page_size, from_ts))
+                for task in tasks:
+                    if task.id not in seen:
+                        yield task
+                seen = boundary if cursor is not None else set()
+        finally:
+            if page is not None:
+                page.cancel()
 
     @requires_authentication
     def get_task(self, task: TaskLike) -> WrappedTask:
@@ -96,7 +244,8 @@ class Dalle:
         :return: The task.
         """
         return WrappedTask(
-            labs.get_task(bearer_token=self.__bearer_token, task_id=get_task_id(task), headers=self.headers), self)
+            self._indexed(labs.get_task(bearer_token=self.__bearer_token, task_id=get_task_id(task),
+                                        headers=self.headers, transport=self.transport)), self)
 
     @requires_authentication_async
     async def get_task_async(self, task: TaskLike) -> WrappedTask:
@@ -107,8 +256,8 @@ class Dalle:
         :return: The task.
         """
         return WrappedTask(
-            await labs.get_task_async(bearer_token=self.__bearer_token, task_id=get_task_id(task),
-                                      headers=self.headers),
+            self._indexed(await labs.get_task_async(bearer_token=self.__bearer_token, task_id=get_task_id(task),
+                                                    headers=self.headers, transport=self.transport)),
             self)
 
     @requires_authentication
@@ -120,8 +269,9 @@ class Dalle:
         :return: The generation.
         """
         return WrappedGeneration(
-            labs.get_generation(bearer_token=self.__bearer_token, generation_id=get_generation_id(generation),
-                                headers=self.headers), self)
+            self._indexed(labs.get_generation(bearer_token=self.__bearer_token,
+                                              generation_id=get_generation_id(generation),
+                                              headers=self.headers, transport=self.transport)), self)
 
     @requires_authentication_async
     async def get_generation_async(self, generation: GenerationLike) -> WrappedGeneration:
@@ -132,9 +282,9 @@ class Dalle:
         :return: The generation.
         """
         return WrappedGeneration(
-            await labs.get_generation_async(bearer_token=self.__bearer_token,
-                                            generation_id=get_generation_id(generation),
-                                            headers=self.headers), self)
+            self._indexed(await labs.get_generation_async(bearer_token=self.__bearer_token,
+                                                          generation_id=get_generation_id(generation),
+                                                          headers=self.headers, transport=self.transport)), self)
 
     @requires_authentication
     def create_text2im_task(self, caption: str, batch_size: int = 4) -> WrappedTask:
@@ -147,7 +297,7 @@ class Dalle:
         """
         return WrappedTask(
             labs.create_text2im_task(bearer_token=self.__bearer_token, caption=caption, batch_size=batch_size,
-                                     headers=self.headers), self)
+                                     headers=self.headers, transport=self.transport), self)
 
     @requires_authentication_async
     async def create_text2im_task_async(self, caption: str, batch_size: int = 4) -> WrappedTask:
@@ -161,38 +311,51 @@ class Dalle:
         return WrappedTask(
             await labs.create_text2im_task_async(bearer_token=self.__bearer_token, caption=caption,
                                                  batch_size=batch_size,
-                                                 headers=self.headers), self)
+                                                 headers=self.headers, transport=self.transport), self)
 
-    @requires_authentication
-    def text2im(self, caption: str, batch_size: int = 4, wait: bool = True) -> WrappedTask:
+    def text2im(self, caption: str, batch_size: int = 4, wait: bool = True, reuse: bool = False) -> WrappedTask:
         """
         Convenience function to create and wait a text2im task.
 
         :param caption: The caption to use.
         :param batch_size: The batch size to use.
         :param wait: Whether to wait for the task to finish, default is True.
+        :param reuse: Whether to return a succeeded text2im task with the same caption (ignoring case and
+            whitespace) and batch size from the ``task_index`` instead, if there is one, so that no credits are spent.
         :return: The task.
         """
+        if reuse and (task := self._reusable_task(caption, batch_size)) is not None:
+            return task
         task = self.create_text2im_task(caption=caption, batch_size=batch_size)
         if wait:
             return task.wait()
         return task
 
-    @requires_authentication_async
-    async def text2im_async(self, caption: str, batch_size: int = 4, wait: bool = True) -> WrappedTask:
+    async def text2im_async(self, caption: str, batch_size: int = 4, wait: bool = True,
+                            reuse: bool = False) -> WrappedTask:
         """
         Asynchronously creates and waits for a text2im task.
 
         :param caption: The caption to use.
         :param batch_size: The batch size to use.
         :param wait: Whether to wait for the task to finish, default is True.
+        :param reuse: Whether to return a matching succeeded task from the ``task_index`` instead, if there is one.
+            See :meth:`text2im`.
         :return: The task.
         """
+        if reuse and (task := self._reusable_task(caption, batch_size)) is not None:
+            return task
         task = await self.create_text2im_task_async(caption=caption, batch_size=batch_size)
         if wait:
             return await task.wait_async()
         return task
 
+    def _reusable_task(self, caption: str, batch_size: int) -> Optional[WrappedTask]:
+        if self.task_index is None:
+            raise ValueError("Reusing tasks requires a task_index")
+        task = self.task_index.find_reusable_task(caption, batch_size)
+        return WrappedTask(self._indexed(task), self) if task is not None else None
+
     @requires_authentication
     def create_variations_task(self, parent: ParentLike, batch_size: int = 3) -> WrappedTask:
         """
@@ -202,10 +365,10 @@ class Dalle:
         :param batch_size: The batch size to use.
         :return: The task.
         """
-        return WrappedTask(
-            labs.create_variations_task(bearer_token=self.__bearer_token,
-                                        parent_id_or_image=get_parent_id_or_png_base64(parent, self.headers),
-                                        batch_size=batch_size, headers=self.headers), self)
+        parent_id_or_image, parent_key = self._upload_parent(parent)
+        return self._remember_parent(parent_key, WrappedTask(
+            labs.create_variations_task(bearer_token=self.__bearer_token, parent_id_or_image=parent_id_or_image,
+                                        batch_size=batch_size, headers=self.headers, transport=self.transport), self))
 
     @requires_authentication_async
     async def create_variations_task_async(self, parent: ParentLike, batch_size: int = 3) -> WrappedTask:
@@ -216,10 +379,10 @@ class Dalle:
         :param batch_size: The batch size to use.
         :return: The task.
         """
-        return WrappedTask(await labs.create_variations_task_async(
-            bearer_token=self.__bearer_token,
-            parent_id_or_image=await get_parent_id_or_png_base64_async(parent, self.headers),
-            batch_size=batch_size, headers=self.headers), self)
+        parent_id_or_image, parent_key = await self._upload_parent_async(parent)
+        return self._remember_parent(parent_key, WrappedTask(await labs.create_variations_task_async(
+            bearer_token=self.__bearer_token, parent_id_or_image=parent_id_or_image,
+            batch_size=batch_size, headers=self.headers, transport=self.transport), self))
 
     @requires_authentication
     def variations(self, parent: ParentLike, batch_size: int = 3, wait: bool = True) -> WrappedTask:
@@ -263,13 +426,13 @@ class Dalle:
         :param batch_size: The batch size to use.
         :return: The task.
         """
-        return WrappedTask(
+        masked_image, _ = self._upload_image(masked_image)
+        parent_id_or_image, parent_key = self._upload_parent(parent) if parent else (None, None)
+        return self._remember_parent(parent_key, WrappedTask(
             labs.create_inpainting_task(
-                bearer_token=self.__bearer_token, caption=caption,
-                masked_image=get_image_png_base64(masked_image, headers=self.headers),
-                parent_id_or_image=get_parent_id_or_png_base64(parent, self.headers) if parent else None,
-                batch_size=batch_size,
-                headers=self.headers), self)
+                bearer_token=self.__bearer_token, caption=caption, masked_image=masked_image,
+                parent_id_or_image=parent_id_or_image, batch_size=batch_size,
+                headers=self.headers, transport=self.transport), self))
 
     @requires_authentication_async
     async def create_inpainting_task_async(self, caption: str,
@@ -285,11 +448,68 @@ class Dalle:
         :param batch_size: The batch size to use.
         :return: The task.
         """
-        return WrappedTask(await labs.create_inpainting_task_async(
-            bearer_token=self.__bearer_token, caption=caption,
-            masked_image=await get_image_png_base64_async(masked_image, self.headers),
-            parent_id_or_image=(await get_parent_id_or_png_base64_async(parent, self.headers)) if parent else None,
-            batch_size=batch_size, headers=self.headers), self)
+        masked_image, _ = await self._upload_image_async(masked_image)
+        parent_id_or_image, parent_key = (await self._upload_parent_async(parent)) if parent else (None, None)
+        return self._remember_parent(parent_key, WrappedTask(await labs.create_inpainting_task_async(
+            bearer_token=self.__bearer_token, caption=caption, masked_image=masked_image,
+            parent_id_or_image=parent_id_or_image, batch_size=batch_size,
+            headers=self.headers, transport=self.transport), self))
+
+    def _upload_key(self, image: ParentLike) -> Optional[str]:
+        if self.upload_cache is None or get_parent_id(image) is not None:
+            return None
+        return get_upload_key(image, self.upload_options)
+
+    def _upload_parent(self, parent: ParentLike) -> Tuple[str, Optional[str]]:
+        key = self._upload_key(parent)
+        if key is not None and (entry := self.upload_cache.get(key)) is not None:
+            return entry.parent_id or entry.png_base64, key
+        return self._upload_cache_put(key, get_parent_id_or_png_base64(parent, self.headers, self.transport,
+                                                                       self.upload_options))
+
+    async def _upload_parent_async(self, parent: ParentLike) -> Tuple[str, Optional[str]]:
+        key = self._upload_key(parent)
+        if key is not None and (entry := self.upload_cache.get(key)) is not None:
+            return entry.parent_id or entry.png_base64, key
+        return self._upload_cache_put(key, await get_parent_id_or_png_base64_async(
+            parent, self.headers, self.transport, self.image_executor, self.upload_options))
+
+    def _upload_image(self, image: ImageLike) -> Tuple[str, Optional[str]]:
+        key = self._upload_key(image)
+        if key is not None and (entry := self.upload_cache.get(key)) is not None:
+            return entry.png_base64, key
+        return self._upload_cache_put(key, get_image_png_base64(image, self.headers, self.transport,
+                                                                self.upload_options))
+
+    async def _upload_image_async(self, image: ImageLike) -> Tuple[str, Optional[str]]:
+        key = self._upload_key(image)
+        if key is not None and (entry := self.upload_cache.get(key)) is not None:
+            return entry.png_base64, key
+        return self._upload_cache_put(key, await get_image_png_base64_async(
+            image, self.headers, self.transport, self.image_executor, self.upload_options))
+
+    def _upload_cache_put(self, key: Optional[str], png_base64: str) -> Tuple[str, Optional[str]]:
+        if key is not None:
+            self.upload_cache.put(key, png_base64)
+        return png_base64, key
+
+    def _remember_parent(self, key: Optional[str], task: WrappedTask) -> WrappedTask:
+        if key is not None:
+            with self._pending_parents_lock:
+                self._pending_parents[task.id] = key
+                while len(self._pending_parents) > _PENDING_PARENTS_SIZE:
+                    self._pending_parents.popitem(last=False)
+            if not task.pending:
+                self._settle_parent(task)
+        return task
+
+    def _settle_parent(self, task: WrappedTask) -> None:
+        with self._pending_parents_lock:
+            key = self._pending_parents.pop(task.id, None)
+        if key is not None and task.succeeded:
+            # The prompt of the task holds the uploaded image, so later tasks can refer to it instead. Rejected
+            # tasks' prompts may not be usable, so the image is uploaded again next time.
+            self.upload_cache.set_parent_id(key, task.wrapped.prompt_id)
 
     @requires_authentication
     def inpainting(self, caption: str, masked_image: ImageLike, parent: Optional[ParentLike] = None,
@@ -329,6 +549,38 @@ class Dalle:
             return await task.wait_async()
         return task
 
+    def outpaint(self, caption: str, image: SeedLike, width: int, height: int, max_workers: int = 4,
+                 **kwargs) -> PILImageType:
+        """
+        Convenience function to grow an image into a larger canvas with inpainting tasks, running up to
+        ``max_workers`` of them at a time.
+
+        :param caption: The caption of every inpainting task.
+        :param image: The image to start from.
+        :param width: The width of the canvas.
+        :param height: The height of the canvas.
+        :param max_workers: How many inpainting tasks to run at a time.
+        :param kwargs: Further options of :class:`pydalle.imperative.client.outpainting.Outpainter`.
+        :return: The canvas.
+        """
+        return Outpainter(self, caption, image, width, height, **kwargs).run(max_workers)
+
+    async def outpaint_async(self, caption: str, image: SeedLike, width: int, height: int,
+                             max_concurrency: int = 4, **kwargs) -> PILImageType:
+        """
+        Asynchronously grows an image into a larger canvas with inpainting tasks, running up to
+        ``max_concurrency`` of them at a time.
+
+        :param caption: The caption of every inpainting task.
+        :param image: The image to start from.
+        :param width: The width of the canvas.
+        :param height: The height of the canvas.
+        :param max_concurrency: How many inpainting tasks to run at a time.
+        :param kwargs: Further options of :class:`pydalle.imperative.client.outpainting.Outpainter`.
+        :return: The canvas.
+        """
+        return await Outpainter(self, caption, image, width, height, **kwargs).run_async(max_concurrency)
+
     @requires_authentication
     def poll_for_task_completion(self, task: TaskLike, interval: float = 1.0, max_attempts: int = 1000) -> WrappedTask:
         """
@@ -340,11 +592,13 @@ class Dalle:
         """
         if isinstance(task, (WrappedTask, Task)):
             if task.status != "pending":
+                self._finished(self._wrapped_task(task))
                 return task
-        return WrappedTask(
-            labs.poll_for_task_completion(bearer_token=self.__bearer_token, task_id=get_task_id(task),
-                                          interval=interval,
-                                          max_attempts=max_attempts, headers=self.headers), self)
+        return self._finished(WrappedTask(
+            self._indexed(labs.poll_for_task_completion(bearer_token=self.__bearer_token, task_id=get_task_id(task),
+                                                        interval=interval,
+                                                        max_attempts=max_attempts, headers=self.headers,
+                                                        transport=self.transport)), self))
 
     @requires_authentication_async
     async def poll_for_task_completion_async(self, task: TaskLike, interval: float = 1.0,
@@ -358,11 +612,117 @@ class Dalle:
         """
         if isinstance(task, (WrappedTask, Task)):
             if task.status != "pending":
+                self._finished(self._wrapped_task(task), is_async=True)
                 return task
-        return WrappedTask(
-            await labs.poll_for_task_completion_async(bearer_token=self.__bearer_token, task_id=get_task_id(task),
-                                                      interval=interval,
-                                                      max_attempts=max_attempts, headers=self.headers), self)
+        return self._finished(WrappedTask(
+            self._indexed(await labs.poll_for_task_completion_async(bearer_token=self.__bearer_token,
+                                                                    task_id=get_task_id(task),
+                                                                    interval=interval,
+                                                                    max_attempts=max_attempts, headers=self.headers,
+                                                                    transport=self.transport)), self),
+            is_async=True)
+
+    def _wrapped_task(self, task: Union[WrappedTask, Task]) -> WrappedTask:
+        return task if isinstance(task, WrappedTask) else WrappedTask(self._indexed(task), self)
+
+    def _finished(self, task: WrappedTask, is_async: bool = False) -> WrappedTask:
+        # Called with every task found finished by waiting for it, however soon
+        self._settle_parent(task)
+        if self.task_index is not None:
+            self.task_index.add([task.wrapped])
+        if self.prefetch is not None:
+            if is_async:
+                self._start_prefetch_async(task)
+            else:
+                self._start_prefetch(task)
+        return task
+
+    def resolve_generations(self, generations: Iterable[GenerationLike],
+                            tasks: Iterable[TaskLike] = ()) -> List[WrappedGeneration]:
+        """
+        Gets many generations, with as few requests as possible: generations of tasks this client has fetched
+        recently are known already, the tasks in ``tasks`` are fetched once each (unless they are task objects
+        with their generations already), and the generation IDs left over are looked up one task at a time.
+        That way, resolving the generations of a task takes at most two requests, instead of one per generation.
+
+        :param generations: The generations to get (generation IDs or generation objects, which are returned
+            as they are).
+        :param tasks: Optionally, the tasks the generations are from.
+        :return: The generations, in the same order.
+        """
+        generations = list(generations)
+        for task in tasks:
+            if isinstance(task, (WrappedTask, Task)) and task.generations:
+                self._indexed(task.wrapped if isinstance(task, WrappedTask) else task)
+            else:
+                self.get_task(task)
+        found = self._known_generations(generations)
+        while missing := [g for g in generations if isinstance(g, str) and g not in found]:
+            generation = self.get_generation(missing[0])
+            found[generation.id] = generation.wrapped
+            if len(missing) > 1:
+                found.update(self._generations_of(self.get_task(generation.task_id).wrapped))
+        return [self._resolved(g, found) for g in generations]
+
+    async def resolve_generations_async(self, generations: Iterable[GenerationLike],
+                                        tasks: Iterable[TaskLike] = ()) -> List[WrappedGeneration]:
+        """
+        Asynchronously gets many generations, with as few requests as possible.
+        See :meth:`resolve_generations`, which takes the same parameters.
+
+        :return: The generations, in the same order.
+        """
+        generations = list(generations)
+        to_fetch = []
+        for task in tasks:
+            if isinstance(task, (WrappedTask, Task)) and task.generations:
+                self._indexed(task.wrapped if isinstance(task, WrappedTask) else task)
+            else:
+                to_fetch.append(task)
+        await asyncio.gather(*(self.get_task_async(task) for task in to_fetch))
+        found = self._known_generations(generations)
+        while missing := [g for g in generations if isinstance(g, str) and g not in found]:
+            generation = await self.get_generation_async(missing[0])
+            found[generation.id] = generation.wrapped
+            if len(missing) > 1:
+                found.update(self._generations_of((await self.get_task_async(generation.task_id)).wrapped))
+        return [self._resolved(g, found) for g in generations]
+
+    def _indexed(self, response: T) -> T:
+        if isinstance(response, Generation):
+            generations = {response.id: response}
+        elif isinstance(response, TaskList):
+            # The tasks of a list are only parsed if one of their generations is looked up
+            generations = {generation_id: (response, i, j) for generation_id, i, j in response.generation_ids()}
+        else:
+            generations = self._generations_of(response)
+        if generations:
+            with self._generation_index_lock:
+                for generation_id, generation in generations.items():
+                    self._generation_index[generation_id] = generation
+                    self._generation_index.move_to_end(generation_id)
+                while len(self._generation_index) > _GENERATION_INDEX_SIZE:
+                    self._generation_index.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _generations_of(task: Task) -> Dict[str, Generation]:
+        return {generation.id: generation for generation in task.generations or ()}
+
+    def _known_generations(self, generations: List[GenerationLike]) -> Dict[str, Generation]:
+        with self._generation_index_lock:
+            known = {g: self._generation_index[g] for g in generations
+                     if isinstance(g, str) and g in self._generation_index}
+        for generation_id, generation in known.items():
+            if isinstance(generation, tuple):
+                task_list, i, j = generation
+                known[generation_id] = task_list[i].generations[j]
+        return known
+
+    def _resolved(self, generation: GenerationLike, found: Dict[str, Generation]) -> WrappedGeneration:
+        if isinstance(generation, WrappedGeneration):
+            return generation
+        return WrappedGeneration(generation if isinstance(generation, Generation) else found[generation], self)
 
     @requires_authentication
     def download_generation(self, generation: GenerationLike, direct: bool = False) -> WrappedImage:
@@ -377,9 +737,18 @@ class Dalle:
         """
         if direct:
             return self.download_generation_direct(generation)
-        return WrappedImage(labs.download_generation(bearer_token=self.__bearer_token,
-                                                     generation_id=get_generation_id(generation),
-                                                     headers=self.headers), self)
+        generation_id = get_generation_id(generation)
+        if (image := self._prefetched(generation_id, "watermarked")) is not None:
+            return image
+        return self._download_watermarked(generation_id)
+
+    def _download_watermarked(self, generation_id: str) -> WrappedImage:
+        if (image := self._cached_image(generation_id, "watermarked")) is not None:
+            return image
+        return self._cache_image(generation_id, "watermarked",
+                                 labs.download_generation(bearer_token=self.__bearer_token,
+                                                          generation_id=generation_id,
+                                                          headers=self.headers, transport=self.transport))
 
     @requires_authentication_async
     async def download_generation_async(self, generation: GenerationLike, direct: bool = False) -> WrappedImage:
@@ -394,9 +763,19 @@ class Dalle:
         """
         if direct:
             return await self.download_generation_direct_async(generation)
-        return WrappedImage(await labs.download_generation_async(bearer_token=self.__bearer_token,
-                                                                 generation_id=get_generation_id(generation),
-                                                                 headers=self.headers), self)
+        generation_id = get_generation_id(generation)
+        if (image := await self._prefetched_async(generation_id, "watermarked")) is not None:
+            return image
+        return await self._download_watermarked_async(generation_id)
+
+    async def _download_watermarked_async(self, generation_id: str) -> WrappedImage:
+        if (image := self._cached_image(generation_id, "watermarked")) is not None:
+            return image
+        return self._cache_image(generation_id, "watermarked",
+                                 await labs.download_generation_async(bearer_token=self.__bearer_token,
+                                                                      generation_id=generation_id,
+                                                                      headers=self.headers,
+                                                                      transport=self.transport))
 
     @requires_authentication
     def download_generation_direct(self, generation: GenerationLike) -> WrappedImage:
@@ -408,15 +787,17 @@ class Dalle:
         :param generation: The generation to download.
         :return: The image.
         """
-        if isinstance(generation, (WrappedGeneration, Generation)):
-            image_path = generation.generation.image_path
-        else:
-            image_path = labs.get_generation(bearer_token=self.__bearer_token,
-                                             generation_id=get_generation_id(generation),
-                                             headers=self.headers).generation.image_path
-        return WrappedImage(
-            request(HttpRequest(method="get", url=image_path, headers=self.headers, decode=False)).content, self,
-            filetype="webp")
+        generation_id = get_generation_id(generation)
+        if (image := self._prefetched(generation_id, "direct")) is not None:
+            return image
+        return self._download_direct(generation, generation_id)
+
+    def _download_direct(self, generation: GenerationLike, generation_id: str) -> WrappedImage:
+        if (image := self._cached_image(generation_id, "direct")) is not None:
+            return image
+        image_path = self.resolve_generations([generation])[0].direct_image_path
+        return self._cache_image(generation_id, "direct", self.transport.request(
+            HttpRequest(method="get", url=image_path, headers=self.headers, decode=False)).content)
 
     @requires_authentication_async
     async def download_generation_direct_async(self, generation: GenerationLike) -> WrappedImage:
@@ -426,16 +807,146 @@ class Dalle:
         :param generation: The generation to download.
         :return: The image.
         """
-        if isinstance(generation, (WrappedGeneration, Generation)):
-            image_path = generation.generation.image_path
-        else:
-            image_path = (await labs.get_generation_async(bearer_token=self.__bearer_token,
-                                                          generation_id=get_generation_id(generation),
-                                                          headers=self.headers)).generation.image_path
-        return WrappedImage(
-            (await request_async(
-                HttpRequest(method="get", url=image_path, headers=self.headers, decode=False))).content, self,
-            filetype="webp")
+        generation_id = get_generation_id(generation)
+        if (image := await self._prefetched_async(generation_id, "direct")) is not None:
+            return image
+        return await self._download_direct_async(generation, generation_id)
+
+    async def _download_direct_async(self, generation: GenerationLike, generation_id: str) -> WrappedImage:
+        if (image := self._cached_image(generation_id, "direct")) is not None:
+            return image
+        image_path = (await self.resolve_generations_async([generation]))[0].direct_image_path
+        return self._cache_image(generation_id, "direct", (await self.transport.request_async(
+            HttpRequest(method="get", url=image_path, headers=self.headers, decode=False))).content)
+
+    def download_all(self, items: Iterable[Downloadable], max_concurrency: int = 8, ordered: bool = True,
+                     direct: bool = False, return_exceptions: bool = False) -> Iterator[DownloadResult]:
+        """
+        Downloads the generations of many tasks, with up to ``max_concurrency`` downloads in flight at a time.
+        See :func:`pydalle.imperative.client.responses.download_all`.
+
+        :param items: The tasks (and/or generations) to download.
+        :param max_concurrency: The number of downloads to run at a time.
+        :param ordered: Whether to yield the images in the order of the generations, or as they are downloaded.
+        :param direct: Whether to download the generations using the direct download URL.
+        :param return_exceptions: Whether to yield the exceptions of failed downloads instead of raising them.
+        :return: ``(generation, image)`` pairs.
+        """
+        return download_all(items, max_concurrency=max_concurrency, ordered=ordered, direct=direct,
+                            return_exceptions=return_exceptions)
+
+    def download_all_async(self, items: Union[Iterable[Downloadable], AsyncIterable[Downloadable]],
+                           max_concurrency: int = 8, ordered: bool = True, direct: bool = False,
+                           return_exceptions: bool = False) -> AsyncIterator[DownloadResult]:
+        """
+        Asynchronously downloads the generations of many tasks, with up to ``max_concurrency`` downloads in
+        flight at a time. See :func:`pydalle.imperative.client.responses.download_all_async`.
+
+        :param items: The tasks (and/or generations) to download, as an iterable or async iterable.
+        :param max_concurrency: The number of downloads to run at a time.
+        :param ordered: Whether to yield the images in the order of the generations, or as they are downloaded.
+        :param direct: Whether to download the generations using the direct download URL.
+        :param return_exceptions: Whether to yield the exceptions of failed downloads instead of raising them.
+        :return: ``(generation, image)`` pairs.
+        """
+        return download_all_async(items, max_concurrency=max_concurrency, ordered=ordered, direct=direct,
+                                  return_exceptions=return_exceptions)
+
+    def _start_prefetch(self, task: WrappedTask) -> None:
+        if not task.succeeded or not task.generations:
+            return
+        started = []
+        with self._prefetch_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                                             thread_name_prefix="pydalle-prefetch")
+            for generation in task.generations:
+                key = (generation.id, self.prefetch)
+                if key not in self._prefetches:
+                    future = self._prefetch_executor.submit(self._prefetch_download, generation, self.prefetch)
+                    self._prefetches[key] = future
+                    started.append((key, future))
+        # Outside of the lock, since the callback runs at once (and takes the lock) if the download is done already
+        for key, future in started:
+            future.add_done_callback(lambda f, k=key: self._prefetch_done(k, f))
+
+    def _start_prefetch_async(self, task: WrappedTask) -> None:
+        if not task.succeeded or not task.generations:
+            return
+        with self._prefetch_lock:
+            for generation in task.generations:
+                key = (generation.id, self.prefetch)
+                if key not in self._prefetches:
+                    future = asyncio.ensure_future(self._prefetch_download_async(generation, self.prefetch))
+                    self._prefetches[key] = future
+                    future.add_done_callback(lambda f, k=key: self._prefetch_done(k, f))
+
+    @requires_authentication
+    def _prefetch_download(self, generation: WrappedGeneration, variant: str) -> WrappedImage:
+        if variant == "direct":
+            return self._download_direct(generation, generation.id)
+        return self._download_watermarked(generation.id)
+
+    @requires_authentication_async
+    async def _prefetch_download_async(self, generation: WrappedGeneration, variant: str) -> WrappedImage:
+        if variant == "direct":
+            return await self._download_direct_async(generation, generation.id)
+        return await self._download_watermarked_async(generation.id)
+
+    def _prefetch_done(self, key: Tuple[str, str], future: Union[Future, asyncio.Future]) -> None:
+        # Failed prefetches are dropped, so that downloading the generation tries again. Successful ones are too
+        # if they are in the image cache, which will answer from now on. Otherwise, only the most recent ones are
+        # kept, so that images which are never downloaded don't pile up.
+        with self._prefetch_lock:
+            if future.cancelled() or future.exception() is not None or self.image_cache is not None:
+                if self._prefetches.get(key) is future:
+                    del self._prefetches[key]
+                return
+            done = [k for k, f in self._prefetches.items() if f.done()]
+            for k in done[:-_PREFETCH_KEEP]:
+                del self._prefetches[k]
+
+    def _prefetched(self, generation_id: str, variant: str) -> Optional[WrappedImage]:
+        with self._prefetch_lock:
+            future = self._prefetches.get((generation_id, variant))
+            if future is None or isinstance(future, asyncio.Future) and not future.done():
+                # A prefetch in flight on an event loop can't be waited for here
+                return None
+            del self._prefetches[(generation_id, variant)]
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    async def _prefetched_async(self, generation_id: str, variant: str) -> Optional[WrappedImage]:
+        with self._prefetch_lock:
+            future = self._prefetches.get((generation_id, variant))
+            if isinstance(future, asyncio.Future) and future.get_loop() is not asyncio.get_running_loop():
+                return None
+            if future is not None:
+                del self._prefetches[(generation_id, variant)]
+        if future is None:
+            return None
+        try:
+            if isinstance(future, asyncio.Future):
+                # Shielded, so that cancelling the caller doesn't cancel the download for everyone else
+                return await asyncio.shield(future)
+            return await asyncio.wrap_future(future)
+        except Exception:
+            return None
+
+    def _cached_image(self, generation_id: str, variant: str) -> Optional[WrappedImage]:
+        if self.image_cache is None:
+            return None
+        data = self.image_cache.get(generation_id, variant)
+        if data is None:
+            return None
+        return WrappedImage(data, self, filetype=_FILETYPES[variant])
+
+    def _cache_image(self, generation_id: str, variant: str, data: bytes) -> WrappedImage:
+        if self.image_cache is not None:
+            self.image_cache.put(generation_id, variant, data)
+        return WrappedImage(data, self, filetype=_FILETYPES[variant])
 
     @requires_authentication
     def share_generation(self, generation: GenerationLike) -> WrappedGeneration:
@@ -448,7 +959,7 @@ class Dalle:
         """
         return WrappedGeneration(
             labs.share_generation(bearer_token=self.__bearer_token, generation_id=get_generation_id(generation),
-                                  headers=self.headers), self)
+                                  headers=self.headers, transport=self.transport), self)
 
     @requires_authentication_async
     async def share_generation_async(self, generation: GenerationLike) -> WrappedGeneration:
@@ -462,7 +973,7 @@ class Dalle:
         return WrappedGeneration(
             await labs.share_generation_async(bearer_token=self.__bearer_token,
                                               generation_id=get_generation_id(generation),
-                                              headers=self.headers), self)
+                                              headers=self.headers, transport=self.transport), self)
 
     @requires_authentication
     def save_generations(self, generations: Union[Iterable[GenerationLike], GenerationLike]) -> WrappedCollection:
@@ -477,7 +988,7 @@ class Dalle:
         except ValueError:
             generation_ids = [get_generation_id(generation) for generation in generations]
         return WrappedCollection(labs.save_generations(bearer_token=self.__bearer_token, generation_ids=generation_ids,
-                                                       headers=self.headers), self)
+                                                       headers=self.headers, transport=self.transport), self)
 
     @requires_authentication_async
     async def save_generations_async(self,
@@ -494,7 +1005,7 @@ class Dalle:
             generation_ids = [get_generation_id(generation) for generation in generations]
         return WrappedCollection(
             await labs.save_generations_async(bearer_token=self.__bearer_token, generation_ids=generation_ids,
-                                              headers=self.headers), self)
+                                              headers=self.headers, transport=self.transport), self)
 
     @requires_authentication
     def flag_generation_sensitive(self, generation: GenerationLike) -> WrappedUserFlag:
@@ -507,7 +1018,7 @@ class Dalle:
         return WrappedUserFlag(
             labs.flag_generation_sensitive(bearer_token=self.__bearer_token,
                                            generation_id=get_generation_id(generation),
-                                           headers=self.headers), self)
+                                           headers=self.headers, transport=self.transport), self)
 
     @requires_authentication_async
     async def flag_generation_sensitive_async(self, generation: GenerationLike) -> WrappedUserFlag:
@@ -520,7 +1031,7 @@ class Dalle:
         return WrappedUserFlag(
             await labs.flag_generation_sensitive_async(bearer_token=self.__bearer_token,
                                                        generation_id=get_generation_id(generation),
-                                                       headers=self.headers), self)
+                                                       headers=self.headers, transport=self.transport), self)
 
     @requires_authentication
     def flag_generation_unexpected(self, generation: GenerationLike) -> WrappedUserFlag:
@@ -533,7 +1044,7 @@ class Dalle:
         return WrappedUserFlag(
             labs.flag_generation_unexpected(bearer_token=self.__bearer_token,
                                             generation_id=get_generation_id(generation),
-                                            headers=self.headers), self)
+                                            headers=self.headers, transport=self.transport), self)
 
     @requires_authentication_async
     async def flag_generation_unexpected_async(self, generation: GenerationLike) -> WrappedUserFlag:
@@ -546,7 +1057,7 @@ class Dalle:
         return WrappedUserFlag(
             await labs.flag_generation_unexpected_async(bearer_token=self.__bearer_token,
                                                         generation_id=get_generation_id(generation),
-                                                        headers=self.headers), self)
+                                                        headers=self.headers, transport=self.transport), self)
 
     @requires_authentication
     def get_credit_summary(self) -> WrappedBillingInfo:
@@ -555,7 +1066,8 @@ class Dalle:
 
         :return: The user's credit summary.
         """
-        return WrappedBillingInfo(labs.get_credit_summary(bearer_token=self.__bearer_token, headers=self.headers), self)
+        return WrappedBillingInfo(labs.get_credit_summary(bearer_token=self.__bearer_token, headers=self.headers,
+                                                          transport=self.transport), self)
 
     @requires_authentication_async
     async def get_credit_summary_async(self) -> WrappedBillingInfo:
@@ -565,7 +1077,8 @@ class Dalle:
         :return: The user's credit summary.
         """
         return WrappedBillingInfo(
-            await labs.get_credit_summary_async(bearer_token=self.__bearer_token, headers=self.headers), self)
+            await labs.get_credit_summary_async(bearer_token=self.__bearer_token, headers=self.headers,
+                                                transport=self.transport), self)
 
     @requires_authentication
     def get_login_info(self) -> WrappedLogin:
@@ -574,7 +1087,8 @@ class Dalle:
 
         :return: The user's login information.
         """
-        return WrappedLogin(labs.get_login_info(access_token=self.__access_token, headers=self.headers), self)
+        return WrappedLogin(labs.get_login_info(access_token=self.__access_token, headers=self.headers,
+                                                transport=self.transport), self)
 
     @requires_authentication_async
     async def get_login_info_async(self) -> WrappedLogin:
@@ -583,5 +1097,6 @@ class Dalle:
 
         :return: The user's login information.
         """
-        return WrappedLogin(await labs.get_login_info_async(access_token=self.__access_token, headers=self.headers),
+        return WrappedLogin(await labs.get_login_info_async(access_token=self.__access_token, headers=self.headers,
+                                                            transport=self.transport),
                             self)
@@ -0,0 +1,180 @@
+"""
+Outpainting: growing an image into a larger canvas with inpainting tasks, as planned by
+:func:`pydalle.functional.outpainting.plan_outpainting`.
+
+Every tile is cut out of the canvas as it is when the tile's turn comes, so the parts which are not painted yet
+are transparent, which is exactly what inpainting fills in. Tiles whose dependencies are painted are submitted
+concurrently, and each result is blended into the canvas as soon as it arrives, fading into what was painted
+before it so that tiles join without seams.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from typing import Optional, Callable, Dict, Set, TYPE_CHECKING, Union
+
+from pydalle.functional.assumptions import OPENAI_LABS_IMAGE_SIZE
+from pydalle.functional.outpainting import OutpaintingPlan, Tile, Box, plan_outpainting, centered_seed
+from pydalle.imperative.client.responses import WrappedTask, WrappedGeneration, WrappedImage
+from pydalle.imperative.outside.np import ndarray, zeros, asarray, blend_into
+from pydalle.imperative.outside.pil import PILImage, PILImageType, bytes_to_pil_image
+
+if TYPE_CHECKING:
+    from pydalle.imperative.client.dalle import Dalle
+
+SeedLike = Union[WrappedImage, PILImageType, ndarray, bytes]
+
+
+class OutpaintingError(Exception):
+    """
+    Raised when the inpainting task of a tile does not produce a generation to use.
+    """
+
+    def __init__(self, message: str, tile: Tile, task: WrappedTask):
+        super().__init__(message, tile, task)
+        self.tile = tile
+        self.task = task
+
+
+def _first_generation(task: WrappedTask) -> WrappedGeneration:
+    return task.generations[0]
+
+
+class Outpainter:
+    """
+    Paints an :class:`pydalle.functional.outpainting.OutpaintingPlan`, starting from an image.
+
+    :param dalle: The client to create the inpainting tasks with.
+    :param caption: The caption of every inpainting task.
+    :param image: The image to start from.
+    :param width: The width of the canvas.
+    :param height: The height of the canvas.
+    :param seed: Where to put the image on the canvas, as a ``(left, top, right, bottom)`` box. The image is
+        resized to fit it. Defaults to the middle of the canvas, at the image's own size.
+    :param tile_size: The width and height of every tile.
+    :param overlap: How far neighbouring tiles overlap.
+    :param feather: How many pixels of what is already painted each tile fades into.
+    :param batch_size: The batch size of every inpainting task.
+    :param choose: Picks the generation to use from each finished task. Defaults to the first one.
+    :param on_tile: Called with every tile once it is painted, e.g. to report progress or save the canvas.
+    """
+
+    def __init__(self, dalle: 'Dalle', caption: str, image: SeedLike, width: int, height: int,
+                 seed: Optional[Box] = None, tile_size: int = OPENAI_LABS_IMAGE_SIZE,
+                 overlap: int = OPENAI_LABS_IMAGE_SIZE // 4, feather: int = 64, batch_size: int = 3,
+                 choose: Optional[Callable[[WrappedTask], WrappedGeneration]] = None,
+                 on_tile: Optional[Callable[[Tile], None]] = None):
+        self.dalle = dalle
+        self.caption = caption
+        self.feather = feather
+        self.batch_size = batch_size
+        self.choose = choose or _first_generation
+        self.on_tile = on_tile
+        start = _to_rgba_pil(image)
+        if seed is None:
+            seed = centered_seed(width, height, *start.size)
+        self.plan: OutpaintingPlan = plan_outpainting(width, height, seed, tile_size=tile_size, overlap=overlap)
+        left, top, right, bottom = seed
+        if start.size != (right - left, bottom - top):
+            start = start.resize((right - left, bottom - top), resample=PILImage.LANCZOS)
+        self.canvas: ndarray = zeros((height, width, 4), dtype="uint8")
+        self.canvas[top:bottom, left:right, :3] = asarray(start)[..., :3]
+        self.canvas[top:bottom, left:right, 3] = 255
+
+    def to_pil(self) -> PILImageType:
+        """
+        Returns the canvas as it is now, with the parts which are not painted yet transparent.
+        """
+        return PILImage.fromarray(self.canvas.copy(), "RGBA")
+
+    def run(self, max_workers: int = 4) -> PILImageType:
+        """
+        Paints every tile, running up to ``max_workers`` inpainting tasks at a time.
+
+        :return: The finished canvas.
+        """
+        remaining: Dict[int, Set[int]] = {tile.index: set(tile.depends_on) for tile in self.plan.tiles}
+        running: Dict[Future, Tile] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def submit_ready() -> None:
+                for index, depends_on in list(remaining.items()):
+                    if not depends_on:
+                        del remaining[index]
+                        tile = self.plan.tiles[index]
+                        running[executor.submit(self._paint, tile, self._cut(tile))] = tile
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile = running.pop(future)
+                    self._blend(tile, future.result())
+                    for depends_on in remaining.values():
+                        depends_on.discard(tile.index)
+                submit_ready()
+        return self.to_pil()
+
+    async def run_async(self, max_concurrency: int = 4) -> PILImageType:
+        """
+        Asynchronously paints every tile, running up to ``max_concurrency`` inpainting tasks at a time.
+
+        :return: The finished canvas.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        painted: Dict[int, asyncio.Future] = {}
+
+        async def paint(tile: Tile) -> None:
+            await asyncio.gather(*(painted[index] for index in tile.depends_on))
+            async with semaphore:
+                result = await self._paint_async(tile, self._cut(tile))
+            self._blend(tile, result)
+
+        # Tiles only depend on tiles before them, so every dependency is scheduled by the time it is awaited
+        for tile in self.plan.tiles:
+            painted[tile.index] = asyncio.ensure_future(paint(tile))
+        try:
+            await asyncio.gather(*painted.values())
+        finally:
+            for future in painted.values():
+                future.cancel()
+        return self.to_pil()
+
+    def _cut(self, tile: Tile) -> PILImageType:
+        left, top, right, bottom = tile.box
+        return PILImage.fromarray(self.canvas[top:bottom, left:right].copy(), "RGBA")
+
+    def _paint(self, tile: Tile, masked: PILImageType) -> ndarray:
+        task = self.dalle.inpainting(self.caption, masked, batch_size=self.batch_size)
+        image = self._chosen(tile, task).download()
+        return self._to_tile(tile, image.to_pil())
+
+    async def _paint_async(self, tile: Tile, masked: PILImageType) -> ndarray:
+        task = await self.dalle.inpainting_async(self.caption, masked, batch_size=self.batch_size)
+        image = await self._chosen(tile, task).download_async()
+        return self._to_tile(tile, await image.to_pil_async())
+
+    def _chosen(self, tile: Tile, task: WrappedTask) -> WrappedGeneration:
+        if not task.succeeded or not task.generations:
+            raise OutpaintingError(f"The inpainting task {task.id} of tile {tile.index} has no generations to use "
+                                   f"(status: {task.status})", tile, task)
+        return self.choose(task)
+
+    @staticmethod
+    def _to_tile(tile: Tile, image: PILImageType) -> ndarray:
+        if image.size != (tile.size, tile.size):
+            image = image.resize((tile.size, tile.size), resample=PILImage.LANCZOS)
+        return asarray(image.convert("RGB"))
+
+    def _blend(self, tile: Tile, result: ndarray) -> None:
+        blend_into(self.canvas, result, tile.x, tile.y, self.feather)
+        if self.on_tile is not None:
+            self.on_tile(tile)
+
+
+def _to_rgba_pil(image: SeedLike) -> PILImageType:
+    if isinstance(image, WrappedImage):
+        image = image.to_pil()
+    elif isinstance(image, bytes):
+        image = bytes_to_pil_image(image)
+    elif isinstance(image, ndarray):
+        image = PILImage.fromarray(image)
+    return image.convert("RGBA")
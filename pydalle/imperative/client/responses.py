@@ -1,21 +1,29 @@
 import base64
 import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Executor, Future, wait, FIRST_COMPLETED
 from functools import cached_property
-from typing import Optional, List, Iterator, TYPE_CHECKING, Any, Union, Generator, AsyncGenerator
+from hashlib import sha256
+from typing import Optional, List, Iterator, TYPE_CHECKING, Any, Union, Generator, AsyncGenerator, Sequence, \
+    Iterable, AsyncIterable, AsyncIterator, Tuple, Deque, Callable
 
 from pydalle.functional.api.response.labs import TaskList, Task, Generation, Collection, UserFlag, BillingInfo, \
-    TaskType, Prompt, StatusInformation, GenerationData, Breakdown, Login, User, Features, GenerationList
+    TaskType, Prompt, StatusInformation, GenerationData, Breakdown, Login, User, Features, GenerationList, with_raw
 from pydalle.functional.types import HttpRequest, T
 from pydalle.imperative.outside import files
-from pydalle.imperative.outside.internet import request, request_async
+from pydalle.imperative.outside.internet import Transport, DEFAULT_TRANSPORT
+from pydalle.functional.images import UploadImageOptions, DEFAULT_UPLOAD_IMAGE_OPTIONS, PNG_SIGNATURE, \
+    detect_image_format, b64decode_strict
 from pydalle.imperative.outside.pil import PILImageType, pil_image_to_png_bytes, image_bytes_to_png_bytes, \
-    bytes_to_pil_image, bytes_to_masked_pil_image, bytes_to_padded_pil_image
-from pydalle.imperative.outside.np import ndarray, pil_image_to_np_array, np_array_to_pil_image
+    bytes_to_pil_image, decode_image, mask_pil_image, pad_pil_image, run_image_conversion, \
+    image_bytes_to_upload_png_bytes, pil_image_to_upload_png_bytes
+from pydalle.imperative.outside.np import ndarray, pil_image_to_np_array, np_array_to_pil_image, \
+    image_batch_shape, empty_image_batch, pil_image_into_np_array
 
 if TYPE_CHECKING:
     from pydalle.imperative.client.dalle import Dalle
 
-PNG_PREFIX = b"\x89PNG\r\n\x1a\n"
+PNG_PREFIX = PNG_SIGNATURE
 PNG_BASE64_PREFIX = b"iVBORw0KGgo"
 PNG_BASE64_PREFIX_STR = PNG_BASE64_PREFIX.decode()
 
@@ -28,10 +36,13 @@ class WrappedResponse:
         make requests related to the wrapped response.
 
     * Getters for attributes in the lower-level response helps protect against changes in the API.
+
+    The wrapped response keeps its ``raw`` dicts as the client's ``raw_mode`` says (see
+    :func:`pydalle.functional.api.response.labs.with_raw`).
     """
 
     def __init__(self, wrapped: T, dalle: 'Dalle'):
-        self.wrapped: T = wrapped
+        self.wrapped: T = with_raw(wrapped, getattr(dalle, "raw_mode", "keep"))
         self.dalle = dalle
 
     def __repr__(self):
@@ -249,6 +260,13 @@ class WrappedCollection(WrappedResponse):
 
 
 class WrappedImage(WrappedResponse):
+    """
+    A downloaded image.
+
+    The image is decoded the first time its pixels are needed, and the decoded image is kept so that
+    :meth:`to_pil`, :meth:`to_numpy`, :meth:`to_pil_masked` and :meth:`to_pil_padded` can be called
+    any number of times without decoding it again. Call :meth:`drop_decoded` to free that memory.
+    """
     wrapped: bytes
 
     def __init__(self, image: bytes, dalle: 'Dalle', filetype: str = 'png'):
@@ -262,15 +280,36 @@ class WrappedImage(WrappedResponse):
     def png_bytes(self) -> bytes:
         if self.filetype == 'png':
             return self.wrapped
-        return image_bytes_to_png_bytes(self.wrapped)
+        return pil_image_to_png_bytes(self._decoded)
+
+    @cached_property
+    def _decoded(self) -> PILImageType:
+        # Decoded straight from the downloaded bytes, so webp images are not converted to PNG first
+        return decode_image(self.wrapped)
+
+    @property
+    def is_decoded(self) -> bool:
+        """
+        Whether the decoded image is currently kept in memory.
+        """
+        return "_decoded" in self.__dict__
+
+    def drop_decoded(self) -> None:
+        """
+        Frees the decoded image (and, for images which are not PNGs, their PNG encoding). They will be
+        recreated the next time they are needed.
+        """
+        self.__dict__.pop("_decoded", None)
+        if self.filetype != 'png':
+            self.__dict__.pop("png_bytes", None)
 
     def to_pil(self) -> PILImageType:
         """
         Returns a PIL image object for the image.
 
-        :return: A PIL image object.
+        :return: A PIL image object, which may be modified freely.
         """
-        return bytes_to_pil_image(bytes(self))
+        return self._decoded.copy()
 
     def to_numpy(self) -> ndarray:
         """
@@ -278,7 +317,7 @@ class WrappedImage(WrappedResponse):
 
         :return: A numpy array.
         """
-        return pil_image_to_np_array(self.to_pil())
+        return pil_image_to_np_array(self._decoded)
 
     def to_pil_masked(self, x1: float, y1: float, x2: float, y2: float) -> PILImageType:
         """
@@ -291,7 +330,7 @@ class WrappedImage(WrappedResponse):
 
         :return: A masked PIL image object.
         """
-        return bytes_to_masked_pil_image(bytes(self), x1, y1, x2, y2)
+        return mask_pil_image(self._decoded, x1, y1, x2, y2)
 
     def to_pil_padded(self, p: float, cx: float = 0.5, cy: float = 0.5) -> PILImageType:
         """
@@ -302,7 +341,226 @@ class WrappedImage(WrappedResponse):
         :param cy: Where the newly shrunk image will be centered vertically. Default is 0.5, the center.
         :return: A padded PIL image object.
         """
-        return bytes_to_padded_pil_image(bytes(self), p, cx, cy)
+        return pad_pil_image(self._decoded, p, cx, cy)
+
+    async def png_bytes_async(self) -> bytes:
+        """
+        Like :attr:`png_bytes`, but converts the image on an executor instead of blocking the event loop.
+        """
+        if self.filetype == 'png' or "png_bytes" in self.__dict__:
+            return self.png_bytes
+        if self.is_decoded:
+            png_bytes = await self._convert(pil_image_to_png_bytes, self._decoded)
+        else:
+            png_bytes = await self._convert(image_bytes_to_png_bytes, self.wrapped)
+        self.__dict__["png_bytes"] = png_bytes
+        return png_bytes
+
+    async def to_pil_async(self) -> PILImageType:
+        """
+        Like :meth:`to_pil`, but decodes the image on an executor instead of blocking the event loop.
+        """
+        return (await self._decoded_async()).copy()
+
+    async def to_numpy_async(self) -> ndarray:
+        """
+        Like :meth:`to_numpy`, but decodes the image on an executor instead of blocking the event loop.
+        """
+        return await self._convert(pil_image_to_np_array, await self._decoded_async())
+
+    async def to_pil_masked_async(self, x1: float, y1: float, x2: float, y2: float) -> PILImageType:
+        """
+        Like :meth:`to_pil_masked`, but works on an executor instead of blocking the event loop.
+        """
+        return await self._convert(mask_pil_image, await self._decoded_async(), x1, y1, x2, y2)
+
+    async def to_pil_padded_async(self, p: float, cx: float = 0.5, cy: float = 0.5) -> PILImageType:
+        """
+        Like :meth:`to_pil_padded`, but works on an executor instead of blocking the event loop.
+        """
+        return await self._convert(pad_pil_image, await self._decoded_async(), p, cx, cy)
+
+    async def _decoded_async(self) -> PILImageType:
+        if not self.is_decoded:
+            self.__dict__["_decoded"] = await self._convert(decode_image, self.wrapped)
+        return self._decoded
+
+    async def _convert(self, fn, *args):
+        return await run_image_conversion(fn, *args, executor=getattr(self.dalle, "image_executor", None))
+
+
+def decode_batch(images: Sequence[Union[WrappedImage, bytes]], out: Optional[ndarray] = None, mode: str = "RGB",
+                 max_workers: Optional[int] = None) -> ndarray:
+    """
+    Decodes images of the same size into a single array, in parallel, e.g. to build a batch for a model.
+
+    :param images: The images, as :class:`WrappedImage` objects or encoded bytes. Images which are already
+        decoded are not decoded again, and images which are not are not kept decoded afterwards.
+    :param out: An array of shape ``(n, height, width, bands)`` (or ``(n, height, width)`` for mode ``"L"``)
+        and dtype ``uint8`` to decode into, where ``n`` is at least the number of images, so that one buffer
+        can be reused for every batch. By default, a new array is allocated.
+    :param mode: The mode to convert the images to: ``"RGB"``, ``"RGBA"`` or ``"L"``.
+    :param max_workers: The number of threads to decode with. Defaults to the ``ThreadPoolExecutor`` default.
+    :return: The decoded images; ``out`` itself, or the part of it the images were decoded into.
+    """
+    if not images:
+        raise ValueError("images must not be empty")
+    width, height = bytes_to_pil_image(_encoded(images[0])).size
+    shape = image_batch_shape(len(images), width, height, mode)
+    if out is None:
+        out = empty_image_batch(len(images), width, height, mode)
+    elif out.shape[1:] != shape[1:] or out.shape[0] < len(images) or out.dtype != "uint8":
+        raise ValueError(f"out must be a uint8 array of shape {('>=' + str(len(images)),) + shape[1:]}, "
+                         f"not a {out.dtype} array of shape {out.shape}")
+
+    def decode_into(i: int) -> None:
+        image = images[i]
+        if isinstance(image, WrappedImage) and image.is_decoded:
+            decoded = image._decoded
+        else:
+            decoded = decode_image(_encoded(image))
+        if decoded.size != (width, height):
+            raise ValueError(f"Image {i} is {decoded.size[0]}x{decoded.size[1]}, not {width}x{height} "
+                             f"like the first image")
+        pil_image_into_np_array(decoded, out[i], mode)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in executor.map(decode_into, range(len(images))):
+            pass
+    return out if out.shape[0] == len(images) else out[:len(images)]
+
+
+Downloadable = Union[WrappedTask, WrappedGeneration]
+DownloadResult = Tuple[WrappedGeneration, Union[WrappedImage, Exception]]
+
+
+def download_all(items: Iterable[Downloadable], max_concurrency: int = 8, ordered: bool = True,
+                 direct: bool = False, return_exceptions: bool = False) -> Iterator[DownloadResult]:
+    """
+    Downloads the generations of many tasks, with up to ``max_concurrency`` downloads in flight at a time.
+
+    :param items: The tasks (and/or generations) to download. This can be a lazy iterable; it is consumed only as
+        fast as downloads finish. Tasks without generations (e.g. pending or rejected ones) are skipped.
+    :param max_concurrency: The number of downloads to run at a time.
+    :param ordered: Whether to yield the images in the order of the generations. If ``False``, they are yielded
+        as soon as they are downloaded. If ``True``, up to ``max_concurrency`` more downloads can be finished and
+        held back while waiting for a slow one.
+    :param direct: Whether to download the generations using the direct download URL, which does not add a
+        watermark. See :meth:`pydalle.imperative.client.dalle.Dalle.download_generation`.
+    :param return_exceptions: Whether to yield the exceptions of failed downloads (in place of the image)
+        instead of raising the first one, so that one failure does not stop the rest.
+    :return: ``(generation, image)`` pairs.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, not {max_concurrency}")
+    generations = _generations(items)
+    window = 2 * max_concurrency if ordered else max_concurrency
+    running: Deque[Tuple[WrappedGeneration, Future]] = deque()
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def submit(count: int) -> None:
+        for generation in generations:
+            running.append((generation, executor.submit(generation.download, direct=direct)))
+            if len(running) >= count:
+                return
+
+    try:
+        submit(window)
+        while running:
+            if ordered:
+                generation, future = running.popleft()
+            else:
+                wait([f for _, f in running], return_when=FIRST_COMPLETED)
+                generation, future = next((g, f) for g, f in running if f.done())
+                running.remove((generation, future))
+            yield generation, _result(future.exception, future.result, return_exceptions)
+            submit(window)
+    finally:
+        for _, future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+async def download_all_async(items: Union[Iterable[Downloadable], AsyncIterable[Downloadable]],
+                             max_concurrency: int = 8, ordered: bool = True, direct: bool = False,
+                             return_exceptions: bool = False) -> AsyncIterator[DownloadResult]:
+    """
+    Asynchronously downloads the generations of many tasks, with up to ``max_concurrency`` downloads in flight
+    at a time. See :func:`download_all`, which takes the same parameters.
+
+    :param items: The tasks (and/or generations) to download, as a (lazy) iterable or async iterable.
+    :return: ``(generation, image)`` pairs.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, not {max_concurrency}")
+    generations = _generations_async(items)
+    window = 2 * max_concurrency if ordered else max_concurrency
+    semaphore = asyncio.Semaphore(max_concurrency)
+    running: Deque[Tuple[WrappedGeneration, asyncio.Future]] = deque()
+    exhausted = False
+
+    async def download(generation: WrappedGeneration) -> WrappedImage:
+        async with semaphore:
+            return await generation.download_async(direct=direct)
+
+    async def submit(count: int) -> None:
+        nonlocal exhausted
+        while not exhausted and len(running) < count:
+            try:
+                generation = await generations.__anext__()
+            except StopAsyncIteration:
+                exhausted = True
+            else:
+                running.append((generation, asyncio.ensure_future(download(generation))))
+
+    try:
+        await submit(window)
+        while running:
+            if ordered:
+                await asyncio.wait([running[0][1]])
+                generation, future = running.popleft()
+            else:
+                await asyncio.wait([f for _, f in running], return_when=asyncio.FIRST_COMPLETED)
+                generation, future = next((g, f) for g, f in running if f.done())
+                running.remove((generation, future))
+            yield generation, _result(future.exception, future.result, return_exceptions)
+            await submit(window)
+    finally:
+        for _, future in running:
+            future.cancel()
+        if running:
+            await asyncio.gather(*(f for _, f in running), return_exceptions=True)
+
+
+def _result(exception: Callable[[], Optional[BaseException]], result: Callable[[], WrappedImage],
+            return_exceptions: bool) -> Union[WrappedImage, Exception]:
+    # Cancellations, interrupts and the like are never returned, only raised
+    if return_exceptions and isinstance(error := exception(), Exception):
+        return error
+    return result()
+
+
+def _generations(items: Iterable[Downloadable]) -> Iterator[WrappedGeneration]:
+    for item in items:
+        if isinstance(item, WrappedGeneration):
+            yield item
+        elif item.generations:
+            yield from item.generations
+
+
+async def _generations_async(items: Union[Iterable[Downloadable], AsyncIterable[Downloadable]]) \
+        -> AsyncIterator[WrappedGeneration]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            for generation in _generations([item]):
+                yield generation
+    else:
+        for generation in _generations(items):
+            yield generation
+
+
+def _encoded(image: Union[WrappedImage, bytes]) -> bytes:
+    return image.wrapped if isinstance(image, WrappedImage) else image
 
 
 PromptLike = Union[Prompt, str]
@@ -311,101 +569,175 @@ ImageLike = Union[WrappedImage, PILImageType, bytes, str]
 ParentLike = Union[ImageLike, GenerationLike, PromptLike]
 
 
-def _get_image_png_base64_no_io(image: ImageLike) -> str:
+def _get_image_png_base64_no_io(image: ImageLike,
+                                options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> Optional[str]:
     if isinstance(image, str):
-        if image.startswith(PNG_BASE64_PREFIX.decode()):
-            # If it's already a base64 encoded PNG, we're good
+        if image.startswith(PNG_BASE64_PREFIX_STR) and _accepts_png_base64(image[:32].encode(), options):
+            # If it's already a base64 encoded PNG fit for uploading, we're good
             return image
-        try:
-            # If it's a base64 encoded string in the wrong format, we'll try the PIL trick
-            decoded = base64.b64decode(image)
-            if image == base64.b64encode(decoded).decode():
-                return base64.b64encode(image_bytes_to_png_bytes(decoded)).decode()
-        except ValueError:
-            pass
+        decoded = b64decode_strict(image.encode())
+        if decoded is None or detect_image_format(decoded) is None:
+            # Not a base64 encoded image, so probably a URL or a file path
+            return None
+        return _b64encode(image_bytes_to_upload_png_bytes(decoded, options))
     if isinstance(image, WrappedImage):
-        return base64.b64encode(image.png_bytes).decode()
+        if image.is_decoded and not (image.filetype == 'png' and options.accepts_png(image.wrapped)):
+            return _b64encode(pil_image_to_upload_png_bytes(image._decoded, options))
+        return _b64encode(image_bytes_to_upload_png_bytes(image.wrapped, options))
     if isinstance(image, bytes):
-        if image.startswith(PNG_BASE64_PREFIX):
-            # If it's already a base64 encoded PNG, we just need to decode it
+        if image.startswith(PNG_BASE64_PREFIX) and _accepts_png_base64(image, options):
+            # If it's already a base64 encoded PNG fit for uploading, we just need to decode it
             return image.decode()
-        elif image.startswith(PNG_PREFIX):
-            # If it's a PNG bytes, we'll base64 encode it
-            return base64.b64encode(image).decode()
-        # Check if the bytes are base64 encoded. If it is,
-        # we'll assume it's an image in another format base64 encoded
-        try:
-            decoded = base64.b64decode(image)
-
-            if image == base64.b64encode(decoded):
-                image = decoded
-        except ValueError:
-            pass
-        # So, now it's bytes that are not a PNG or base64 encoded PNG.
-        # Best guess is that it's an image of some other format.
-        # If the user has PIL installed, we'll try to convert it to PNG
-        return base64.b64encode(image_bytes_to_png_bytes(image)).decode()
+        if detect_image_format(image) is None and (decoded := b64decode_strict(image)) is not None:
+            # We'll assume it's an image base64 encoded
+            image = decoded
+        # Anything we don't recognize is handed to PIL anyway, which knows more formats than we detect
+        return _b64encode(image_bytes_to_upload_png_bytes(image, options))
     try:
         if isinstance(image, ndarray):
-            return base64.b64encode(pil_image_to_png_bytes(np_array_to_pil_image(image))).decode()
+            return _b64encode(pil_image_to_upload_png_bytes(np_array_to_pil_image(image), options))
     except ImportError:
         pass
     try:
         if str(image.__class__).startswith("<class 'PIL."):
             # If it's a PIL image, we'll make sure it's a PNG and return the base64
-            return base64.b64encode(pil_image_to_png_bytes(image)).decode()
+            return _b64encode(pil_image_to_upload_png_bytes(image, options))
     except ImportError:
         pass
 
 
-def get_image_png_base64(image: ImageLike, headers: Optional[dict]) -> str:
-    if result := _get_image_png_base64_no_io(image):
+async def _get_image_png_base64_no_io_async(image: ImageLike, executor: Optional[Executor] = None,
+                                            options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS
+                                            ) -> Optional[str]:
+    # Images which are already fit for uploading are only base64 encoded, which is cheap enough to do on the
+    # event loop. Anything which needs PIL is converted on the executor instead.
+    if isinstance(image, WrappedImage):
+        if image.filetype == 'png' and options.accepts_png(image.wrapped):
+            return _b64encode(image.wrapped)
+        if image.is_decoded:
+            png_bytes = await run_image_conversion(pil_image_to_upload_png_bytes, image._decoded, options,
+                                                   executor=executor)
+        else:
+            png_bytes = await run_image_conversion(image_bytes_to_upload_png_bytes, image.wrapped, options,
+                                                   executor=executor)
+        return _b64encode(png_bytes)
+    if isinstance(image, str):
+        if image.startswith(PNG_BASE64_PREFIX_STR) and _accepts_png_base64(image[:32].encode(), options):
+            return image
+        if (lower := image.lower()).startswith("http://") or lower.startswith("https://"):
+            return None
+    if isinstance(image, bytes):
+        if image.startswith(PNG_BASE64_PREFIX) and _accepts_png_base64(image, options):
+            return image.decode()
+        if detect_image_format(image) == "png" and options.accepts_png(image):
+            return _b64encode(image)
+    return await run_image_conversion(_get_image_png_base64_no_io, image, options, executor=executor)
+
+
+def get_upload_key(image: ImageLike, options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> Optional[str]:
+    """
+    Returns a hash identifying an image to upload by its content and how it is prepared, or ``None`` if it is
+    given by a URL or a file path (whose content is unknown until read) or is not an image at all.
+    """
+    digest = sha256(f"{options.size} {options.compress_level} {options.crop}\n".encode())
+    if isinstance(image, WrappedImage):
+        digest.update(image.wrapped)
+    elif isinstance(image, bytes):
+        digest.update(image)
+    elif isinstance(image, str):
+        head = b64decode_strict(image[:64].encode())
+        if head is None or detect_image_format(head) is None:
+            return None
+        digest.update(image.encode())
+    elif str(image.__class__).startswith("<class 'PIL."):
+        digest.update(f"{image.mode} {image.size}\n".encode())
+        digest.update(image.tobytes())
+    else:
+        try:
+            if not isinstance(image, ndarray):
+                return None
+        except ImportError:
+            return None
+        digest.update(f"{image.dtype} {image.shape}\n".encode())
+        digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _accepts_png_base64(image: bytes, options: UploadImageOptions) -> bool:
+    # The first 32 characters encode the first 24 bytes, which hold the signature and the size
+    return options.accepts_png(base64.b64decode(image[:32]))
+
+
+def _b64encode(image: bytes) -> str:
+    return base64.b64encode(image).decode()
+
+
+def get_image_png_base64(image: ImageLike, headers: Optional[dict], transport: Optional[Transport] = None,
+                         options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> str:
+    if result := _get_image_png_base64_no_io(image, options):
         return result
     # Maybe it's a URL?
     if (lower := image.lower()).startswith("http://") or lower.startswith("https://"):
         # If it's a URL, we'll try to download it
-        r = request(HttpRequest("get", image, headers=headers, decode=False))
+        r = (transport or DEFAULT_TRANSPORT).request(HttpRequest("get", image, headers=headers, decode=False))
         if r.status_code == 200:
-            return get_image_png_base64(r.content, headers)
+            return get_image_png_base64(r.content, headers, transport, options)
         raise ValueError(f"Could not download image: {image}")
     # Maybe it's a file path?
     try:
-        return get_image_png_base64(files.read_bytes(image), headers)
+        return get_image_png_base64(files.read_bytes(image), headers, transport, options)
     except FileNotFoundError:
         pass
     # Out of ideas. Just raise an error
     raise ValueError(f"Could not convert image to PNG: {image}")
 
 
-async def get_image_png_base64_async(image: ImageLike, headers: Optional[dict] = None) -> str:
-    if result := _get_image_png_base64_no_io(image):
+async def get_image_png_base64_async(image: ImageLike, headers: Optional[dict] = None,
+                                     transport: Optional[Transport] = None, executor: Optional[Executor] = None,
+                                     options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> str:
+    if result := await _get_image_png_base64_no_io_async(image, executor, options):
         return result
     if (lower := image.lower()).startswith("http://") or lower.startswith("https://"):
-        r = await request_async(HttpRequest("get", image, headers=headers, decode=False))
+        r = await (transport or DEFAULT_TRANSPORT).request_async(HttpRequest("get", image, headers=headers,
+                                                                             decode=False))
         if r.status_code == 200:
-            return await get_image_png_base64_async(r.content)
+            return await get_image_png_base64_async(r.content, executor=executor, options=options)
         raise ValueError(f"Could not download image: {image}")
     try:
-        return await get_image_png_base64_async(await files.read_bytes_async(image))
+        return await get_image_png_base64_async(await files.read_bytes_async(image), executor=executor,
+                                                options=options)
     except FileNotFoundError:
         pass
     raise ValueError(f"Could not convert image to PNG: {image}")
 
 
-def get_parent_id_or_png_base64(parent: ParentLike, headers: Optional[dict]) -> Union[str, bytes]:
+def get_parent_id(parent: ParentLike) -> Optional[str]:
+    """
+    Returns the ID of a parent given as a prompt or a generation, or ``None`` if it is an image.
+    """
     if isinstance(parent, (Prompt, Generation, WrappedGeneration)):
         return parent.id
-    if isinstance(parent, str) and parent.startswith("generation-") or parent.startswith("prompt-"):
+    if isinstance(parent, str) and (parent.startswith("generation-") or parent.startswith("prompt-")):
         return parent
-    return get_image_png_base64(parent, headers)
+    return None
 
 
-async def get_parent_id_or_png_base64_async(parent: ParentLike, headers: Optional[dict]) -> Union[str, bytes]:
-    if isinstance(parent, (Prompt, Generation, WrappedGeneration)):
-        return parent.id
-    if isinstance(parent, str) and parent.startswith("generation-") or parent.startswith("prompt-"):
-        return parent
-    return await get_image_png_base64_async(parent, headers)
+def get_parent_id_or_png_base64(parent: ParentLike, headers: Optional[dict],
+                                transport: Optional[Transport] = None,
+                                options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> Union[str, bytes]:
+    if (parent_id := get_parent_id(parent)) is not None:
+        return parent_id
+    return get_image_png_base64(parent, headers, transport, options)
+
+
+async def get_parent_id_or_png_base64_async(parent: ParentLike, headers: Optional[dict],
+                                            transport: Optional[Transport] = None,
+                                            executor: Optional[Executor] = None,
+                                            options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS
+                                            ) -> Union[str, bytes]:
+    if (parent_id := get_parent_id(parent)) is not None:
+        return parent_id
+    return await get_image_png_base64_async(parent, headers, transport, executor, options)
 
 
 class WrappedUserFlag(WrappedResponse):
@@ -0,0 +1,520 @@
+"""
+This module contains all functions pydalle uses to cache responses and downloaded images, in memory or on disk.
+
+Which responses are cached, and for how long, is decided by :class:`pydalle.functional.caching.CachePolicy`.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import sha256
+from os import PathLike
+from typing import Optional, Dict, Union, Any, Callable, Tuple
+
+from pydalle.functional.caching import CachePolicy, etag_of, with_if_none_match
+from pydalle.functional.types import HttpRequest, HttpResponse
+from pydalle.imperative.outside.internet import Transport, TransportWrapper
+
+
+@dataclass
+class CacheEntry:
+    """
+    A cached response. ``expires`` is the time after which it may only be served once revalidated.
+    """
+    status_code: int
+    url: str
+    content: Union[str, bytes]
+    expires: float
+    headers: Optional[Dict[str, str]] = None
+    etag: Optional[str] = field(default=None)
+
+    @classmethod
+    def from_response(cls, response: HttpResponse, expires: float) -> 'CacheEntry':
+        return cls(status_code=response.status_code, url=response.url, content=response.content, expires=expires,
+                   headers=response.headers, etag=etag_of(response))
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def to_response(self, r: HttpRequest) -> HttpResponse:
+        content = self.content
+        if r.decode and isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        elif not r.decode and isinstance(content, str):
+            content = content.encode("utf-8")
+        return HttpResponse(status_code=self.status_code, url=self.url, content=content, request=r,
+                            headers=self.headers)
+
+
+class ResponseCache(ABC):
+    """
+    Stores :class:`CacheEntry` objects by key. Implementations must be safe to share between threads.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Returns the entry stored under ``key``, or ``None``.
+        """
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """
+        Stores ``entry`` under ``key``, replacing any entry stored under it.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Removes the entry stored under ``key``, if there is one.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+
+
+class MemoryCache(ResponseCache):
+    """
+    Keeps responses in memory, evicting the least recently used ones once they take up more than ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._pop(key)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(ResponseCache):
+    """
+    Keeps responses in files under ``directory``, evicting the least recently used ones once they take up
+    more than ``max_bytes``. Several processes may share a directory, although each only tracks the size of
+    the entries it has seen.
+    """
+
+    def __init__(self, directory: Union[str, PathLike], max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        # key -> (size on disk, last used)
+        self._index: Dict[str, Tuple[int, float]] = {}
+        os.makedirs(self.directory, exist_ok=True)
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".entry"):
+                    stat = os.stat(os.path.join(root, name))
+                    self._index[name[:-len(".entry")]] = (stat.st_size, stat.st_mtime)
+                    self.size += stat.st_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.entry")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index[key] = (self._index[key][0], time.time())
+        return CacheEntry(status_code=meta["status_code"], url=meta["url"],
+                          content=content.decode("utf-8") if meta["text"] else content,
+                          expires=math.inf if meta["expires"] is None else meta["expires"],
+                          headers=meta["headers"], etag=meta["etag"])
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        content = entry.content.encode("utf-8") if isinstance(entry.content, str) else entry.content
+        meta = {"status_code": entry.status_code, "url": entry.url, "headers": entry.headers, "etag": entry.etag,
+                "expires": None if math.isinf(entry.expires) else entry.expires,
+                "text": isinstance(entry.content, str)}
+        data = json.dumps(meta).encode("utf-8") + b"\n" + content
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._forget(key)
+            self._index[key] = (len(data), time.time())
+            self.size += len(data)
+            evict = []
+            if self.size > self.max_bytes:
+                for old_key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+                    if self.size <= self.max_bytes:
+                        break
+                    evict.append(old_key)
+                    self._forget(old_key)
+        for old_key in evict:
+            self._remove(old_key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._forget(key)
+        self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self.size = 0
+        for key in keys:
+            self._remove(key)
+
+    def _forget(self, key: str) -> None:
+        size, _ = self._index.pop(key, (0, 0))
+        self.size -= size
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class CachingTransport(TransportWrapper):
+    """
+    Answers requests from a :class:`ResponseCache` where the :class:`pydalle.functional.caching.CachePolicy`
+    allows it, and sends the rest through another transport, revalidating stale responses which have an ETag.
+    Cached responses are served without waiting for the ``sleep`` of the request.
+
+    Safe to share between threads. :attr:`hits`, :attr:`misses` and :attr:`revalidations` count how requests
+    were answered.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, policy: Optional[CachePolicy] = None,
+                 inner: Optional[Transport] = None, clock: Callable[[], float] = time.time):
+        super().__init__(inner)
+        self.cache = cache if cache is not None else MemoryCache()
+        self.policy = policy if policy is not None else CachePolicy()
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _lookup(self, r: HttpRequest) -> Tuple[Optional[str], Optional[CacheEntry], HttpRequest]:
+        key = self.policy.key(r)
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None and entry.expires <= self.clock() and entry.etag is not None:
+            return key, entry, with_if_none_match(r, entry.etag)
+        return key, entry, r
+
+    def _invalidate(self, r: HttpRequest) -> None:
+        # Only requests which reach the server can change anything there
+        for key in self.policy.invalidates(r):
+            self.cache.delete(key)
+
+    def _store(self, key: Optional[str], entry: Optional[CacheEntry], r: HttpRequest,
+               response: HttpResponse) -> HttpResponse:
+        if key is None:
+            return response
+        now = self.clock()
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidations")
+            response = entry.to_response(r)
+            entry.expires = now + (self.policy.ttl(r, response) or 0)
+            self.cache.set(key, entry)
+            return response
+        self._count("misses")
+        ttl = self.policy.ttl(r, response)
+        if ttl is None:
+            if entry is not None:
+                self.cache.delete(key)
+        else:
+            self.cache.set(key, CacheEntry.from_response(response, now + ttl))
+        return response
+
+    def _fresh(self, entry: Optional[CacheEntry], r: HttpRequest) -> Optional[HttpResponse]:
+        if entry is not None and entry.expires > self.clock():
+            self._count("hits")
+            return entry.to_response(r)
+        return None
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        key, entry, to_send = self._lookup(r)
+        if (response := self._fresh(entry, r)) is not None:
+            return response
+        self._invalidate(r)
+        return self._store(key, entry, r, self.inner.send(to_send, session))
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        key, entry, to_send = self._lookup(r)
+        if (response := self._fresh(entry, r)) is not None:
+            return response
+        self._invalidate(r)
+        return self._store(key, entry, r, await self.inner.send_async(to_send, session))
+
+
+class ImageCache:
+    """
+    Keeps downloaded images on disk, keyed by generation ID and variant (``"watermarked"`` or ``"direct"``).
+
+    Each distinct image is stored once, named by the SHA-256 digest of its content, and written atomically.
+    Images are evicted least recently used first once they take up more than ``max_bytes``. The index is a
+    SQLite database next to them, so any number of threads and processes can share a directory.
+    """
+
+    VARIANTS = ("watermarked", "direct")
+
+    def __init__(self, directory: Union[str, PathLike], max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS blobs "
+                   "(digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS blobs_by_last_used ON blobs (last_used)")
+        db.execute("CREATE TABLE IF NOT EXISTS images (generation_id TEXT NOT NULL, variant TEXT NOT NULL, "
+                   "digest TEXT NOT NULL, PRIMARY KEY (generation_id, variant))")
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def get(self, generation_id: str, variant: str = "watermarked") -> Optional[bytes]:
+        """
+        Returns the cached image for a generation, or ``None`` if it has not been cached (or was evicted).
+        """
+        db = self._db()
+        row = db.execute("SELECT digest FROM images WHERE generation_id = ? AND variant = ?",
+                         (generation_id, variant)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._path(row[0]), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Evicted by another process after we looked it up
+            return None
+        db.execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), row[0]))
+        return data
+
+    def put(self, generation_id: str, variant: str, data: bytes) -> str:
+        """
+        Caches the image for a generation, evicting the least recently used images if needed.
+
+        :return: The SHA-256 digest the image is stored under.
+        """
+        if variant not in self.VARIANTS:
+            raise ValueError(f"variant must be one of {self.VARIANTS}, not {variant!r}")
+        digest = sha256(data).hexdigest()
+        if len(data) > self.max_bytes:
+            return digest
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        db = self._db()
+        evicted = []
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO blobs (digest, size, last_used) VALUES (?, ?, ?)",
+                       (digest, len(data), time.time()))
+            db.execute("INSERT OR REPLACE INTO images (generation_id, variant, digest) VALUES (?, ?, ?)",
+                       (generation_id, variant, digest))
+            excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                for old_digest, size in db.execute("SELECT digest, size FROM blobs WHERE digest != ? "
+                                                   "ORDER BY last_used", (digest,)).fetchall():
+                    if excess <= 0:
+                        break
+                    evicted.append(old_digest)
+                    excess -= size
+                db.executemany("DELETE FROM images WHERE digest = ?", [(d,) for d in evicted])
+                db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in evicted])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        for old_digest in evicted:
+            self._remove(old_digest)
+        return digest
+
+    def delete(self, generation_id: str, variant: Optional[str] = None) -> None:
+        """
+        Forgets the cached images for a generation (only the given variant, if any). The image files themselves
+        are removed once no other generation refers to them.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if variant is None:
+                db.execute("DELETE FROM images WHERE generation_id = ?", (generation_id,))
+            else:
+                db.execute("DELETE FROM images WHERE generation_id = ? AND variant = ?", (generation_id, variant))
+            orphans = [row[0] for row in db.execute("SELECT digest FROM blobs WHERE digest NOT IN "
+                                                    "(SELECT digest FROM images)").fetchall()]
+            db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in orphans])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        for digest in orphans:
+            self._remove(digest)
+
+    def clear(self) -> None:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            digests = [row[0] for row in db.execute("SELECT digest FROM blobs").fetchall()]
+            db.execute("DELETE FROM images")
+            db.execute("DELETE FROM blobs")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        for digest in digests:
+            self._remove(digest)
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the cached images in bytes.
+        """
+        return self._db().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def _remove(self, digest: str) -> None:
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            # Already gone, or (on Windows) still being read by another process
+            pass
+
+
+@dataclass
+class UploadEntry:
+    """
+    What an :class:`UploadCache` knows about an image: its normalized base64 PNG and, once a task has been
+    created from it, the ID of the prompt holding it on the server.
+    """
+    png_base64: str
+    parent_id: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.png_base64)
+
+
+class UploadCache:
+    """
+    Remembers images uploaded for variations and inpainting, keyed by a hash of their content, so that
+    uploading the same image again neither normalizes it again nor (once the server has given it a prompt
+    ID) sends it again. Prompt IDs belong to an account, so a cache must not be shared between accounts.
+
+    Entries are evicted least recently used first once their base64 takes up more than ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[str, UploadEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[UploadEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, png_base64: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                return
+            entry = UploadEntry(png_base64)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self.size -= self._entries.popitem(last=False)[1].size
+
+    def set_parent_id(self, key: str, parent_id: str) -> None:
+        """
+        Records the ID to send instead of the image from now on, e.g. the prompt ID of a task created with it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.parent_id = parent_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,234 @@
+"""
+This module contains all functions pydalle uses to record traffic to and replay traffic from cassette files.
+
+A cassette is a gzip-compressed file of JSON lines. The first line is a header, and every other line
+holds one censored request, the response to it, when it was sent and how long it took.
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import deque, defaultdict
+from dataclasses import replace
+from hashlib import sha256
+from os import PathLike
+from typing import Optional, Dict, Any, Union, Deque, Tuple
+from urllib.parse import urlparse
+
+from pydalle.functional.types import HttpRequest, HttpResponse, JsonDict
+from pydalle.imperative.outside.internet import Transport, TransportWrapper
+
+CASSETTE_VERSION = 1
+
+# Request bodies larger than this (e.g. uploaded images) are stored as a digest only
+MAX_RECORDED_DATA = 64 * 1024
+
+_CENSORED_RESPONSE_KEYS = {"access_token", "id_token", "refresh_token", "sensitive_id"}
+_REDACTED = "***REDACTED***"
+
+
+class RecordingTransport(TransportWrapper):
+    """
+    Records every request sent through another transport, and the response to it, to a cassette file.
+    Sensitive request parameters, headers and bodies, as well as tokens in responses, are censored.
+
+    Usable as a context manager, which finishes the cassette on exit. Safe to share between threads.
+    """
+
+    def __init__(self, path: Union[str, PathLike], inner: Optional[Transport] = None):
+        super().__init__(inner)
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": CASSETTE_VERSION, "created": time.time()})
+
+    def _write(self, entry: JsonDict) -> None:
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def _record(self, r: HttpRequest, response: HttpResponse, started: float, ended: float) -> None:
+        # Record the request as the client sent it, before any wrapped transport rewrote it
+        censored = replace(response, request=r)._to_censored_response()
+        self._write({
+            "t": started - self._start,
+            "elapsed": max(ended - started - (r.sleep or 0), 0),
+            "sleep": r.sleep,
+            "request": _request_to_dict(censored.request),
+            "response": _response_to_dict(censored),
+        })
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        started = time.monotonic()
+        response = self.inner.send(r, session)
+        self._record(r, response, started, time.monotonic())
+        return response
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        started = time.monotonic()
+        response = await self.inner.send_async(r, session)
+        self._record(r, response, started, time.monotonic())
+        return response
+
+    def finish(self) -> None:
+        """
+        Flushes and closes the cassette file.
+        """
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'RecordingTransport':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.finish()
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests with the responses recorded in a cassette file, without touching the network.
+
+    Requests are matched by method, URL and parameters, falling back to method and path (for requests
+    containing random values, such as the Auth0 ``/authorize`` request). Responses to the same request are
+    served in recorded order, and the last one is repeated once they run out (e.g. when polling more often
+    than the recorded client did). Requests with no recorded response are counted in :attr:`misses` and raise
+    a :class:`ValueError`; expect a few of these when replaying a concurrent workload, as it will not
+    interleave exactly as it did when recorded.
+
+    :param path: The cassette file to replay.
+    :param speed: ``None`` to answer immediately and skip sleeps, ``1.0`` to reproduce the recorded latency
+        and sleeps in real time, or any other factor to speed them up (``2.0``) or slow them down (``0.5``).
+    """
+
+    def __init__(self, path: Union[str, PathLike], speed: Optional[float] = None):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive")
+        self.path = path
+        self.speed = speed
+        self.header: JsonDict = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exact: Dict[Tuple, Deque[JsonDict]] = defaultdict(deque)
+        self._loose: Dict[Tuple, Deque[JsonDict]] = defaultdict(deque)
+        self._last: Dict[Tuple, JsonDict] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                entry = json.loads(line)
+                if i == 0:
+                    self.header = entry
+                    if entry.get("version") != CASSETTE_VERSION:
+                        raise ValueError(f"Unsupported cassette version: {entry.get('version')}")
+                    continue
+                request = entry["request"]
+                self._exact[_exact_key(request["method"], request["url"], request.get("params"))].append(entry)
+                self._loose[_loose_key(request["method"], request["url"])].append(entry)
+
+    def _next(self, r: HttpRequest) -> JsonDict:
+        exact, loose = _exact_key(r.method, r.url, r.params), _loose_key(r.method, r.url)
+        with self._lock:
+            for key, entries in ((exact, self._exact), (loose, self._loose)):
+                if entries.get(key):
+                    entry = entries[key].popleft()
+                    self._last[exact] = self._last[loose] = entry
+                    return entry
+            for key in (exact, loose):
+                if key in self._last:
+                    return self._last[key]
+            self.misses += 1
+        raise ValueError(f"No recorded response for {r.method.upper()} {r.url}")
+
+    def _delays(self, r: HttpRequest, entry: JsonDict) -> Tuple[float, float]:
+        if self.speed is None:
+            return 0, 0
+        return (r.sleep or 0) / self.speed, entry["elapsed"] / self.speed
+
+    def open(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        return None
+
+    def close(self, session: Any) -> None:
+        pass
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        entry = self._next(r)
+        sleep, latency = self._delays(r, entry)
+        if sleep + latency:
+            time.sleep(sleep + latency)
+        return _dict_to_response(entry["response"], r)
+
+    async def open_async(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        return None
+
+    async def close_async(self, session: Any) -> None:
+        pass
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        entry = self._next(r)
+        sleep, latency = self._delays(r, entry)
+        if sleep + latency:
+            await asyncio.sleep(sleep + latency)
+        return _dict_to_response(entry["response"], r)
+
+
+def _exact_key(method: str, url: str, params: Optional[Dict[str, Any]]) -> Tuple:
+    return method.lower(), url, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+
+def _loose_key(method: str, url: str) -> Tuple:
+    parsed = urlparse(url)
+    return method.lower(), parsed.netloc, parsed.path
+
+
+def _request_to_dict(r: HttpRequest) -> JsonDict:
+    d = {"method": r.method, "url": r.url, "params": r.params, "headers": r.headers, "decode": r.decode}
+    if r.data is not None:
+        data = r.text
+        if len(data) <= MAX_RECORDED_DATA:
+            d["data"] = data
+        else:
+            d["data_sha256"] = sha256(data.encode()).hexdigest()
+            d["data_len"] = len(data)
+    return d
+
+
+def _response_to_dict(response: HttpResponse) -> JsonDict:
+    d = {"status_code": response.status_code, "url": response.url, "headers": response.headers}
+    if isinstance(response.content, bytes) and not response.request.decode:
+        d["content_b64"] = base64.b64encode(response.content).decode()
+    else:
+        d["content"] = _censor_content(response.text)
+    return d
+
+
+def _censor_content(content: str) -> str:
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    if not _censor_json(data):
+        return content
+    return json.dumps(data)
+
+
+def _censor_json(value: Any) -> bool:
+    censored = False
+    if isinstance(value, dict):
+        for key in value:
+            if key.lower() in _CENSORED_RESPONSE_KEYS and isinstance(value[key], str):
+                value[key] = _REDACTED
+                censored = True
+            else:
+                censored = _censor_json(value[key]) or censored
+    elif isinstance(value, list):
+        for item in value:
+            censored = _censor_json(item) or censored
+    return censored
+
+
+def _dict_to_response(d: JsonDict, r: HttpRequest) -> HttpResponse:
+    content = base64.b64decode(d["content_b64"]) if "content_b64" in d else d["content"]
+    return HttpResponse(status_code=d["status_code"], url=d["url"], content=content, request=r,
+                        headers=d.get("headers"))
@@ -2,10 +2,14 @@
 This module contains all functions pydalle uses to interface with the filesystem.
 """
 
+import json
+import os
 import warnings
 from os import PathLike
 from typing import Union, IO
 
+from pydalle.functional.api.flow.resumable import FlowState, flow_state_from_dict
+
 try:
     import aiofiles
 except ImportError as _e:
@@ -31,3 +35,22 @@ async def read_bytes_async(file_like: Union[str, PathLike, IO[bytes]]) -> bytes:
             warnings.warn(f"aiofiles not found, falling back to sync version: {_e}", RuntimeWarning)
             return read_bytes(file_like)
     return file_like.read()
+
+
+def write_flow_state(path: Union[str, PathLike], state: FlowState) -> None:
+    """
+    Checkpoint the state of a resumable flow to a JSON file. The file is replaced at once,
+    so a reader (or a process resuming after a crash) never sees a partially written state.
+    """
+    tmp_path = f"{os.fspath(path)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def read_flow_state(path: Union[str, PathLike]) -> FlowState:
+    """
+    Read the state of a resumable flow from a file written by :func:`write_flow_state`.
+    """
+    with open(path) as f:
+        return flow_state_from_dict(json.load(f))
@@ -0,0 +1,285 @@
+"""
+This module contains a local index of tasks, prompts and generations in SQLite, so that the task history can be
+searched without any requests (and offline). Captions are searched with SQLite's FTS5 full-text search where
+it is available.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from os import PathLike
+from typing import Optional, Union, Iterable, List, Tuple, Any, TYPE_CHECKING
+
+from pydalle.functional.api.response.labs import Task, Generation, raw_dict
+from pydalle.functional.utils import normalize_caption
+
+if TYPE_CHECKING:
+    from pydalle.imperative.client.dalle import Dalle
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, created INTEGER NOT NULL, task_type TEXT NOT NULL, "
+    "status TEXT NOT NULL, prompt_id TEXT NOT NULL, raw TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS tasks_by_created ON tasks (created)",
+    "CREATE INDEX IF NOT EXISTS tasks_by_type ON tasks (task_type, created)",
+    "CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, created)",
+    "CREATE INDEX IF NOT EXISTS tasks_by_prompt ON tasks (prompt_id)",
+    "CREATE TABLE IF NOT EXISTS prompts (id TEXT PRIMARY KEY, created INTEGER NOT NULL, prompt_type TEXT NOT NULL, "
+    "caption TEXT, parent_generation_id TEXT, normalized_caption TEXT)",
+    "CREATE INDEX IF NOT EXISTS prompts_by_parent ON prompts (parent_generation_id)",
+    "CREATE TABLE IF NOT EXISTS generations (id TEXT PRIMARY KEY, created INTEGER NOT NULL, "
+    "task_id TEXT NOT NULL, prompt_id TEXT NOT NULL, raw TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS generations_by_task ON generations (task_id)",
+]
+# Added after the first version of the schema, so they are added to existing databases as well
+_MIGRATIONS = [
+    ("prompts", "normalized_caption", "ALTER TABLE prompts ADD COLUMN normalized_caption TEXT"),
+]
+_LATE_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS prompts_by_normalized_caption ON prompts (normalized_caption)",
+]
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS captions USING fts5 (prompt_id UNINDEXED, caption)"
+
+
+class TaskIndex:
+    """
+    Mirrors tasks, with their prompts and generations, into a SQLite database, and answers queries over them.
+
+    :meth:`sync` brings it up to date incrementally, from the newest task it has (or the oldest one which was
+    still pending). The queries make no requests. Like :class:`pydalle.imperative.outside.cache.ImageCache`, the
+    database can be shared by any number of threads and processes.
+
+    :param path: The path of the database file.
+    """
+
+    def __init__(self, path: Union[str, PathLike]):
+        self.path = os.path.expanduser(os.fspath(path))
+        self._local = threading.local()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            db.execute(statement)
+        for table, column, statement in _MIGRATIONS:
+            if column not in {row[1] for row in db.execute(f"PRAGMA table_info({table})")}:
+                db.execute(statement)
+        for statement in _LATE_SCHEMA:
+            db.execute(statement)
+        try:
+            db.execute(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite was built without FTS5, so captions are searched with LIKE instead
+            self.has_fts = False
+        if self.has_fts and db.execute("SELECT NOT EXISTS (SELECT 1 FROM captions)").fetchone()[0]:
+            db.execute("INSERT INTO captions (prompt_id, caption) "
+                       "SELECT id, caption FROM prompts WHERE caption IS NOT NULL")
+        db.execute("UPDATE prompts SET normalized_caption = normalize_caption(caption) "
+                   "WHERE caption IS NOT NULL AND normalized_caption IS NULL")
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.create_function("normalize_caption", 1, normalize_caption, deterministic=True)
+            self._local.db = db
+        return db
+
+    def add(self, tasks: Iterable[Task]) -> int:
+        """
+        Adds tasks to the index, or updates them if they are in it already.
+
+        :return: The number of tasks added or updated.
+        """
+        task_rows, prompt_rows, generation_rows = [], [], []
+        for task in tasks:
+            task_rows.append((task.id, task.created, task.task_type, task.status, task.prompt_id,
+                              json.dumps(raw_dict(task), separators=(",", ":"))))
+            prompt = task.prompt
+            caption = prompt.prompt.caption
+            prompt_rows.append((prompt.id, prompt.created, prompt.prompt_type, caption, prompt.parent_generation_id,
+                                normalize_caption(caption) if caption is not None else None))
+            for generation in task.generations or ():
+                generation_rows.append((generation.id, generation.created, generation.task_id,
+                                        generation.prompt_id, json.dumps(raw_dict(generation), separators=(",", ":"))))
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO tasks (id, created, task_type, status, prompt_id, raw) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", task_rows)
+            db.executemany("INSERT OR REPLACE INTO prompts (id, created, prompt_type, caption, parent_generation_id, "
+                           "normalized_caption) VALUES (?, ?, ?, ?, ?, ?)", prompt_rows)
+            if self.has_fts:
+                db.executemany("DELETE FROM captions WHERE prompt_id = ?", [row[:1] for row in prompt_rows])
+                db.executemany("INSERT INTO captions (prompt_id, caption) VALUES (?, ?)",
+                               [(row[0], row[3]) for row in prompt_rows if row[3] is not None])
+            db.executemany("INSERT OR REPLACE INTO generations (id, created, task_id, prompt_id, raw) "
+                           "VALUES (?, ?, ?, ?, ?)", generation_rows)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return len(task_rows)
+
+    def sync(self, dalle: 'Dalle', page_size: int = 50) -> int:
+        """
+        Adds the tasks created since the last sync (and updates the ones which were still pending then).
+
+        :param dalle: The client to list the tasks with.
+        :param page_size: The number of tasks to fetch, and store, at a time.
+        :return: The number of tasks added or updated.
+        """
+        count = 0
+        batch: List[Task] = []
+        for task in dalle.iter_tasks(since=self.sync_from, page_size=page_size):
+            batch.append(task.wrapped)
+            if len(batch) >= page_size:
+                count += self.add(batch)
+                batch = []
+        return count + self.add(batch)
+
+    @property
+    def sync_from(self) -> Optional[int]:
+        """
+        The ``from_ts`` the next :meth:`sync` starts at: the creation time of the oldest pending task, or else
+        of the newest task, or ``None`` if the index is empty.
+        """
+        row = self._db().execute("SELECT (SELECT MIN(created) FROM tasks WHERE status = 'pending'), "
+                                 "(SELECT MAX(created) FROM tasks)").fetchone()
+        return row[0] if row[0] is not None else row[1]
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        """
+        Returns an indexed task, or ``None`` if it is not in the index.
+        """
+        row = self._db().execute("SELECT raw FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return Task.from_dict(json.loads(row[0])) if row is not None else None
+
+    def get_generation(self, generation_id: str) -> Optional[Generation]:
+        """
+        Returns an indexed generation, or ``None`` if it is not in the index.
+        """
+        row = self._db().execute("SELECT raw FROM generations WHERE id = ?", (generation_id,)).fetchone()
+        return Generation.from_dict(json.loads(row[0])) if row is not None else None
+
+    def find_tasks(self, caption: Optional[str] = None, task_type: Optional[str] = None,
+                   status: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                   parent: Optional[str] = None, limit: Optional[int] = None) -> List[Task]:
+        """
+        Returns the indexed tasks matching every filter given, newest first.
+
+        :param caption: Text the caption contains (case-insensitively).
+        :param task_type: The task type, e.g. ``"text2im"``, ``"variations"`` or ``"inpainting"``.
+        :param status: The status, e.g. ``"succeeded"``, ``"pending"`` or ``"rejected"``.
+        :param since: Optional unix timestamp of the oldest tasks to include.
+        :param until: Optional unix timestamp of the first tasks to exclude.
+        :param parent: The ID of the generation the tasks' prompt was made from (for variations and inpainting).
+        :param limit: The maximum number of tasks to return.
+        :return: The tasks.
+        """
+        where, params = _filters(caption, task_type, status, since, until, parent)
+        query = f"SELECT tasks.raw FROM tasks JOIN prompts ON prompts.id = tasks.prompt_id {where} " \
+                f"ORDER BY tasks.created DESC, tasks.id"
+        return [Task.from_dict(json.loads(raw)) for raw, in self._db().execute(*_limited(query, params, limit))]
+
+    def find_generations(self, caption: Optional[str] = None, task_type: Optional[str] = None,
+                         status: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                         parent: Optional[str] = None, limit: Optional[int] = None) -> List[Generation]:
+        """
+        Returns the generations of the indexed tasks matching every filter given, newest first.
+        See :meth:`find_tasks`, which takes the same parameters.
+
+        :return: The generations.
+        """
+        where, params = _filters(caption, task_type, status, since, until, parent)
+        query = f"SELECT generations.raw FROM generations JOIN tasks ON tasks.id = generations.task_id " \
+                f"JOIN prompts ON prompts.id = tasks.prompt_id {where} " \
+                f"ORDER BY tasks.created DESC, tasks.id, generations.rowid"
+        return [Generation.from_dict(json.loads(raw))
+                for raw, in self._db().execute(*_limited(query, params, limit))]
+
+    def search(self, query: str, limit: Optional[int] = 50) -> List[Task]:
+        """
+        Searches the captions of the indexed tasks, best matches first.
+
+        :param query: An `FTS5 query <https://www.sqlite.org/fts5.html#full_text_query_syntax>`_, e.g.
+            ``cat AND (hat OR bat)``, ``"a cute cat"`` or ``cat*``. Without FTS5, the tasks whose captions
+            contain every word of the query are returned instead, newest first.
+        :param limit: The maximum number of tasks to return.
+        :return: The tasks.
+        """
+        if not self.has_fts:
+            where, params = _caption_words(query)
+            sql = f"SELECT tasks.raw FROM tasks JOIN prompts ON prompts.id = tasks.prompt_id {where} " \
+                  f"ORDER BY tasks.created DESC, tasks.id"
+        else:
+            sql = "SELECT tasks.raw FROM captions JOIN tasks ON tasks.prompt_id = captions.prompt_id " \
+                  "WHERE captions MATCH ? ORDER BY captions.rank, tasks.created DESC"
+            params = [query]
+        try:
+            rows = self._db().execute(*_limited(sql, params, limit)).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+        return [Task.from_dict(json.loads(raw)) for raw, in rows]
+
+    def find_reusable_task(self, caption: str, batch_size: int) -> Optional[Task]:
+        """
+        Returns the newest succeeded text2im task with the same caption (once normalized, see
+        :func:`pydalle.functional.utils.normalize_caption`) and the same number of generations, if any.
+        """
+        row = self._db().execute(
+            "SELECT tasks.raw FROM prompts JOIN tasks ON tasks.prompt_id = prompts.id "
+            "WHERE prompts.normalized_caption = ? AND tasks.task_type = 'text2im' AND tasks.status = 'succeeded' "
+            "AND (SELECT COUNT(*) FROM generations WHERE generations.task_id = tasks.id) = ? "
+            "ORDER BY tasks.created DESC LIMIT 1", (normalize_caption(caption), batch_size)).fetchone()
+        return Task.from_dict(json.loads(row[0])) if row is not None else None
+
+    def clear(self) -> None:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("tasks", "prompts", "generations") + (("captions",) if self.has_fts else ()):
+                db.execute(f"DELETE FROM {table}")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+
+def _filters(caption: Optional[str], task_type: Optional[str], status: Optional[str], since: Optional[int],
+             until: Optional[int], parent: Optional[str]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if caption is not None:
+        clauses.append("prompts.caption LIKE ? ESCAPE '\\'")
+        params.append("%" + caption.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    for column, value in (("tasks.task_type", task_type), ("tasks.status", status),
+                          ("prompts.parent_generation_id", parent)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("tasks.created >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("tasks.created < ?")
+        params.append(until)
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _caption_words(query: str) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    for word in query.split():
+        where, word_params = _filters(word, None, None, None, None, None)
+        clauses.append(where[len("WHERE "):])
+        params.extend(word_params)
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _limited(query: str, params: List[Any], limit: Optional[int]) -> Tuple[str, List[Any]]:
+    if limit is None:
+        return query, params
+    return query + " LIMIT ?", params + [limit]
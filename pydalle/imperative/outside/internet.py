@@ -3,8 +3,14 @@ This module contains all functions pydalle uses to make requests to the internet
 """
 
 import asyncio
+import heapq
+import itertools
+import threading
 import time
-from typing import Optional, Dict
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import replace
+from typing import Optional, Dict, Any, Iterable, List, Deque, Tuple, Union
 
 try:
     import requests
@@ -22,21 +28,351 @@ except ImportError as _e:
     aiohttp = LazyImportError("aiohttp", _e)
     del LazyImportError
 
-from pydalle.functional.types import HttpFlowFunc, T, HttpRequest, HttpResponse
+from pydalle.functional.types import HttpFlowFunc, T, HttpRequest, HttpResponse, HttpFlow, HttpBatch, HttpBatchFlow
 
 
-def session_flow(__flow: HttpFlowFunc[T], __headers=Optional[Dict[str, str]], /, **kwargs) -> T:
+class Transport:
+    """
+    Sends :class:`pydalle.functional.types.HttpRequest` objects and turns the results into
+    :class:`pydalle.functional.types.HttpResponse` objects.
+
+    The default implementation uses requests for synchronous and aiohttp for asynchronous networking.
+    Subclass :class:`TransportWrapper` to observe or alter the traffic of another transport.
+    """
+
+    def open(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        session = requests.Session()
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def close(self, session: Any) -> None:
+        session.close()
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return request(r, session=session)
+
+    async def open_async(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        session = aiohttp.ClientSession()
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    async def close_async(self, session: Any) -> None:
+        await session.close()
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return await request_async(r, session=session)
+
+    def request(self, r: HttpRequest, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """
+        Sends a single request in a session of its own.
+        """
+        session = self.open(headers)
+        try:
+            return self.send(r, session)
+        finally:
+            self.close(session)
+
+    async def request_async(self, r: HttpRequest, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """
+        Asynchronously sends a single request in a session of its own.
+        """
+        session = await self.open_async(headers)
+        try:
+            return await self.send_async(r, session)
+        finally:
+            await self.close_async(session)
+
+
+class TransportWrapper(Transport):
+    """
+    A transport which delegates to another transport (by default, :class:`Transport`).
+    """
+
+    def __init__(self, inner: Optional[Transport] = None):
+        self.inner = inner if inner is not None else Transport()
+
+    def open(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        return self.inner.open(headers)
+
+    def close(self, session: Any) -> None:
+        self.inner.close(session)
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return self.inner.send(r, session)
+
+    async def open_async(self, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self.inner.open_async(headers)
+
+    async def close_async(self, session: Any) -> None:
+        await self.inner.close_async(session)
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return await self.inner.send_async(r, session)
+
+
+class RebaseTransport(TransportWrapper):
+    """
+    Sends requests for the given origins (e.g. ``https://labs.openai.com``) to ``base_url`` instead.
+    This is mostly useful for pointing a client at a local stand-in server.
+    """
+
+    def __init__(self, base_url: str, origins: Iterable[str] = ("https://labs.openai.com", "https://auth0.openai.com"),
+                 inner: Optional[Transport] = None):
+        super().__init__(inner)
+        self.base_url = base_url.rstrip("/")
+        self.origins = tuple(origin.rstrip("/") for origin in origins)
+
+    def rebase(self, r: HttpRequest) -> HttpRequest:
+        for origin in self.origins:
+            if r.url.startswith(origin):
+                return replace(r, url=self.base_url + r.url[len(origin):])
+        return r
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return self.inner.send(self.rebase(r), session)
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        return await self.inner.send_async(self.rebase(r), session)
+
+
+class CountingTransport(TransportWrapper):
+    """
+    Counts the requests sent through another transport, as well as the responses
+    which will make a flow retry (i.e. server errors). Safe to share between threads.
+    """
+
+    def __init__(self, inner: Optional[Transport] = None):
+        super().__init__(inner)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def _count(self, r: HttpRequest, response: HttpResponse) -> None:
+        with self._lock:
+            self.requests += 1
+            if response.status_code >= 500:
+                self.retries += 1
+            self.bytes_sent += len(r.data or "")
+            self.bytes_received += len(response.content or "")
+
+    def send(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        response = self.inner.send(r, session)
+        self._count(r, response)
+        return response
+
+    async def send_async(self, r: HttpRequest, session: Any = None) -> HttpResponse:
+        response = await self.inner.send_async(r, session)
+        self._count(r, response)
+        return response
+
+
+DEFAULT_TRANSPORT = Transport()
+
+
+def session_flow(__flow: HttpFlowFunc[T], __headers: Optional[Dict[str, str]] = None,
+                 __transport: Optional[Transport] = None, /, **kwargs) -> T:
+    transport = __transport if __transport is not None else DEFAULT_TRANSPORT
     handler = __flow(**kwargs)
-    next_request = next(handler)
-    session = requests.Session()
-    if __headers:
-        session.headers.update(__headers)
-    while True:
+    session = transport.open(__headers)
+    try:
         try:
-            response = request(next_request, session=session)
-            next_request = handler.send(response)
+            next_request = next(handler)
+            while True:
+                if isinstance(next_request, HttpBatch):
+                    # Sent one after another; use a FlowRunner to send them concurrently
+                    response = [transport.send(r, session) for r in next_request.requests]
+                else:
+                    response = transport.send(next_request, session)
+                next_request = handler.send(response)
         except StopIteration as e:
             return e.value
+    finally:
+        transport.close(session)
+
+
+_NOTHING = object()
+
+
+class _Job:
+    __slots__ = ("flow", "future", "request", "response")
+
+    def __init__(self, flow: HttpBatchFlow[Any]):
+        self.flow = flow
+        self.future: Future = Future()
+        self.request: Union[HttpRequest, HttpBatch, None] = None
+        self.response: Any = _NOTHING
+
+
+def _send_one(r: HttpRequest) -> HttpFlow[HttpResponse]:
+    return (yield r)
+
+
+class FlowRunner:
+    """
+    Runs many flows concurrently on a small pool of worker threads.
+
+    Instead of blocking a worker for the ``sleep`` of a request (e.g. while polling for task completion or
+    waiting to retry after a 504), the flow is put aside in a timer heap and the worker moves on to other
+    flows. A handful of workers can therefore poll hundreds of tasks at once.
+
+    The requests of an :class:`pydalle.functional.types.HttpBatch` are spread over the workers, and the flow
+    resumes once all of them have been answered. Each worker sends its requests in a session of its own.
+    Usable as a context manager, which waits for all submitted flows on exit.
+
+    :param workers: The number of worker threads, i.e. how many requests can be in flight at once.
+    :param headers: Optional headers to send with every request.
+    :param transport: Optional transport to send the requests with.
+    """
+
+    def __init__(self, workers: int = 4, headers: Optional[Dict[str, str]] = None,
+                 transport: Optional[Transport] = None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.headers = headers
+        self.transport = transport if transport is not None else DEFAULT_TRANSPORT
+        self._cond = threading.Condition()
+        self._ready: Deque[_Job] = deque()
+        self._timers: List[Tuple[float, int, _Job]] = []
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+
+    def submit(self, flow: HttpBatchFlow[T]) -> 'Future[T]':
+        """
+        Schedules an already created flow to be run, and returns a future for its result.
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit flows after shutdown")
+        return self._enqueue(_Job(flow))
+
+    def _enqueue(self, job: _Job) -> 'Future':
+        with self._cond:
+            self._ready.append(job)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"pydalle-flow-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return job.future
+
+    def submit_flow(self, __flow: HttpFlowFunc[T], /, **kwargs) -> 'Future[T]':
+        """
+        Like :meth:`submit`, but creates the flow from a flow function and its arguments,
+        the same way :func:`session_flow` does.
+        """
+        return self.submit(__flow(**kwargs))
+
+    def run_all(self, flows: Iterable[HttpBatchFlow[T]]) -> List[T]:
+        """
+        Runs all the given flows concurrently and returns their results in order.
+        Raises the exception of the first flow which failed, if any.
+        """
+        return [future.result() for future in [self.submit(flow) for flow in flows]]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops accepting new flows. The workers exit once every submitted flow is done.
+
+        :param wait: Whether to block until then.
+        """
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self) -> 'FlowRunner':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def _take(self) -> Optional[_Job]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._timers)[2])
+                if self._ready:
+                    return self._ready.popleft()
+                if self._shutdown and not self._timers:
+                    return None
+                self._cond.wait(self._timers[0][0] - now if self._timers else None)
+
+    def _sleep(self, job: _Job) -> None:
+        with self._cond:
+            heapq.heappush(self._timers, (time.monotonic() + job.request.sleep, next(self._seq), job))
+            job.request = replace(job.request, sleep=None)
+            self._cond.notify()
+
+    def _work(self) -> None:
+        session = self.transport.open(self.headers)
+        try:
+            while (job := self._take()) is not None:
+                self._run(job, session)
+        finally:
+            self.transport.close(session)
+
+    def _fan_out(self, job: _Job) -> None:
+        requests = job.request.requests
+        responses: List[Any] = [None] * len(requests)
+        remaining = len(requests)
+
+        def done(i: int, future: Future) -> None:
+            nonlocal remaining
+            with self._cond:
+                if job.future.done():
+                    return
+                if (e := future.exception()) is not None:
+                    job.flow.close()
+                    job.future.set_exception(e)
+                    return
+                responses[i] = future.result()
+                remaining -= 1
+                if remaining == 0:
+                    job.response = responses
+                    self._ready.append(job)
+                    self._cond.notify()
+
+        if not requests:
+            job.response = responses
+            self._enqueue(job)
+        for i, r in enumerate(requests):
+            self._enqueue(_Job(_send_one(r))).add_done_callback(lambda future, i=i: done(i, future))
+
+    def _run(self, job: _Job, session: Any) -> None:
+        """
+        Advances a flow until it finishes, fails, yields a batch or asks to sleep before its next request.
+        """
+        try:
+            if job.request is None:
+                if not job.future.set_running_or_notify_cancel():
+                    job.flow.close()
+                    return
+                job.request = next(job.flow)
+            elif job.response is not _NOTHING:
+                response, job.response = job.response, _NOTHING
+                job.request = job.flow.send(response)
+            while True:
+                if isinstance(job.request, HttpBatch):
+                    return self._fan_out(job)
+                if job.request.sleep:
+                    return self._sleep(job)
+                job.request = job.flow.send(self.transport.send(job.request, session))
+        except StopIteration as e:
+            job.future.set_result(e.value)
+        except BaseException as e:
+            job.flow.close()
+            job.future.set_exception(e)
 
 
 def request(r: HttpRequest, /, session: Optional['requests.Session'] = None) -> HttpResponse:
@@ -48,18 +384,25 @@ def request(r: HttpRequest, /, session: Optional['requests.Session'] = None) ->
     return _requests_response_to_http_response(response, r)
 
 
-async def session_flow_async(__flow: HttpFlowFunc[T], __headers=Optional[Dict[str, str]], /, **kwargs) -> T:
+async def session_flow_async(__flow: HttpFlowFunc[T], __headers: Optional[Dict[str, str]] = None,
+                             __transport: Optional[Transport] = None, /, **kwargs) -> T:
+    transport = __transport if __transport is not None else DEFAULT_TRANSPORT
     handler = __flow(**kwargs)
-    next_request = next(handler)
-    async with aiohttp.ClientSession() as session:
-        if __headers:
-            session.headers.update(__headers)
-        while True:
-            try:
-                response = await request_async(next_request, session=session)
+    session = await transport.open_async(__headers)
+    try:
+        try:
+            next_request = next(handler)
+            while True:
+                if isinstance(next_request, HttpBatch):
+                    response = list(await asyncio.gather(*(transport.send_async(r, session)
+                                                           for r in next_request.requests)))
+                else:
+                    response = await transport.send_async(next_request, session)
                 next_request = handler.send(response)
-            except StopIteration as e:
-                return e.value
+        except StopIteration as e:
+            return e.value
+    finally:
+        await transport.close_async(session)
 
 
 async def request_async(r: HttpRequest, /, session: Optional['aiohttp.ClientSession'] = None) -> HttpResponse:
@@ -73,14 +416,16 @@ async def request_async(r: HttpRequest, /, session: Optional['aiohttp.ClientSess
 
 def _requests_response_to_http_response(response: 'requests.Response', http_request: HttpRequest) -> HttpResponse:
     return HttpResponse(status_code=response.status_code,
-                        content=response.text if http_request.decode else response.content,
-                        url=response.url, request=http_request)
+                        content=response.content,
+                        url=response.url, request=http_request,
+                        headers=dict(response.headers))
 
 
 async def _aiohttp_response_to_http_response(response: 'aiohttp.ClientResponse',
                                              http_request: HttpRequest) -> HttpResponse:
     return HttpResponse(
         status_code=response.status,
-        content=(await response.text()) if http_request.decode else (await response.read()),
+        content=await response.read(),
         url=str(response.url),
-        request=http_request)
+        request=http_request,
+        headers=dict(response.headers))
@@ -0,0 +1,100 @@
+"""
+This module contains the JSON codecs pydalle can use which depend on optional packages: `orjson`_ and `msgspec`_.
+Both parse responses straight from their bytes and encode request bodies (with their multi-megabyte base64 images)
+straight to bytes, several times faster than the standard library.
+
+Importing this module changes nothing: call :func:`use_json_codec` to install one of them. Request bodies are then
+``bytes`` rather than ``str``, which every reader of :attr:`pydalle.functional.types.HttpRequest.data` handles
+(see :attr:`pydalle.functional.types.HttpRequest.text`).
+
+.. _orjson: https://github.com/ijl/orjson
+.. _msgspec: https://github.com/jcrist/msgspec
+"""
+
+from typing import Any, Union, Optional, Dict, Type
+
+try:
+    import orjson
+except ImportError as _e:
+    from pydalle.functional.types import LazyImportError
+
+    orjson = LazyImportError("orjson", _e)
+    del LazyImportError
+
+try:
+    import msgspec
+except ImportError as _e:
+    from pydalle.functional.types import LazyImportError
+
+    msgspec = LazyImportError("msgspec", _e)
+    del LazyImportError
+
+from pydalle.functional.codec import JsonCodec, set_json_codec
+from pydalle.functional.types import LazyImportError
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    Encodes and decodes JSON with orjson.
+    """
+    name = "orjson"
+
+    def __init__(self):
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._loads(data)
+
+    def dumps(self, value: Any) -> bytes:
+        return self._dumps(value)
+
+
+class MsgspecCodec(JsonCodec):
+    """
+    Encodes and decodes JSON with msgspec.
+    """
+    name = "msgspec"
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Like json.JSONDecodeError (and orjson's), so that callers can catch a ValueError either way
+            raise ValueError(str(e)) from e
+
+    def dumps(self, value: Any) -> bytes:
+        return self._encoder.encode(value)
+
+
+JSON_CODECS: Dict[str, Type[JsonCodec]] = {codec.name: codec for codec in (OrjsonCodec, MsgspecCodec, JsonCodec)}
+_MODULES = {"orjson": orjson, "msgspec": msgspec}
+
+
+def available_json_codecs() -> Dict[str, Type[JsonCodec]]:
+    """
+    Returns the codecs whose packages are installed, fastest first.
+    """
+    return {name: codec for name, codec in JSON_CODECS.items()
+            if not isinstance(_MODULES.get(name), LazyImportError)}
+
+
+def use_json_codec(name: Optional[str] = None) -> JsonCodec:
+    """
+    Installs a codec with :func:`pydalle.functional.codec.set_json_codec`.
+
+    :param name: ``"orjson"``, ``"msgspec"`` or ``"json"`` (the standard library). Defaults to the fastest codec
+        available.
+    :return: The codec installed.
+    """
+    if name is None:
+        name = next(iter(available_json_codecs()))
+    elif name not in JSON_CODECS:
+        raise ValueError(f"name must be one of {', '.join(map(repr, JSON_CODECS))}, not {name!r}")
+    codec = JSON_CODECS[name]()
+    set_json_codec(codec)
+    return codec
@@ -3,15 +3,30 @@ This module contains all functions pydalle uses to directly interface with numpy
 """
 
 try:
-    from numpy import array, ndarray
+    from numpy import array, asarray, empty, ndarray, arange, zeros, stack, where, minimum
 except ImportError as e:
     from pydalle.functional.types import LazyImportError
 
+    arange = LazyImportError("numpy.arange", e)
+    zeros = LazyImportError("numpy.zeros", e)
+    minimum = LazyImportError("numpy.minimum", e)
+    stack = LazyImportError("numpy.stack", e)
+    where = LazyImportError("numpy.where", e)
     array = LazyImportError("numpy.array", e)
+    asarray = LazyImportError("numpy.asarray", e)
+    empty = LazyImportError("numpy.empty", e)
     ndarray = LazyImportError("numpy.ndarray", e)
     del LazyImportError
 
-from pydalle.imperative.outside.pil import PILImageType, PILImage
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Sequence, List, Optional
+
+from pydalle.functional.images import UploadImageOptions, DEFAULT_UPLOAD_IMAGE_OPTIONS
+from pydalle.imperative.outside.pil import PILImageType, PILImage, PILImageDraw, PILImageFilter, \
+    pil_image_to_upload_png_bytes
+
+BATCH_MODES = {"L": 1, "RGB": 3, "RGBA": 4}
 
 
 def pil_image_to_np_array(image: PILImageType) -> 'ndarray':
@@ -20,3 +35,150 @@ def pil_image_to_np_array(image: PILImageType) -> 'ndarray':
 
 def np_array_to_pil_image(array: 'ndarray') -> PILImageType:
     return PILImage.fromarray(array)
+
+
+def image_batch_shape(n: int, width: int, height: int, mode: str = "RGB") -> Tuple[int, ...]:
+    """
+    Returns the shape of an array holding ``n`` images of the given size and mode (one of :data:`BATCH_MODES`),
+    which is ``(n, height, width)`` for single-band images and ``(n, height, width, bands)`` otherwise.
+    """
+    try:
+        bands = BATCH_MODES[mode]
+    except KeyError:
+        raise ValueError(f"mode must be one of {tuple(BATCH_MODES)}, not {mode!r}")
+    return (n, height, width) if bands == 1 else (n, height, width, bands)
+
+
+def empty_image_batch(n: int, width: int, height: int, mode: str = "RGB") -> 'ndarray':
+    return empty(image_batch_shape(n, width, height, mode), dtype="uint8")
+
+
+def pil_image_into_np_array(image: PILImageType, out: 'ndarray', mode: str = "RGB") -> None:
+    """
+    Writes the pixels of an image, converted to ``mode`` if needed, into ``out``, an array of shape
+    ``(height, width)`` or ``(height, width, bands)``.
+    """
+    if image.mode != mode:
+        image = image.convert(mode)
+    out[...] = asarray(image).reshape(out.shape)
+
+
+def rect_masks(width: int, height: int, rects: Sequence[Tuple[float, float, float, float]]) -> 'ndarray':
+    """
+    Returns an ``(n, height, width)`` boolean array which is true inside each of the rectangles
+    ``(x1, y1, x2, y2)``, given in fractions of the width and height like
+    :func:`pydalle.imperative.outside.pil.mask_pil_image`.
+    """
+    r = (asarray(rects, dtype=float).reshape(-1, 4) * [width, height, width, height]).astype(int)
+    x1, y1, x2, y2 = (r[:, i, None, None] for i in range(4))
+    xs = arange(width)[None, None, :]
+    ys = arange(height)[None, :, None]
+    return (xs >= x1) & (xs < x2) & (ys >= y1) & (ys < y2)
+
+
+def polygon_masks(width: int, height: int, polygons: Sequence[Sequence[Tuple[float, float]]]) -> 'ndarray':
+    """
+    Returns an ``(n, height, width)`` boolean array which is true inside each of the polygons, given as lists
+    of ``(x, y)`` points in fractions of the width and height.
+    """
+    masks = zeros((len(polygons), height, width), dtype=bool)
+    for mask, polygon in zip(masks, polygons):
+        image = PILImage.new("1", (width, height), 0)
+        PILImageDraw.Draw(image).polygon([(x * width, y * height) for x, y in polygon], fill=1)
+        mask[...] = asarray(image)
+    return masks
+
+
+def mask_batch(images: 'ndarray', masks: 'ndarray') -> 'ndarray':
+    """
+    Makes the masked pixels of images transparent (and black, like
+    :func:`pydalle.imperative.outside.pil.mask_pil_image`), e.g. to prepare many edits of the same image.
+
+    :param images: An ``(h, w, 3|4)`` image, or an ``(n, h, w, 3|4)`` batch of them, of dtype ``uint8``.
+    :param masks: An ``(h, w)`` or ``(n, h, w)`` boolean array, true where the images should be transparent,
+        e.g. from :func:`rect_masks` or :func:`polygon_masks`. A single image is masked with every mask, and a
+        single mask is applied to every image.
+    :return: A new ``(n, h, w, 4)`` array.
+    """
+    images = asarray(images)
+    masks = asarray(masks, dtype=bool)
+    if images.ndim == 3:
+        images = images[None]
+    if masks.ndim == 2:
+        masks = masks[None]
+    n = max(len(images), len(masks))
+    if images.shape[1:3] != masks.shape[1:3] or images.shape[-1] not in (3, 4) or \
+            len(images) not in (1, n) or len(masks) not in (1, n):
+        raise ValueError(f"Cannot mask images of shape {images.shape} with masks of shape {masks.shape}")
+    rgba = empty(images.shape[:3] + (4,), dtype="uint8")
+    rgba[..., :3] = images[..., :3]
+    rgba[..., 3] = images[..., 3] if images.shape[-1] == 4 else 255
+    # Viewing every pixel as a single uint32 makes selecting whole pixels much faster than selecting bytes
+    out = where(masks, 0, rgba.view("uint32")[..., 0])
+    return out.view("uint8").reshape(out.shape + (4,))
+
+
+def pad_batch(images: 'ndarray', p: float, offsets: Sequence[Tuple[float, float]] = ((0.5, 0.5),)) -> 'ndarray':
+    """
+    Shrinks images and places them on transparent canvases of their original size, like
+    :func:`pydalle.imperative.outside.pil.pad_pil_image`, e.g. to prepare outpainting.
+
+    :param images: An ``(h, w, 3|4)`` image, or an ``(n, h, w, 3|4)`` batch of them, of dtype ``uint8``.
+        Each image is only resized once, however many offsets it is placed at.
+    :param p: The scale to shrink the images to. E.g. 0.5 means the images will be shrunk by 50%.
+    :param offsets: Where to center the shrunk images, as ``(cx, cy)`` fractions. A single image is placed
+        at every offset, and a single offset is used for every image.
+    :return: A new ``(n, h, w, 4)`` array.
+    """
+    images = asarray(images)
+    if images.ndim == 3:
+        images = images[None]
+    if images.shape[-1] not in (3, 4):
+        raise ValueError(f"Cannot pad images of shape {images.shape}")
+    n = max(len(images), len(offsets))
+    if len(images) not in (1, n) or len(offsets) not in (1, n):
+        raise ValueError(f"Cannot pad {len(images)} images at {len(offsets)} offsets")
+    height, width = images.shape[1:3]
+    small_width, small_height = int(width * p), int(height * p)
+    shrunk = stack([asarray(PILImage.fromarray(image).convert("RGBA").resize((small_width, small_height),
+                                                                             resample=PILImage.LANCZOS))
+                    for image in images])
+    out = zeros((n, height, width, 4), dtype="uint8")
+    for i in range(n):
+        cx, cy = offsets[i if len(offsets) > 1 else 0]
+        x, y = int((width - small_width) * cx), int((height - small_height) * cy)
+        out[i, y:y + small_height, x:x + small_width] = shrunk[i if len(shrunk) > 1 else 0]
+    return out
+
+
+def np_batch_to_png_base64(batch: 'ndarray', options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS,
+                           max_workers: Optional[int] = None) -> List[str]:
+    """
+    Encodes every image of an ``(n, h, w, c)`` batch as a base64 PNG ready to upload, in parallel.
+    """
+    def encode(image: 'ndarray') -> str:
+        return base64.b64encode(pil_image_to_upload_png_bytes(PILImage.fromarray(image), options)).decode()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(encode, batch))
+
+
+def blend_into(canvas: 'ndarray', tile: 'ndarray', x: int, y: int, feather: int = 64) -> None:
+    """
+    Paints ``tile`` onto ``canvas`` (an RGBA array whose alpha marks what is painted already) at ``(x, y)``.
+    Unpainted pixels are taken from the tile. Painted pixels within ``feather`` pixels of unpainted ones fade
+    from the tile into the canvas, so that the new part joins without a seam, and the rest are kept.
+    """
+    height, width = tile.shape[:2]
+    region = canvas[y:y + height, x:x + width]
+    unknown = region[..., 3] == 0
+    if feather > 0:
+        # A box blur of the mask falls from 1/2 at its edge to 0 at ``feather`` pixels outside of it
+        spread = PILImage.fromarray(unknown.astype("uint8") * 255, "L").filter(PILImageFilter.BoxBlur(feather))
+        weights = minimum(asarray(spread, dtype="float32") / 127.5, 1)
+        weights[unknown] = 1
+    else:
+        weights = unknown.astype("float32")
+    weights = weights[..., None]
+    region[..., :3] = (region[..., :3] * (1 - weights) + tile[..., :3] * weights + 0.5).astype("uint8")
+    region[..., 3] = 255
@@ -2,18 +2,52 @@
 This module contains all functions pydalle uses to directly interface with PIL.
 """
 
+import asyncio
+from concurrent.futures import Executor
 from io import BytesIO
+from typing import Optional, Callable, TypeVar
 
 try:
-    from PIL import Image as PILImage
+    from PIL import Image as PILImage, ImageDraw as PILImageDraw, ImageFilter as PILImageFilter
 except ImportError as e:
     from pydalle.functional.types import LazyImportError
 
     PILImage = LazyImportError("PIL.Image", e)
+    PILImageDraw = LazyImportError("PIL.ImageDraw", e)
+    PILImageFilter = LazyImportError("PIL.ImageFilter", e)
     del LazyImportError
 
+from pydalle.functional.images import UploadImageOptions, DEFAULT_UPLOAD_IMAGE_OPTIONS, detect_image_format
+
 PILImageType = type(PILImage)
 
+# Modes PIL can write PNGs in
+_PNG_MODES = ("1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA")
+
+R = TypeVar("R")
+
+_executor: Optional[Executor] = None
+
+
+def set_image_executor(executor: Optional[Executor]) -> None:
+    """
+    Sets the executor the async API runs CPU-bound image conversions on, unless told otherwise.
+
+    By default (``None``) they run on the event loop's default executor, a thread pool. A
+    ``ProcessPoolExecutor`` keeps conversions from competing for the GIL, at the cost of pickling the
+    images to and from the worker processes.
+    """
+    global _executor
+    _executor = executor
+
+
+async def run_image_conversion(fn: Callable[..., R], *args, executor: Optional[Executor] = None) -> R:
+    """
+    Runs ``fn(*args)`` on ``executor`` (or the one set with :func:`set_image_executor`) without blocking
+    the event loop. With a process pool, ``fn`` and its arguments must be picklable.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor or _executor, fn, *args)
+
 
 def bytes_to_pil_image(image: bytes) -> PILImageType:
     return PILImage.open(BytesIO(image))
@@ -29,8 +63,61 @@ def image_bytes_to_png_bytes(image: bytes) -> bytes:
     return pil_image_to_png_bytes(PILImage.open(BytesIO(image)))
 
 
+def image_bytes_to_upload_png_bytes(image: bytes,
+                                    options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> bytes:
+    """
+    Returns an encoded image as a PNG fit for uploading (see :class:`UploadImageOptions`). PNGs which are
+    already fit are returned as they are, without decoding them.
+    """
+    if detect_image_format(image) == "png" and options.accepts_png(image):
+        return image
+    return pil_image_to_upload_png_bytes(bytes_to_pil_image(image), options)
+
+
+def pil_image_to_upload_png_bytes(image: PILImageType,
+                                  options: UploadImageOptions = DEFAULT_UPLOAD_IMAGE_OPTIONS) -> bytes:
+    """
+    Encodes an image as a PNG fit for uploading, scaling it down if it is larger than the size to upload (or
+    with ``options.crop``, cropping it to a centered square and resizing it in one pass if it is not of that size).
+    """
+    width, height = image.size
+    box, target = None, None
+    if options.size is not None and options.crop and image.size != (options.size, options.size):
+        side = min(width, height)
+        box = ((width - side) / 2, (height - side) / 2, (width + side) / 2, (height + side) / 2)
+        target = (options.size, options.size)
+    elif options.size is not None and not options.crop and max(width, height) > options.size:
+        scale = options.size / max(width, height)
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if target is not None:
+        if image.mode not in ("L", "LA", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGB")
+        image = image.resize(target, resample=PILImage.LANCZOS, box=box)
+    elif image.mode not in _PNG_MODES:
+        image = image.convert("RGBA" if "A" in image.mode else "RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=options.compress_level)
+    return buffer.getvalue()
+
+
+def decode_image(image: bytes) -> PILImageType:
+    """
+    Decodes an image in any format PIL supports, reading all of its pixels right away rather than lazily.
+    """
+    decoded = bytes_to_pil_image(image)
+    decoded.load()
+    return decoded
+
+
 def bytes_to_masked_pil_image(image: bytes, x1: float, y1: float, x2: float, y2: float) -> PILImageType:
-    image = bytes_to_pil_image(image).convert("RGBA")
+    return mask_pil_image(bytes_to_pil_image(image), x1, y1, x2, y2)
+
+
+def mask_pil_image(image: PILImageType, x1: float, y1: float, x2: float, y2: float) -> PILImageType:
+    """
+    Returns an RGBA copy of an image with a transparent rectangle, given in fractions of its size.
+    """
+    image = image.convert("RGBA")
     x1 = int(x1 * image.width)
     y1 = int(y1 * image.height)
     x2 = int(x2 * image.width)
@@ -45,10 +132,17 @@ def bytes_to_padded_pil_image(image: bytes, p: float, cx: float = 0.5, cy: float
     but the image is scaled down by the given percentage and a transparent border
     is added to the edges.
     """
-    old_image = bytes_to_pil_image(image).convert("RGBA")
+    return pad_pil_image(bytes_to_pil_image(image), p, cx, cy)
+
+
+def pad_pil_image(image: PILImageType, p: float, cx: float = 0.5, cy: float = 0.5) -> PILImageType:
+    """
+    Like :func:`bytes_to_padded_pil_image`, but for an already decoded image, which is left untouched.
+    """
+    old_image = image.convert("RGBA")
     new_image = PILImage.new("RGBA", (old_image.width, old_image.height), (0, 0, 0, 0))
     old_image = old_image.resize((int(old_image.width * p), int(old_image.height * p)),
                                     resample=PILImage.LANCZOS)
     new_image.paste(old_image, (int((new_image.width - old_image.width) * cx),
                                 int((new_image.height - old_image.height) * cy)))
-    return new_image
\ No newline at end of file
+    return new_image
@@ -0,0 +1,91 @@
+"""
+This module contains all functions pydalle uses to serve a stand-in API over HTTP.
+"""
+
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Callable
+
+from pydalle.functional.api.standin.labs import StandInLabs
+from pydalle.functional.types import HttpRequest, HttpResponse
+
+
+class StandInServer:
+    """
+    Serves a :class:`pydalle.functional.api.standin.labs.StandInLabs` (or anything else with the same
+    ``handle`` method) on a background thread. Point a client at :attr:`base_url` with
+    :class:`pydalle.imperative.outside.internet.RebaseTransport`.
+
+    Usable as a context manager, which starts and stops the server.
+    """
+
+    def __init__(self, backend: Optional[StandInLabs] = None, host: str = "127.0.0.1", port: int = 0,
+                 clock: Callable[[], float] = time.time):
+        self.backend = backend if backend is not None else StandInLabs()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, r: HttpRequest) -> HttpResponse:
+        with self._lock:
+            return self.backend.handle(r, self.clock())
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="pydalle-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def _handler_for(server: StandInServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            r = HttpRequest(method=self.command.lower(),
+                            url=f"{server.base_url}{self.path}",
+                            headers=dict(self.headers.items()),
+                            data=body.decode("utf-8", errors="replace") if body else None)
+            response = server.handle(r)
+            content = response.content
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            self.send_response(response.status_code)
+            for key, value in (response.headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _respond
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    return Handler
@@ -23,6 +23,9 @@ setup(
     author_email='michaelphelps@nottheswimmer.org',
     url=REPO_URL,
     packages=find_packages(),
+    entry_points={
+        'console_scripts': ['pydalle=pydalle.__main__:main'],
+    },
     license='MIT',
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -39,6 +42,7 @@ setup(
         'async': ['aiofiles', 'aiohttp'],
         'sync': ['requests'],
         'images': ['pillow', 'numpy'],
-        'all': ['aiofiles', 'aiohttp', 'requests', 'pillow', 'numpy'],
+        'json': ['orjson'],
+        'all': ['aiofiles', 'aiohttp', 'requests', 'pillow', 'numpy', 'orjson'],
     },
 )